@@ -0,0 +1,198 @@
+"""Caches shared by the route modules.
+
+LRUTTLCache is the in-process building block. The async backends below put
+either it or a Redis-compatible server behind one interface, chosen with
+CACHE_BACKEND, so a cache can be shared by every worker process when Redis
+is available. FakeRedis stands in for a server in development and benchmarks.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from . import metrics
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory", "redis" or "fake-redis"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+cache_requests = metrics.counter("cache_requests_total", "Cache lookups by result", ("cache", "result"))
+cache_evictions = metrics.counter("cache_evictions_total", "Entries dropped to stay within max_size", ("cache",))
+
+_MISSING = object()
+
+class LRUTTLCache:
+    """Bounded mapping that drops the least recently used entry when full and expires entries after `ttl` seconds."""
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                cache_requests.inc(cache=self.name, result="hit")
+                return value
+            del self._entries[key]
+        cache_requests.inc(cache=self.name, result="miss")
+        return default
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            cache_evictions.inc(cache=self.name)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def delete_where(self, predicate) -> int:
+        """Drop every entry whose value matches `predicate`; returns how many were removed."""
+        stale = [key for key, (_, value) in self._entries.items() if predicate(value)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# --- Async backends ---
+
+class MemoryBackend:
+    """Per-process backend over LRUTTLCache; values are stored as-is."""
+
+    shared = False
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.cache = LRUTTLCache(name, max_size, ttl)
+        self.counters: dict[str, int] = {}
+
+    async def get(self, key: str):
+        return self.cache.get(key)
+
+    async def set(self, key: str, value):
+        self.cache.set(key, value)
+
+    async def delete(self, key: str):
+        self.cache.delete(key)
+
+    async def incr(self, key: str) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    async def evictions(self) -> int:
+        return int(cache_evictions.get(cache=self.name))
+
+class RedisBackend:
+    """Backend on a Redis-compatible server shared by every worker; values must be bytes or str.
+
+    Redis does its own eviction (maxmemory-policy), so there is no max_size here.
+    """
+
+    shared = True
+
+    def __init__(self, name: str, client, ttl: float):
+        self.name = name
+        self.client = client
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"hpms:{self.name}:{key}"
+
+    async def get(self, key: str):
+        value = await self.client.get(self._key(key))
+        cache_requests.inc(cache=self.name, result="miss" if value is None else "hit")
+        return value
+
+    async def set(self, key: str, value):
+        await self.client.set(self._key(key), value, ex=max(1, int(self.ttl)))
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self._key(key))
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self._key(key)) or 0)
+
+    async def evictions(self) -> int:
+        """Server-wide evicted_keys, since Redis does not report evictions per key prefix."""
+        info = await self.client.info("stats")
+        return int(info.get("evicted_keys", 0))
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis used by RedisBackend, kept in memory."""
+
+    def __init__(self):
+        self.data: dict[str, tuple[float | None, object]] = {}
+        self.evicted = 0
+        self._lock = asyncio.Lock()
+
+    def _live(self, key: str):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def get(self, key: str):
+        value = self._live(key)
+        return value.encode() if isinstance(value, str) else value
+
+    async def set(self, key: str, value, ex: int | None = None):
+        self.data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key: str) -> int:
+        async with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self.data[key] = (None, str(value))
+            return value
+
+    async def info(self, section: str | None = None) -> dict:
+        return {"evicted_keys": self.evicted}
+
+_redis_clients = {}
+
+def redis_client(kind: str = CACHE_BACKEND):
+    """One client per process and kind; the redis package is only imported when a real server is used."""
+    if kind not in _redis_clients:
+        if kind == "fake-redis":
+            _redis_clients[kind] = FakeRedis()
+        else:
+            import redis.asyncio
+            _redis_clients[kind] = redis.asyncio.from_url(REDIS_URL)
+    return _redis_clients[kind]
+
+def build_backend(name: str, max_size: int, ttl: float, kind: str = CACHE_BACKEND):
+    if kind == "memory":
+        return MemoryBackend(name, max_size, ttl)
+    if kind in ("redis", "fake-redis"):
+        return RedisBackend(name, redis_client(kind), ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}")
+
+def hit_ratio(name: str) -> float | None:
+    hits = cache_requests.get(cache=name, result="hit")
+    total = hits + cache_requests.get(cache=name, result="miss")
+    return round(hits / total, 4) if total else None
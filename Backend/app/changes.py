@@ -0,0 +1,209 @@
+"""Incremental sync feed: an append-only log of every create, update and delete.
+
+The write routes call `log_changes` inside the transaction that makes the
+change, so an entry exists if and only if the change committed. An entry
+carries the row's columns after the change, or nothing for a delete (a
+tombstone). A client applies entries in `seq` order and keeps the last `seq`
+as its cursor for GET /changes?since=.
+
+Writers cannot number entries themselves. One transaction can draw seq 10
+and commit after another drew 11, so a reader that already saw 11 would
+never see 10. Writers therefore insert entries without a `seq`, and
+`assign_seqs` numbers the committed ones later, in one short transaction.
+Entries that are still uncommitted are invisible to it and get a higher
+`seq` on a later pass, so readers only ever see a gap-free prefix. Only
+sequencers take SEQUENCE_LOCK, and they wait for it, so a reader never
+reads past entries another sequencer is still numbering; writers append
+without any lock. The feed reader sequences before every read.
+
+`ChangeLogCompactor` runs every CHANGES_COMPACT_INTERVAL. It first numbers
+every pending entry, since compaction only looks at numbered ones, so the
+log stays bounded even with no feed reader. It then drops entries once a
+newer entry for the same row supersedes them, because no cursor needs them
+any more. Tombstones are kept for CHANGES_TOMBSTONE_DAYS.
+Dropping one raises the horizon, and /changes answers 410 to cursors below
+the horizon, since those clients would miss the delete.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime
+from fastapi import HTTPException
+from . import metrics
+from .fieldsets import SCALARS
+
+logger = logging.getLogger(__name__)
+
+CHANGES_PAGE_MAX = int(os.getenv("CHANGES_PAGE_MAX", "1000"))
+CHANGES_COMPACT_INTERVAL = float(os.getenv("CHANGES_COMPACT_INTERVAL", "3600"))  # Seconds between compaction runs
+CHANGES_COMPACT_AFTER = float(os.getenv("CHANGES_COMPACT_AFTER", "3600"))        # Superseded entries are kept this many seconds
+CHANGES_TOMBSTONE_DAYS = float(os.getenv("CHANGES_TOMBSTONE_DAYS", "30"))        # How long offline clients can go without syncing
+
+CHANGES_SEQUENCE_BATCH = int(os.getenv("CHANGES_SEQUENCE_BATCH", "10000"))  # Entries numbered per pass
+
+# pg_advisory_xact_lock keys
+SEQUENCE_LOCK = 0x48504D5301
+COMPACT_LOCK = 0x48504D5302
+
+ENTITIES = tuple(SCALARS)
+
+entries_compacted = metrics.counter("changelog_compacted_total", "Change log entries removed by compaction", ("kind",))
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def snapshot(entity: str, row) -> dict:
+    """The row's columns, as the read endpoints return them."""
+    return {column: _jsonable(getattr(row, column)) for column in SCALARS[entity]}
+
+async def log_changes(tx, entity: str, action: str, rows: list):
+    """Append one entry per row; call inside the transaction that wrote the rows."""
+    if not rows:
+        return
+    entries = [{"id": row.id, "data": None if action == "deleted" else snapshot(entity, row)} for row in rows]
+    await tx.execute_raw(
+        'INSERT INTO "ChangeLog" ("entity", "entityId", "action", "data") '
+        'SELECT $1, e."id", $2, e."data" FROM jsonb_to_recordset($3::jsonb) AS e("id" int, "data" jsonb)',
+        entity, action, json.dumps(entries)
+    )
+
+async def max_id(tx, table: str) -> int:
+    rows = await tx.query_raw(f'SELECT COALESCE(MAX("id"), 0) AS "id" FROM "{table}"')
+    return int(rows[0]["id"])
+
+async def log_inserted(tx, entity: str, table: str, after_id: int):
+    """Log the rows of `table` this transaction inserted after `after_id`, e.g. by create_many.
+
+    create_many does not return rows. Rows committed concurrently by other
+    transactions can also have ids above `after_id`, so the rows are matched
+    on xmin, the id of the transaction that inserted them.
+    """
+    inserted = await tx.query_raw(
+        f'SELECT "id" FROM "{table}" WHERE "id" > $1 AND "xmin"::text = (txid_current() % 4294967296)::text',
+        after_id
+    )
+    if inserted:
+        model = getattr(tx, entity)
+        rows = await model.find_many(where={"id": {"in": [row["id"] for row in inserted]}})
+        await log_changes(tx, entity, "created", rows)
+
+async def assign_seqs(db) -> int:
+    """Number up to CHANGES_SEQUENCE_BATCH committed entries that have no `seq` yet, oldest first.
+
+    Waits for a sequencer running elsewhere, so on return every entry it
+    numbered is visible too.
+    """
+    async with db.tx() as tx:
+        await tx.execute_raw("SELECT pg_advisory_xact_lock($1::bigint)", SEQUENCE_LOCK)
+        return await tx.execute_raw(
+            'UPDATE "ChangeLog" c SET "seq" = p."seq" FROM ('
+            '  SELECT "id", nextval(\'"ChangeLog_seq_seq"\') AS "seq" FROM ('
+            '    SELECT "id" FROM "ChangeLog" WHERE "seq" IS NULL ORDER BY "id" LIMIT $1'
+            '  ) pending'
+            ') p WHERE c."id" = p."id"',
+            CHANGES_SEQUENCE_BATCH
+        )
+
+async def assign_all_seqs(db) -> int:
+    """Number every entry committed before the call, one batch at a time.
+
+    A short batch means no committed entry was left without a `seq`, so the
+    loop ends even while writers keep appending.
+    """
+    total = 0
+    while True:
+        count = await assign_seqs(db)
+        total += count
+        if count < CHANGES_SEQUENCE_BATCH:
+            return total
+
+async def latest_seq(db) -> int:
+    await assign_all_seqs(db)
+    rows = await db.query_raw('SELECT COALESCE(MAX("seq"), 0)::bigint AS "seq" FROM "ChangeLog"')
+    return int(rows[0]["seq"])
+
+async def horizon(db) -> int:
+    rows = await db.query_raw('SELECT "horizon" FROM "ChangeLogState" WHERE "id" = 1')
+    return int(rows[0]["horizon"]) if rows else 0
+
+async def read_changes(db, since: int, limit: int, entities: list[str]) -> dict:
+    """Entries after `since`, oldest first. Within a page only the newest entry per row is kept."""
+    await assign_seqs(db)
+    entries = await db.changelog.find_many(
+        where={"seq": {"gt": since}, "entity": {"in": entities}},
+        order={"seq": "asc"},
+        take=limit
+    )
+    # Read after the entries: a compaction that removed one of them has already raised the horizon
+    oldest_valid = await horizon(db)
+    if since < oldest_valid:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Cursor {since} is older than the retained change log ({oldest_valid}); sync from scratch"
+        )
+    newest = {}
+    for entry in entries:
+        key = (entry.entity, entry.entityId)
+        newest.pop(key, None)
+        newest[key] = entry
+    return {
+        "changes": [
+            {"seq": entry.seq, "entity": entry.entity, "id": entry.entityId, "action": entry.action, "data": entry.data}
+            for entry in newest.values()
+        ],
+        "next": entries[-1].seq if entries else since,
+        "hasMore": len(entries) == limit,
+    }
+
+async def compact(db) -> dict:
+    """One compaction pass; concurrent callers (other workers) skip while one runs."""
+    async with db.tx() as tx:
+        locked = await tx.query_raw("SELECT pg_try_advisory_xact_lock($1::bigint) AS locked", COMPACT_LOCK)
+        if not locked[0]["locked"]:
+            return {"skipped": True}
+        superseded = await tx.execute_raw(
+            'DELETE FROM "ChangeLog" c WHERE c."changedAt" < now() - make_interval(secs => $1::float8) '
+            'AND EXISTS (SELECT 1 FROM "ChangeLog" n WHERE n."entity" = c."entity" AND n."entityId" = c."entityId" AND n."seq" > c."seq")',
+            CHANGES_COMPACT_AFTER
+        )
+        result = await tx.query_raw(
+            'WITH dropped AS ('
+            '  DELETE FROM "ChangeLog" WHERE "action" = \'deleted\' AND "seq" IS NOT NULL AND "changedAt" < now() - make_interval(secs => $1::float8) RETURNING "seq"'
+            ') '
+            'UPDATE "ChangeLogState" SET "horizon" = GREATEST("horizon", (SELECT COALESCE(MAX("seq"), 0) FROM dropped)) '
+            'WHERE "id" = 1 RETURNING "horizon", (SELECT COUNT(*) FROM dropped)::int AS "tombstones"',
+            CHANGES_TOMBSTONE_DAYS * 86400
+        )
+    tombstones = result[0]["tombstones"] if result else 0
+    entries_compacted.inc(superseded, kind="superseded")
+    entries_compacted.inc(tombstones, kind="tombstone")
+    return {"superseded": superseded, "tombstones": tombstones, "horizon": int(result[0]["horizon"]) if result else 0}
+
+class ChangeLogCompactor:
+    def __init__(self, db, interval: float = CHANGES_COMPACT_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                await assign_all_seqs(self.db)
+                logger.info("Change log compaction: %s", await compact(self.db))
+            except Exception as e:
+                logger.error("Change log compaction failed: %s", e, exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,60 @@
+"""Weak ETags for the read routes, so repeat loads of unchanged data get a bodiless 304.
+
+The tag is a hash of the request path and query plus the (id, updatedAt) of
+every row in the response, nested relations included. It is computed from
+the rows the route already fetched, so a match skips serialization entirely.
+The tag is weak (W/"..."): the compression middleware sends the same data
+as identity, gzip or br bodies, and byte-different representations must not
+share a strong validator.
+Responses carry `Cache-Control: private, no-cache`, which lets browsers keep
+the body but revalidate it on every use.
+
+Last-Modified is not sent: a list's newest updatedAt does not change when a
+row is deleted, so it cannot prove that a list is unchanged.
+"""
+import hashlib
+from datetime import datetime
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+# Relation attributes whose rows also shape the response
+NESTED = ("patient", "doctor", "appointments", "medicalHistory")
+
+def _versions(row, out: list):
+    out.append(f"{type(row).__name__}:{getattr(row, 'id', '')}:{_stamp(getattr(row, 'updatedAt', None))}")
+    for relation in NESTED:
+        value = getattr(row, relation, None)
+        if isinstance(value, list):
+            out.append(f"{relation}[{len(value)}]")
+            for item in value:
+                _versions(item, out)
+        elif value is not None:
+            out.append(relation)
+            _versions(value, out)
+
+def _stamp(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def etag_for(request: Request, rows) -> str:
+    """Weak ETag for a response built from `rows` (one row or a list) for this request."""
+    parts = [request.url.path, request.url.query]
+    for row in rows if isinstance(rows, list) else [rows]:
+        _versions(row, parts)
+    return 'W/"' + hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32] + '"'
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 response when If-None-Match already names `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # If-None-Match uses weak comparison: only the opaque part of each tag is compared
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if etag.removeprefix("W/") in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+def tag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
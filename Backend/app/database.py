@@ -1,9 +1,61 @@
+import os
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from prisma import Prisma
+from dotenv import load_dotenv
+from .instrumentation import record_query
+
+load_dotenv()
+
+# Connection settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))          # Max connections held by the query engine
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))    # Seconds to wait for a free pooled connection
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_LOG_QUERIES = os.getenv("DB_LOG_QUERIES", "false").lower() == "true"
+
+def pooled_database_url(url: str | None) -> str | None:
+    """Add the Prisma pool parameters to the database URL, keeping any that are already set."""
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.setdefault("connection_limit", str(DB_POOL_SIZE))
+    query.setdefault("pool_timeout", str(DB_POOL_TIMEOUT))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+class InstrumentedPrisma(Prisma):
+    """Prisma client that reports every operation's latency to app.instrumentation.
+
+    Model queries, raw queries and transaction clients all go through `_execute`.
+    """
+
+    async def _execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super()._execute(*args, **kwargs)
+        finally:
+            record_query(kwargs.get("model"), kwargs.get("method"), kwargs.get("arguments"), time.perf_counter() - start)
+
+def create_client() -> Prisma:
+    url = pooled_database_url(os.getenv("DATABASE_URL"))
+    return InstrumentedPrisma(
+        log_queries=DB_LOG_QUERIES,
+        connect_timeout=timedelta(seconds=DB_CONNECT_TIMEOUT),
+        datasource={"url": url} if url else None,
+    )
+
+# One client for the whole process; the query engine pools connections behind it.
+db = create_client()
+
+async def connect_db():
+    if not db.is_connected():
+        await db.connect()
+
+async def disconnect_db():
+    if db.is_connected():
+        await db.disconnect()
 
 async def get_db():
-    db = Prisma(log_queries=True)
-    await db.connect()
-    try:
-        yield db
-    finally:
-        await db.disconnect()
\ No newline at end of file
+    """FastAPI dependency returning the shared, already-connected client."""
+    return db
@@ -0,0 +1,268 @@
+"""Live change events for open screens, pushed over Server-Sent Events at GET /events.
+
+The write routes call `publish` with compact events such as
+    {"entity": "appointment", "action": "updated", "id": 7, "doctorId": 2, "patientId": 5,
+     "dateTime": "...", "status": "Confirmed", "purpose": null, "previous": {"doctorId": 1, "dateTime": "..."}}
+so a screen can apply a change without refetching its lists.
+
+With EVENTS_BACKEND=postgres (the default), `publish` sends events with
+NOTIFY on EVENTS_CHANNEL through the route's Prisma client. Every worker
+LISTENs on its own asyncpg connection and fans the events out to its own
+subscribers, so a change made through one worker reaches screens connected
+to any other. With EVENTS_BACKEND=memory, events are delivered in-process
+only, which suits a single worker or a benchmark.
+
+Each event is encoded once into an SSE frame that all subscribers share.
+A subscriber is sent a `resync` event, telling it to refetch, when it falls
+behind by EVENTS_CLIENT_QUEUE frames. The same happens when it reconnects
+with a Last-Event-ID that is no longer in this worker's replay buffer, and
+for every subscriber after the LISTEN connection was lost.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from . import metrics
+from .scheduling import utc
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "postgres")                # "postgres" (LISTEN/NOTIFY) or "memory"
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "hpms_changes")
+EVENTS_CLIENT_QUEUE = int(os.getenv("EVENTS_CLIENT_QUEUE", "256"))      # Frames buffered per client before it must resync
+EVENTS_REPLAY = int(os.getenv("EVENTS_REPLAY", "1000"))                 # Recent events kept for Last-Event-ID resumption
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "5000"))       # Open streams per worker
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))           # Seconds between keep-alives and LISTEN health checks
+NOTIFY_PAYLOAD_MAX = 7900  # PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+
+ENTITIES = {"appointments": "appointment", "patients": "patient", "doctors": "doctor"}
+
+# Parameters asyncpg does not understand; the rest of DATABASE_URL is shared with Prisma
+PRISMA_URL_PARAMETERS = {"schema", "connection_limit", "pool_timeout", "connect_timeout", "pgbouncer", "socket_timeout"}
+
+subscribers_open = metrics.gauge("events_subscribers", "Open /events streams")
+events_received = metrics.counter("events_received_total", "Change events fanned out by this worker", ("entity",))
+resyncs_sent = metrics.counter("events_resyncs_total", "Subscribers told to refetch", ("reason",))
+
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+def _iso(value: datetime) -> str:
+    return utc(value).isoformat()
+
+def appointment_event(action: str, appointment, previous=None) -> dict:
+    event = {
+        "entity": "appointment",
+        "action": action,
+        "id": appointment.id,
+        "patientId": appointment.patientId,
+        "doctorId": appointment.doctorId,
+        "dateTime": _iso(appointment.dateTime),
+        "status": appointment.status,
+        "purpose": appointment.purpose,
+    }
+    # Screens filtered to the old doctor or day need to see an appointment leave
+    if previous is not None and (
+        previous.doctorId != appointment.doctorId or utc(previous.dateTime) != utc(appointment.dateTime)
+    ):
+        event["previous"] = {"doctorId": previous.doctorId, "dateTime": _iso(previous.dateTime)}
+    return event
+
+def patient_event(action: str, patient) -> dict:
+    return {
+        "entity": "patient", "action": action, "id": patient.id,
+        "name": patient.name, "email": patient.email, "phone": patient.phone,
+    }
+
+def doctor_event(action: str, doctor) -> dict:
+    return {"entity": "doctor", "action": action, "id": doctor.id, "name": doctor.name, "specialty": doctor.specialty}
+
+class Subscription:
+    def __init__(self, entities: set[str], doctor_ids: set[int], day: date | None):
+        self.entities = entities
+        self.doctor_ids = doctor_ids
+        self.day = day.isoformat() if day else None
+        self.queue = asyncio.Queue(EVENTS_CLIENT_QUEUE)
+
+    def _matches(self, doctor_id: int, when: str) -> bool:
+        if self.doctor_ids and doctor_id not in self.doctor_ids:
+            return False
+        return self.day is None or when[:10] == self.day  # Event times are UTC ISO strings
+
+    def wants(self, event: dict) -> bool:
+        entity = event.get("entity")
+        if entity not in self.entities:
+            return False
+        if entity == "appointment":
+            previous = event.get("previous")
+            return self._matches(event["doctorId"], event["dateTime"]) or (
+                previous is not None and self._matches(previous["doctorId"], previous["dateTime"])
+            )
+        if entity == "doctor" and self.doctor_ids:
+            return event["id"] in self.doctor_ids
+        return True
+
+    def send(self, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _replace_queued(self, frame: bytes | None):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+
+    def resync(self, reason: str):
+        """Replace whatever is queued with a single `resync`."""
+        self._replace_queued(RESYNC_FRAME)
+        resyncs_sent.inc(reason=reason)
+
+    def close(self):
+        self._replace_queued(None)  # The stream ends when it reads None
+
+class EventBroker:
+    def __init__(self, backend: str = EVENTS_BACKEND, max_clients: int = EVENTS_MAX_CLIENTS):
+        self.backend = backend
+        self.max_clients = max_clients
+        self.subscribers: set[Subscription] = set()
+        self.replay = deque(maxlen=EVENTS_REPLAY)  # (sequence, event, frame)
+        self.boot = uuid.uuid4().hex[:8]  # Event ids are only meaningful to the worker that issued them
+        self.sequence = 0
+        self._task = None
+
+    @property
+    def full(self) -> bool:
+        return len(self.subscribers) >= self.max_clients
+
+    def dispatch(self, events: list[dict]):
+        for event in events:
+            self.sequence += 1
+            frame = (
+                f"id: {self.boot}-{self.sequence}\nevent: change\n"
+                f"data: {json.dumps(event, separators=(',', ':'), default=str)}\n\n"
+            ).encode()
+            self.replay.append((self.sequence, event, frame))
+            events_received.inc(entity=event.get("entity", "unknown"))
+            for subscription in self.subscribers:
+                if subscription.wants(event) and not subscription.send(frame):
+                    subscription.resync("slow_client")
+
+    def subscribe(self, entities: set[str], doctor_ids: set[int], day: date | None, last_event_id: str | None = None):
+        subscription = Subscription(entities, doctor_ids, day)
+        if last_event_id:
+            self._replay(subscription, last_event_id)
+        self.subscribers.add(subscription)
+        subscribers_open.set(len(self.subscribers))
+        return subscription
+
+    def _replay(self, subscription: Subscription, last_event_id: str):
+        boot, _, sequence = last_event_id.partition("-")
+        oldest = self.replay[0][0] if self.replay else self.sequence + 1
+        if boot != self.boot or not sequence.isdigit() or int(sequence) < oldest - 1:
+            subscription.resync("replay_gap")
+            return
+        for number, event, frame in self.replay:
+            if number > int(sequence) and subscription.wants(event) and not subscription.send(frame):
+                subscription.resync("replay_gap")
+                return
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        subscribers_open.set(len(self.subscribers))
+
+    def resync_all(self, reason: str):
+        for subscription in self.subscribers:
+            subscription.resync(reason)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.dispatch(json.loads(payload))
+        except ValueError as e:
+            logger.warning("Ignoring malformed change notification: %s", e)
+
+    async def listen(self):
+        """Keep a LISTEN connection open, reconnecting with backoff; events missed while down trigger a resync."""
+        import asyncpg
+        delay, connected_before = 1.0, False
+        while True:
+            try:
+                connection = await asyncpg.connect(listen_dsn(os.getenv("DATABASE_URL")))
+            except Exception as e:
+                logger.error("Change event listener cannot connect, retrying in %.0fs: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            try:
+                await connection.add_listener(EVENTS_CHANNEL, self._on_notify)
+                if connected_before:
+                    self.resync_all("listener_reconnected")
+                connected_before = True
+                while True:
+                    await asyncio.sleep(EVENTS_HEARTBEAT)
+                    await connection.execute("SELECT 1")  # Notices a dead socket that would otherwise sit silent
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Change event listener lost its connection: %s", e)
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+
+    def start(self):
+        if self.backend == "postgres" and self._task is None:
+            self._task = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self.subscribers):
+            subscription.close()
+
+def listen_dsn(url: str | None) -> str | None:
+    """DATABASE_URL without the Prisma-only query parameters."""
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in PRISMA_URL_PARAMETERS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def notify_payloads(events: list[dict]) -> list[str]:
+    """JSON arrays of events, each small enough for one NOTIFY."""
+    payloads, chunk, size = [], [], 2
+    for event in events:
+        encoded = json.dumps(event, separators=(",", ":"), default=str)
+        if chunk and size + len(encoded) + 1 > NOTIFY_PAYLOAD_MAX:
+            payloads.append("[" + ",".join(chunk) + "]")
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        payloads.append("[" + ",".join(chunk) + "]")
+    return payloads
+
+broker = EventBroker()
+
+async def publish(db, *events: dict):
+    """Broadcast change events to every worker's subscribers. Failures are logged; the write already happened."""
+    if not events:
+        return
+    try:
+        if broker.backend == "memory":
+            broker.dispatch(list(events))
+            return
+        for payload in notify_payloads(list(events)):
+            await db.execute_raw("SELECT pg_notify($1, $2)", EVENTS_CHANNEL, payload)
+    except Exception as e:
+        logger.error("Could not publish %s change events: %s", len(events), e)
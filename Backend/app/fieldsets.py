@@ -0,0 +1,97 @@
+"""Sparse fieldsets (`fields=`) and selective relation loading (`include=`) for the read endpoints.
+
+    GET /patients/7?include=appointments:20,medicalHistory&fields=id,name,appointments.dateTime
+
+`include` names the relations to load. A to-many relation may carry its own
+row limit (`name:N`, default NESTED_LIMIT, capped at NESTED_LIMIT_MAX) and is
+returned newest first. Relations map onto Prisma `include` with `take`, so
+anything not asked for is never queried. `fields` names the columns to
+return, using `relation.column` for included relations. Prisma Client Python
+has no per-query `select`, so columns are trimmed when the response is built.
+"""
+import os
+from fastapi import HTTPException
+
+NESTED_LIMIT = int(os.getenv("NESTED_LIMIT", "50"))
+NESTED_LIMIT_MAX = int(os.getenv("NESTED_LIMIT_MAX", "500"))
+
+# Scalar columns per model, in response order
+SCALARS = {
+    "patient": ["id", "name", "email", "phone", "dob", "createdAt", "updatedAt"],
+    "doctor": ["id", "name", "specialty", "createdAt", "updatedAt"],
+    "appointment": ["id", "patientId", "doctorId", "dateTime", "status", "purpose", "createdAt", "updatedAt"],
+    "medicalhistory": ["id", "patientId", "diagnosis", "treatment", "date", "updatedAt"],
+}
+
+# relation -> (target model, ordering for to-many relations or None for to-one)
+RELATIONS = {
+    "patient": {
+        "appointments": ("appointment", {"dateTime": "desc"}),
+        "medicalHistory": ("medicalhistory", {"date": "desc"}),
+    },
+    "doctor": {"appointments": ("appointment", {"dateTime": "desc"})},
+    "appointment": {"patient": ("patient", None), "doctor": ("doctor", None)},
+    "medicalhistory": {"patient": ("patient", None)},
+}
+
+class Fieldset:
+    def __init__(self, model: str, include: dict, fields: dict):
+        self.model = model
+        self.include = include  # relation -> row limit (None for to-one)
+        self.fields = fields    # None (top level) or relation -> requested columns
+
+    def prisma_include(self) -> dict | None:
+        if not self.include:
+            return None
+        include = {}
+        for relation, limit in self.include.items():
+            _, order = RELATIONS[self.model][relation]
+            include[relation] = True if order is None else {"take": limit, "order_by": order}
+        return include
+
+    def project(self, row) -> dict:
+        record = {column: getattr(row, column) for column in self.fields.get(None) or SCALARS[self.model]}
+        for relation in self.include:
+            target, _ = RELATIONS[self.model][relation]
+            columns = self.fields.get(relation) or SCALARS[target]
+            value = getattr(row, relation)
+            if isinstance(value, list):
+                record[relation] = [{column: getattr(item, column) for column in columns} for item in value]
+            else:
+                record[relation] = None if value is None else {column: getattr(value, column) for column in columns}
+        return record
+
+    def project_all(self, rows: list) -> list[dict]:
+        return [self.project(row) for row in rows]
+
+def parse_fieldset(model: str, fields: str | None, include: str | None, default_include: str = "") -> Fieldset:
+    """Validate the `fields`/`include` query parameters; unknown names are a 400."""
+    relations = RELATIONS[model]
+    chosen = {}
+    for token in filter(None, (part.strip() for part in (default_include if include is None else include).split(","))):
+        name, _, limit = token.partition(":")
+        if name not in relations:
+            raise HTTPException(status_code=400, detail=f"Unknown relation '{name}' for include, expected one of: {', '.join(relations)}")
+        if relations[name][1] is None:
+            chosen[name] = None
+            continue
+        try:
+            chosen[name] = min(int(limit), NESTED_LIMIT_MAX) if limit else NESTED_LIMIT
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid limit '{limit}' for include '{name}'")
+        if chosen[name] < 1:
+            raise HTTPException(status_code=400, detail=f"Invalid limit '{limit}' for include '{name}'")
+    columns = {}
+    for token in filter(None, (part.strip() for part in (fields or "").split(","))):
+        relation, _, column = token.rpartition(".")
+        target = model
+        if relation:
+            if relation not in relations:
+                raise HTTPException(status_code=400, detail=f"Unknown relation '{relation}' in fields")
+            target = relations[relation][0]
+            if relation not in chosen:  # Asking for a relation's columns implies loading it
+                chosen[relation] = None if relations[relation][1] is None else NESTED_LIMIT
+        if column not in SCALARS[target]:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{token}'")
+        columns.setdefault(relation or None, []).append(column)
+    return Fieldset(model, chosen, columns)
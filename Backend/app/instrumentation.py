@@ -0,0 +1,120 @@
+"""Per-request latency and database query instrumentation.
+
+`RequestMetricsMiddleware` times every HTTP request by route template (for
+example /patients/{patient_id}). It also counts the Prisma operations the
+request issued, and the time they took, so N+1 loops show up as a high
+per-request query count. `record_query` is called for every operation by the
+client in app.database. Operations slower than SLOW_QUERY_SECONDS are counted
+and kept as samples for GET /metrics/slow-queries.
+
+Samples name the request ID, model, operation and argument keys. Raw SQL is kept,
+but query values are not, so patient data never ends up in the samples.
+"""
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from . import metrics
+from .log_config import request_id
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.2"))  # Operations at least this slow are sampled
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "100"))    # Most recent slow samples kept per worker
+REQUEST_QUERY_WARN = int(os.getenv("REQUEST_QUERY_WARN", "25"))     # Log requests issuing at least this many queries
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route")
+)
+requests_total = metrics.counter("http_requests_total", "Requests by route template and status", ("method", "route", "status"))
+request_queries = metrics.histogram(
+    "http_request_db_queries", "Database operations issued per request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+request_query_time = metrics.histogram(
+    "http_request_db_seconds", "Time spent in database operations per request", ("method", "route")
+)
+query_duration = metrics.histogram("db_query_duration_seconds", "Database operation latency", ("model", "operation"))
+slow_queries = metrics.counter("db_slow_queries_total", "Operations slower than SLOW_QUERY_SECONDS", ("model", "operation"))
+
+slow_samples = deque(maxlen=SLOW_QUERY_SAMPLES)
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "query_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+def route_label(scope: dict) -> str:
+    """The matched route's path template; unmatched paths share one label to bound cardinality."""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+def record_query(model, operation: str | None, arguments: dict | None, seconds: float):
+    model_name = getattr(model, "__name__", None) or "raw"
+    operation = str(operation or "unknown")
+    query_duration.observe(seconds, model=model_name, operation=operation)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += seconds
+    if seconds < SLOW_QUERY_SECONDS:
+        return
+    slow_queries.inc(model=model_name, operation=operation)
+    route = route_label(stats.scope) if stats is not None else None
+    sample = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "route": route,
+        "request_id": request_id.get(),
+        "model": model_name,
+        "operation": operation,
+        "duration_ms": round(seconds * 1000, 2),
+        "arguments": sorted(arguments or ()),
+    }
+    if isinstance((arguments or {}).get("query"), str):
+        sample["query"] = arguments["query"]
+    slow_samples.append(sample)
+    logger.warning("Slow query: %s.%s took %sms (route %s)", model_name, operation, sample['duration_ms'], route)
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so it adds no extra task or response buffering per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            method, route = scope["method"], route_label(scope)
+            request_duration.observe(elapsed, method=method, route=route)
+            requests_total.inc(method=method, route=route, status=status)
+            request_queries.observe(stats.queries, method=method, route=route)
+            request_query_time.observe(stats.query_seconds, method=method, route=route)
+            if stats.queries >= REQUEST_QUERY_WARN:
+                logger.warning(
+                    "%s %s issued %d queries (%.1fms of %.1fms); possible N+1",
+                    method, route, stats.queries, stats.query_seconds * 1000, elapsed * 1000
+                )
@@ -0,0 +1,183 @@
+"""Structured logging that keeps formatting and output off the request path.
+
+`setup_logging` installs one root handler. That handler only puts records on
+a bounded queue. A writer thread (logging.handlers.QueueListener) formats
+them, as JSON lines by default, and writes them to stdout. Records dropped
+because the levels filtered them out are never formatted at all. When the
+queue is full, records are dropped and counted (log_records_dropped_total)
+rather than blocking the event loop.
+
+Every record carries the request ID of the HTTP request that logged it.
+`RequestIdMiddleware` reads the ID from the incoming X-Request-ID header, or
+generates one, and echoes it in the response.
+
+/events accepts its JWT as ?token= (EventSource cannot set headers), so
+uvicorn's access log lines have that value masked.
+
+Settings:
+    LOG_LEVEL         root level (INFO)
+    LOG_LEVELS        per-logger levels, e.g. "app.routes.appointments=DEBUG,uvicorn.access=WARNING"
+    LOG_SAMPLE_RATES  fraction of DEBUG/INFO records kept per logger prefix, e.g. "app.routes=0.1";
+                      WARNING and above are always kept
+    LOG_FORMAT        json or text
+    LOG_QUEUE_SIZE    records buffered for the writer thread; 0 writes synchronously
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from . import metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_MAX_LENGTH = 128
+TOKEN_QUERY = re.compile(r"([?&]token=)[^&\s]*")
+
+records_dropped = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+records_sampled_out = metrics.counter("log_records_sampled_out_total", "DEBUG/INFO records skipped by LOG_SAMPLE_RATES")
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener: QueueListener | None = None
+
+def parse_pairs(value: str) -> dict[str, str]:
+    """"a=1,b=2" -> {"a": "1", "b": "2"}; blank entries are ignored."""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, setting = item.partition("=")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+class ContextFilter(logging.Filter):
+    """Adds `request_id` to each record and applies LOG_SAMPLE_RATES to DEBUG and INFO records."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        # Longest matching logger prefix wins, resolved once per logger name
+        if name not in self._resolved:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            self._resolved[name] = self.rates[max(matches, key=len)] if matches else 1.0
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.rates:
+            rate = self.rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                records_sampled_out.inc()
+                return False
+        record.request_id = request_id.get()
+        return True
+
+class RedactTokenFilter(logging.Filter):
+    """Masks ?token= in uvicorn.access records, whose args are (client, method, path, http_version, status)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple) and len(record.args) > 2 and "token=" in str(record.args[2]):
+            args = list(record.args)
+            args[2] = TOKEN_QUERY.sub(r"\1[redacted]", str(args[2]))
+            record.args = tuple(args)
+        return True
+
+_redact_token = RedactTokenFilter()
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+class NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock QueueHandler formats here, on the caller's thread; leave that to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc()
+
+def setup_logging():
+    """Configure the root logger from the LOG_* settings; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    if LOG_QUEUE_SIZE > 0:
+        handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+        atexit.register(_listener.stop)  # Drains the queue, so shutdown messages are not lost
+    else:
+        handler = output
+    handler.addFilter(ContextFilter({name: float(rate) for name, rate in parse_pairs(LOG_SAMPLE_RATES).items()}))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_pairs(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+    # On the logger rather than our handler, so uvicorn's own access handler is covered too
+    logging.getLogger("uvicorn.access").addFilter(_redact_token)  # Added once however often this runs
+
+class RequestIdMiddleware:
+    """Binds each HTTP request to an ID for its log records and returns the ID as X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        # Only accept IDs that are safe to echo and to put in a log line
+        if not (0 < len(incoming) <= REQUEST_ID_MAX_LENGTH and incoming.isprintable()):
+            incoming = uuid.uuid4().hex
+        token = request_id.set(incoming)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, incoming.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
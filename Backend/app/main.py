@@ -34,19 +34,58 @@
 # async def root():
 #     return {"message": "Welcome to the HPMS API - Healthcare Patient Management System"}
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import patients, appointments, doctors, medical_histories, auth, users
-from .database import get_db
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from .routes import patients, appointments, doctors, medical_histories, auth, users, metrics, stats, export, bulk_import, search, events, changes
+from .database import connect_db, disconnect_db, db
+from .notifications import OutboxWorker, PrismaOutboxStore, build_providers
+from .events import broker
+from .changes import ChangeLogCompactor
+from .reminders import REMINDERS_ENABLED, PrismaReminderStore, ReminderScanner
+from .instrumentation import RequestMetricsMiddleware
+from .log_config import RequestIdMiddleware, setup_logging
+from . import passwords
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Bytes; smaller bodies are sent as-is
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "5"))
+
+setup_logging()  # JSON lines via a background writer; see app/log_config.py for LOG_* settings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared Prisma client once per worker instead of once per request
+    await connect_db()
+    outbox_worker = OutboxWorker(PrismaOutboxStore(db), build_providers())
+    outbox_worker.start()
+    broker.start()
+    compactor = ChangeLogCompactor(db)
+    compactor.start()
+    reminders = ReminderScanner(PrismaReminderStore(db))
+    if REMINDERS_ENABLED:
+        reminders.start()
+    try:
+        yield
+    finally:
+        await reminders.stop()
+        await compactor.stop()
+        await broker.stop()
+        await outbox_worker.stop()
+        passwords.shutdown()
+        await disconnect_db()
+
 app = FastAPI(
     title="Healthcare Patient Management System (HPMS)",
     description="API for managing patient records, appointments, medical histories, and notifications.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson encodes the routes' JSON several times faster than json.dumps
 )
 
 # CORS configuration - Updated for production
@@ -58,6 +97,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Brotli when the optional brotli-asgi package is installed (it falls back to gzip for clients without br)
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, quality=COMPRESSION_LEVEL, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=COMPRESSION_LEVEL)
+
+# Outermost, so latency covers the whole stack; exposed at /metrics
+app.add_middleware(RequestMetricsMiddleware)
+# Outside the metrics middleware so its slow-request warnings carry the request ID
+app.add_middleware(RequestIdMiddleware)
+
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -65,6 +116,13 @@ app.include_router(patients.router)
 app.include_router(appointments.router)
 app.include_router(doctors.router)
 app.include_router(medical_histories.router)
+app.include_router(stats.router)
+app.include_router(export.router)
+app.include_router(bulk_import.router)
+app.include_router(search.router)
+app.include_router(events.router)
+app.include_router(changes.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
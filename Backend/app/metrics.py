@@ -0,0 +1,111 @@
+"""Minimal in-process metrics registry rendered in the Prometheus text format at /metrics.
+
+Values are per worker process; Prometheus aggregates across workers when scraping.
+"""
+import math
+from collections import defaultdict
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+def _label_key(label_names: tuple, labels: dict) -> tuple:
+    if set(labels) != set(label_names):
+        raise ValueError(f"Expected labels {label_names}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_names: tuple, key: tuple, extra: dict | None = None) -> str:
+    pairs = list(zip(label_names, key)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.values[_label_key(self.label_names, labels)] += amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(self.label_names, labels), 0.0)
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _format_labels(self.label_names, key), value
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(self.label_names, labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.counts = defaultdict(lambda: [0] * len(self.buckets))
+        self.sums = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        counts = self.counts[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self.sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self.counts.get(_label_key(self.label_names, labels), ()))
+
+    def samples(self):
+        for key, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(self.label_names, key, {"le": _format_value(bound)}), cumulative
+            yield f"{self.name}_count", _format_labels(self.label_names, key), cumulative
+            yield f"{self.name}_sum", _format_labels(self.label_names, key), self.sums[key]
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+def counter(name: str, documentation: str, labels: tuple = ()) -> Counter:
+    return _register(Counter(name, documentation, labels))
+
+def gauge(name: str, documentation: str, labels: tuple = ()) -> Gauge:
+    return _register(Gauge(name, documentation, labels))
+
+def histogram(name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, documentation, labels, buckets))
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,495 @@
+"""Appointment notification outbox.
+
+Route handlers only write rows to the NotificationOutbox table, in the same
+transaction as the change they announce; OutboxWorker delivers them in the
+background. Claimed messages are grouped per provider
+into bulk requests, each provider is held to a token-bucket rate limit, and
+repeated updates to the same appointment inside OUTBOX_COALESCE_WINDOW are
+merged into the newest message. Only messages of the same `kind` coalesce,
+so a change confirmation never replaces a reminder. Failed sends are
+retried with exponential backoff and dead-lettered once they run out of
+attempts. A message the provider refuses outright (a 400 for a single
+recipient, such as an invalid address) is dead-lettered at once; rate
+limits, server errors and transport errors are retried.
+"""
+import asyncio
+import html
+import logging
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from . import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Provider configuration
+NOTIFICATION_PROVIDER = os.getenv("NOTIFICATION_PROVIDER", "live")  # "live" or "fake"
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+SENDGRID_SENDER_EMAIL = os.getenv("SENDGRID_SENDER_EMAIL")
+
+# Worker configuration
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))          # Messages claimed per round
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2.0"))   # Seconds before the first retry
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300.0"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "60.0"))                # Seconds a claimed message stays hidden
+OUTBOX_COALESCE_WINDOW = float(os.getenv("OUTBOX_COALESCE_WINDOW", "5.0"))  # Seconds a new message waits for follow-up updates
+
+# Provider limits
+SMS_RATE_LIMIT = float(os.getenv("SMS_RATE_LIMIT", "10"))       # Requests per second, 0 disables the limit
+SMS_BURST = int(os.getenv("SMS_BURST", "20"))
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "5"))
+EMAIL_BURST = int(os.getenv("EMAIL_BURST", "10"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "500"))     # SendGrid accepts up to 1000 personalizations per request
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
+# Set whenever new messages are written so the local worker drains them without waiting for the next poll
+outbox_wakeup = asyncio.Event()
+
+queue_depth = metrics.gauge("notification_queue_depth", "Outbox messages waiting to be sent")
+batch_size = metrics.histogram(
+    "notification_batch_size", "Messages per provider request", ("channel",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+send_latency = metrics.histogram("notification_send_seconds", "Provider request latency", ("channel",))
+messages_total = metrics.counter("notification_messages_total", "Outbox messages by final outcome", ("channel", "outcome"))
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+# --- Providers ---
+
+class BatchRejected(Exception):
+    """The provider refused a multi-message request as a whole, e.g. over one bad recipient; send its messages one by one."""
+
+class PermanentFailure(Exception):
+    """The provider refused this single message and would refuse it again; dead-letter it without retrying."""
+
+class TwilioSmsProvider:
+    channel = "sms"
+    max_batch = 1  # Twilio has no bulk send endpoint; each SMS is its own rate-limited request
+
+    def __init__(self):
+        from twilio.rest import Client
+        self.client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+
+    def send_batch(self, messages):
+        from twilio.base.exceptions import TwilioRestException
+        for message in messages:
+            try:
+                self.client.messages.create(body=message.body, from_=TWILIO_PHONE_NUMBER, to=message.recipient)
+            except TwilioRestException as e:
+                # 400 means the request itself is invalid, e.g. an unreachable number
+                if e.status == 400:
+                    raise PermanentFailure(str(e)) from e
+                raise
+
+class SendGridEmailProvider:
+    channel = "email"
+    max_batch = EMAIL_BATCH_SIZE
+
+    def __init__(self):
+        from sendgrid import SendGridAPIClient
+        self.client = SendGridAPIClient(SENDGRID_API_KEY)
+
+    def build_mail(self, messages):
+        """One request for the whole batch: every message is a personalization filling in the shared body."""
+        from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+        email = Mail(
+            from_email=SENDGRID_SENDER_EMAIL,
+            subject=messages[0].subject,
+            plain_text_content="-text-",
+            html_content="<p>-html-</p>",
+        )
+        for message in messages:
+            personalization = Personalization()
+            personalization.add_to(To(message.recipient))
+            personalization.subject = message.subject
+            personalization.add_substitution(Substitution("-text-", message.body))
+            # Patient and doctor names end up in the HTML part, so escape them there
+            personalization.add_substitution(Substitution("-html-", html.escape(message.body).replace("\n", "<br>")))
+            email.add_personalization(personalization)
+        return email
+
+    def send_batch(self, messages):
+        from python_http_client.exceptions import BadRequestsError
+        try:
+            self.client.send(self.build_mail(messages))
+        except BadRequestsError as e:
+            # SendGrid validates every personalization and rejects the request if any one is invalid
+            if len(messages) > 1:
+                raise BatchRejected(str(e)) from e
+            raise PermanentFailure(str(e)) from e
+
+class FakeProvider:
+    """Local stand-in for a provider: each request sleeps for `latency` seconds and a `failure_rate` fraction of them fail."""
+
+    def __init__(self, channel: str, latency: float = 0.0, failure_rate: float = 0.0, max_batch: int = 1):
+        self.channel = channel
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_batch = max_batch
+        self.sent = []
+        self.requests = 0
+
+    def send_batch(self, messages):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError(f"Fake {self.channel} provider failure")
+        self.sent.extend(messages)
+
+def build_providers(kind: str = NOTIFICATION_PROVIDER) -> dict:
+    if kind == "fake":
+        return {"sms": FakeProvider("sms"), "email": FakeProvider("email", max_batch=EMAIL_BATCH_SIZE)}
+    return {"sms": TwilioSmsProvider(), "email": SendGridEmailProvider()}
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+def build_rate_limits() -> dict:
+    return {
+        "sms": TokenBucket(SMS_RATE_LIMIT, SMS_BURST),
+        "email": TokenBucket(EMAIL_RATE_LIMIT, EMAIL_BURST),
+    }
+
+# --- Enqueueing ---
+
+def contact_messages(patient, subject: str, body: str, appointment_id: int | None) -> list[dict]:
+    """An SMS and/or an email carrying `body`, depending on the patient's contact details."""
+    messages = []
+    if patient.phone:
+        messages.append({
+            "channel": "sms",
+            "recipient": patient.phone,
+            "body": body,
+            "appointmentId": appointment_id,
+        })
+    else:
+        logger.warning("No phone number provided for patient: %s", patient.id)
+    if patient.email and EMAIL_PATTERN.match(patient.email):
+        messages.append({
+            "channel": "email",
+            "recipient": patient.email,
+            "subject": subject,
+            "body": body,
+            "appointmentId": appointment_id,
+        })
+    else:
+        logger.warning("No valid email provided for patient: %s", patient.id)
+    return messages
+
+def describe_appointment(doctor, appointment) -> str:
+    return (
+        f"Date: {appointment.dateTime.isoformat()}, "
+        f"Doctor: {doctor.name}, "
+        f"Purpose: {appointment.purpose or 'N/A'}."
+    )
+
+def build_messages(patient, doctor, appointment, action: str) -> list[dict]:
+    """Outbox rows for one appointment change."""
+    body = f"Your appointment has been {action}: {describe_appointment(doctor, appointment)}"
+    return contact_messages(patient, f"Appointment {action.capitalize()} Confirmation", body, appointment.id)
+
+def build_summary_messages(patient, changes: list) -> list[dict]:
+    """One combined set of outbox rows for several changes, given as (action, doctor, appointment) tuples."""
+    lines = [f"- {action.capitalize()}: {describe_appointment(doctor, appointment)}" for action, doctor, appointment in changes]
+    body = f"Your appointments have changed ({len(changes)}):\n" + "\n".join(lines)
+    # Not tied to one appointment, so it neither coalesces with nor supersedes per-appointment messages
+    return contact_messages(patient, "Appointment Changes Confirmation", body, None)
+
+async def enqueue_notifications(tx, patient, doctor, appointment, action: str):
+    """Queue the SMS/email for an appointment change; call inside the transaction that makes the change.
+
+    The messages commit or roll back with the change, so a crash after the
+    booking commits cannot lose its confirmation.
+    """
+    messages = build_messages(patient, doctor, appointment, action)
+    if messages:
+        await PrismaOutboxStore(tx).enqueue(messages)
+        outbox_wakeup.set()
+
+async def enqueue_summary_notifications(tx, patient, changes: list):
+    """Queue one combined SMS/email covering several appointment changes for a patient, inside the caller's transaction."""
+    messages = build_summary_messages(patient, changes)
+    if messages:
+        await PrismaOutboxStore(tx).enqueue(messages)
+        outbox_wakeup.set()
+
+# --- Stores ---
+
+class PrismaOutboxStore:
+    def __init__(self, db):
+        self.db = db
+
+    async def enqueue(self, messages: list[dict], delay: float = OUTBOX_COALESCE_WINDOW):
+        """Write new messages, superseding any still-pending message of the same kind for the same appointment, channel and recipient."""
+        for message in messages:
+            if message.get("appointmentId") is None:
+                continue
+            superseded = await self.db.notificationoutbox.update_many(
+                where={
+                    "kind": message.get("kind", "notice"),
+                    "appointmentId": message["appointmentId"],
+                    "channel": message["channel"],
+                    "recipient": message["recipient"],
+                    "status": "pending",
+                },
+                data={"status": "coalesced"}
+            )
+            if superseded:
+                messages_total.inc(superseded, channel=message["channel"], outcome="coalesced")
+        available_at = utcnow() + timedelta(seconds=delay)
+        await self.db.notificationoutbox.create_many(
+            data=[{**message, "availableAt": available_at} for message in messages]
+        )
+
+    async def depth(self) -> int:
+        return await self.db.notificationoutbox.count(where={"status": {"in": ["pending", "sending"]}})
+
+    async def claim(self, limit: int, lease: float) -> list:
+        """Lease up to `limit` due messages. Expired leases are picked up again, so a crashed worker loses nothing."""
+        now = utcnow()
+        candidates = await self.db.notificationoutbox.find_many(
+            where={"status": {"in": ["pending", "sending"]}, "availableAt": {"lte": now}},
+            order={"availableAt": "asc"},
+            take=limit
+        )
+        claimed = []
+        for row in candidates:
+            # Conditional update: only one worker wins a row that several of them saw
+            count = await self.db.notificationoutbox.update_many(
+                where={"id": row.id, "status": row.status, "availableAt": row.availableAt},
+                data={
+                    "status": "sending",
+                    "availableAt": now + timedelta(seconds=lease),
+                    "attempts": {"increment": 1},
+                }
+            )
+            if count:
+                row.attempts += 1
+                claimed.append(row)
+        return claimed
+
+    async def mark_sent(self, messages: list):
+        await self.db.notificationoutbox.update_many(
+            where={"id": {"in": [message.id for message in messages]}},
+            data={"status": "sent", "sentAt": utcnow(), "lastError": None}
+        )
+
+    async def mark_failed(self, message, error: str, retry_at: datetime | None):
+        await self.db.notificationoutbox.update(
+            where={"id": message.id},
+            data={
+                "status": "pending" if retry_at else "dead",
+                "availableAt": retry_at or utcnow(),
+                "lastError": error[:1000],
+            }
+        )
+
+class MemoryOutboxStore:
+    """In-process store with the same interface as PrismaOutboxStore, for benchmarks and local runs."""
+
+    def __init__(self):
+        self.messages = []
+
+    def add(self, **fields):
+        defaults = {
+            "id": len(self.messages) + 1, "kind": "notice", "subject": None, "appointmentId": None, "status": "pending",
+            "attempts": 0, "lastError": None, "availableAt": utcnow(), "sentAt": None,
+        }
+        message = SimpleNamespace(**{**defaults, **fields})
+        self.messages.append(message)
+        return message
+
+    async def enqueue(self, messages: list[dict], delay: float = OUTBOX_COALESCE_WINDOW):
+        for new in messages:
+            for message in self.messages:
+                if (
+                    new.get("appointmentId") is not None
+                    and message.status == "pending"
+                    and (message.kind, message.appointmentId, message.channel, message.recipient)
+                    == (new.get("kind", "notice"), new["appointmentId"], new["channel"], new["recipient"])
+                ):
+                    message.status = "coalesced"
+                    messages_total.inc(channel=message.channel, outcome="coalesced")
+        available_at = utcnow() + timedelta(seconds=delay)
+        for new in messages:
+            self.add(**new, availableAt=available_at)
+
+    async def depth(self) -> int:
+        return sum(1 for message in self.messages if message.status in ("pending", "sending"))
+
+    async def claim(self, limit: int, lease: float) -> list:
+        now = utcnow()
+        claimed = []
+        for message in self.messages:
+            if len(claimed) == limit:
+                break
+            if message.status in ("pending", "sending") and message.availableAt <= now:
+                message.status = "sending"
+                message.availableAt = now + timedelta(seconds=lease)
+                message.attempts += 1
+                claimed.append(message)
+        return claimed
+
+    async def mark_sent(self, messages: list):
+        now = utcnow()
+        for message in messages:
+            message.status, message.sentAt = "sent", now
+
+    async def mark_failed(self, message, error: str, retry_at: datetime | None):
+        message.status = "pending" if retry_at else "dead"
+        message.availableAt = retry_at or utcnow()
+        message.lastError = error
+
+# --- Worker ---
+
+def backoff_delay(attempts: int, base: float = OUTBOX_BACKOFF_BASE, cap: float = OUTBOX_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+class OutboxWorker:
+    def __init__(
+        self,
+        store,
+        providers: dict,
+        rate_limits: dict | None = None,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        lease: float = OUTBOX_LEASE,
+    ):
+        self.store = store
+        self.providers = providers
+        self.rate_limits = build_rate_limits() if rate_limits is None else rate_limits
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._task = None
+
+    def split_batches(self, messages: list) -> list:
+        """Group claimed messages per channel and cut each group into provider-sized requests."""
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+        batches = []
+        for channel, group in by_channel.items():
+            size = getattr(self.providers.get(channel), "max_batch", 1)
+            batches.extend((channel, group[i:i + size]) for i in range(0, len(group), size))
+        return batches
+
+    async def fail(self, message, error: Exception):
+        if isinstance(error, PermanentFailure) or message.attempts >= self.max_attempts:
+            logger.error("Dead-lettering %s message %s after %d attempts: %s", message.channel, message.id, message.attempts, error)
+            messages_total.inc(channel=message.channel, outcome="dead")
+            await self.store.mark_failed(message, str(error), None)
+        else:
+            retry_at = utcnow() + timedelta(seconds=backoff_delay(message.attempts))
+            logger.warning("Retrying %s message %s at %s: %s", message.channel, message.id, retry_at, error)
+            messages_total.inc(channel=message.channel, outcome="retried")
+            await self.store.mark_failed(message, str(error), retry_at)
+
+    async def deliver(self, channel: str, batch: list):
+        provider = self.providers.get(channel)
+        if provider is None:
+            for message in batch:
+                await self.fail(message, RuntimeError(f"No provider configured for channel {channel!r}"))
+            return
+        bucket = self.rate_limits.get(channel)
+        if bucket is not None:
+            await bucket.acquire()
+        async with self.semaphore:
+            start = time.perf_counter()
+            rejected = False
+            try:
+                # Provider SDKs are synchronous; keep them off the event loop
+                await asyncio.to_thread(provider.send_batch, batch)
+            except Exception as e:
+                if isinstance(e, BatchRejected) and len(batch) > 1:
+                    logger.warning("%s provider rejected a batch of %d, sending them one by one: %s", channel, len(batch), e)
+                    rejected = True
+                else:
+                    for message in batch:
+                        await self.fail(message, e)
+                    return
+            finally:
+                send_latency.observe(time.perf_counter() - start, channel=channel)
+        if rejected:
+            # Outside the semaphore: each single send takes its own slot and token
+            await asyncio.gather(*(self.deliver(channel, [message]) for message in batch))
+            return
+        batch_size.observe(len(batch), channel=channel)
+        messages_total.inc(len(batch), channel=channel, outcome="sent")
+        await self.store.mark_sent(batch)
+
+    async def run_once(self) -> int:
+        """Deliver one round of due messages and return how many were claimed."""
+        messages = await self.store.claim(self.batch_size, self.lease)
+        if messages:
+            await asyncio.gather(*(self.deliver(channel, batch) for channel, batch in self.split_batches(messages)))
+        queue_depth.set(await self.store.depth())
+        return len(messages)
+
+    async def run(self):
+        while True:
+            outbox_wakeup.clear()
+            try:
+                if await self.run_once():
+                    continue
+            except Exception as e:
+                logger.error("Notification outbox error: %s", e, exc_info=True)
+            try:
+                await asyncio.wait_for(outbox_wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
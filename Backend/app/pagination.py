@@ -0,0 +1,71 @@
+"""Opaque keyset (cursor) pagination for the list endpoints.
+
+A cursor encodes the sort-key values of the last row on a page; the next page
+selects rows strictly after it in the same order. Every ordering ends in `id`
+so the key is unique and pages neither skip nor repeat rows when other writes
+happen between requests.
+"""
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+# Orderings used by the list routes, as (field, direction) pairs
+PATIENT_ORDER = [("id", "asc")]
+DOCTOR_ORDER = [("id", "asc")]
+USER_ORDER = [("id", "asc")]
+APPOINTMENT_ORDER = [("dateTime", "asc"), ("id", "asc")]
+MEDICAL_HISTORY_ORDER = [("date", "desc"), ("id", "desc")]
+
+def prisma_order(order: list) -> list[dict]:
+    return [{field: direction} for field, direction in order]
+
+def encode_cursor(values: dict) -> str:
+    payload = {
+        field: {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for field, value in values.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, order: list) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = {}
+        for field, _ in order:
+            value = payload[field]
+            # Orderings are datetime columns followed by `id`, so anything else was not made by encode_cursor
+            if field == "id":
+                if not isinstance(value, int) or isinstance(value, bool):
+                    raise TypeError(field)
+                values[field] = value
+            else:
+                values[field] = datetime.fromisoformat(value["dt"])
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def apply_cursor(where: dict, order: list, cursor: str | None) -> dict:
+    """Narrow `where` to the rows after `cursor`; an empty cursor means the first page."""
+    if not cursor:
+        return where
+    values = decode_cursor(cursor, order)
+    # (a, b) after (x, y)  <=>  a after x  OR  (a = x AND b after y)
+    after = []
+    for i, (field, direction) in enumerate(order):
+        clause = {previous: values[previous] for previous, _ in order[:i]}
+        clause[field] = {"gt" if direction == "asc" else "lt": values[field]}
+        after.append(clause)
+    keyset = {"OR": after}
+    return {"AND": [where, keyset]} if where else keyset
+
+def next_cursor(rows: list, order: list, limit: int) -> str | None:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor({field: getattr(last, field) for field, _ in order})
+
+def page(items: list, rows: list, order: list, limit: int) -> dict:
+    return {"items": items, "next_cursor": next_cursor(rows, order, limit)}
@@ -0,0 +1,69 @@
+"""Password hashing off the event loop.
+
+bcrypt is deliberately slow, so hashing and verification run in a dedicated
+executor. At most PASSWORD_WORKERS jobs run at once and PASSWORD_QUEUE_LIMIT
+more may wait; anything beyond that is rejected with 503 so a burst of logins
+cannot stall unrelated requests.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from . import metrics
+
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "4"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread")  # "thread" (bcrypt releases the GIL) or "process"
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+jobs_in_flight = metrics.gauge("password_jobs_in_flight", "Password hash/verify jobs running or queued")
+jobs_rejected = metrics.counter("password_jobs_rejected_total", "Password jobs shed with 503 because the queue was full")
+
+_executor = None
+_in_flight = 0
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+    return _executor
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT:
+        jobs_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent sign-ins, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _in_flight += 1
+    jobs_in_flight.set(_in_flight)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _in_flight -= 1
+        jobs_in_flight.set(_in_flight)
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _run(_verify, password, hashed)
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,114 @@
+"""Read-through cache for doctor and patient reference data.
+
+Doctors and patient demographics are read on almost every request but change
+rarely. Lookups by id and the plain list queries go through here, and the
+write routes call `invalidate`. Cached lists are keyed by a generation number
+that every write bumps, so one write drops every cached page at once (in every
+worker when CACHE_BACKEND=redis). If the cache backend fails, reads go
+straight to the database.
+"""
+import hashlib
+import json
+import logging
+import os
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "5000"))   # Entries per cache (memory backend)
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))    # Upper bound on staleness, in seconds
+
+class ReadThroughCache:
+    def __init__(self, name: str, backend, table: str, model: str):
+        self.name = name
+        self.backend = backend
+        self.table = table  # Prisma client attribute, e.g. "doctor"
+        self.model = model  # prisma.models class name, used to decode values from a shared backend
+
+    def _model(self):
+        from prisma import models
+        return getattr(models, self.model)
+
+    def _encode(self, value):
+        # The memory backend keeps the objects themselves; a shared one needs JSON
+        if not self.backend.shared:
+            return value
+        if isinstance(value, list):
+            return json.dumps([row.model_dump(mode="json") for row in value])
+        return value.model_dump_json()
+
+    def _decode(self, raw):
+        if raw is None or not self.backend.shared:
+            return raw
+        data = json.loads(raw)
+        model = self._model()
+        if isinstance(data, list):
+            return [model.model_validate(row) for row in data]
+        return model.model_validate(data)
+
+    async def _read(self, key: str):
+        try:
+            return self._decode(await self.backend.get(key))
+        except Exception as e:
+            logger.warning("%s cache read failed, using the database: %s", self.name, e)
+            return None
+
+    async def _write(self, key: str, value):
+        try:
+            await self.backend.set(key, self._encode(value))
+        except Exception as e:
+            logger.warning("%s cache write failed: %s", self.name, e)
+
+    async def get(self, db, record_id: int):
+        """`find_unique` by id through the cache; missing rows are not cached."""
+        key = f"id:{record_id}"
+        row = await self._read(key)
+        if row is None:
+            row = await getattr(db, self.table).find_unique(where={"id": record_id})
+            if row is not None:
+                await self._write(key, row)
+        return row
+
+    async def find_many(self, db, **args) -> list:
+        """`find_many(**args)` through the cache, for queries without `include`."""
+        try:
+            generation = await self.backend.counter("generation")
+        except Exception as e:
+            logger.warning("%s cache read failed, using the database: %s", self.name, e)
+            return await getattr(db, self.table).find_many(**args)
+        digest = hashlib.sha1(json.dumps(args, sort_keys=True, default=str).encode()).hexdigest()
+        key = f"list:{generation}:{digest}"
+        rows = await self._read(key)
+        if rows is None:
+            rows = await getattr(db, self.table).find_many(**args)
+            await self._write(key, rows)
+        return rows
+
+    async def invalidate(self, record_id: int | None = None):
+        """Drop one record (if given) and every cached list."""
+        try:
+            if record_id is not None:
+                await self.backend.delete(f"id:{record_id}")
+            await self.backend.incr("generation")
+        except Exception as e:
+            logger.error("%s cache invalidation failed; entries expire within %ss: %s", self.name, REFERENCE_CACHE_TTL, e)
+
+    async def stats(self) -> dict:
+        try:
+            evictions = await self.backend.evictions()
+        except Exception:
+            evictions = None
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": int(cache.cache_requests.get(cache=self.name, result="hit")),
+            "misses": int(cache.cache_requests.get(cache=self.name, result="miss")),
+            "hit_ratio": cache.hit_ratio(self.name),
+            "evictions": evictions,
+        }
+
+doctors = ReadThroughCache(
+    "doctors", cache.build_backend("doctors", REFERENCE_CACHE_SIZE, REFERENCE_CACHE_TTL), "doctor", "Doctor"
+)
+patients = ReadThroughCache(
+    "patients", cache.build_backend("patients", REFERENCE_CACHE_SIZE, REFERENCE_CACHE_TTL), "patient", "Patient"
+)
@@ -0,0 +1,226 @@
+"""Appointment reminders, queued as SMS and email at fixed offsets before each appointment.
+
+An APScheduler interval job runs `ReminderScanner.run_once` every
+REMINDER_SCAN_INTERVAL seconds. For each offset in REMINDER_OFFSETS (for
+example 24h and 1h) the scanner walks forward through appointments whose
+time falls between that offset's cursor and now + offset. It uses a range
+query on the Appointment.dateTime index, so a tick reads only the
+appointments that just became due, however many are booked further out.
+The reminders go into the notification outbox and the cursor advances in
+the same transaction, so a crash between the two can neither lose nor
+repeat a reminder. They are queued with kind "reminder", so a later
+confirmation for the same appointment does not coalesce them away.
+
+Every worker runs the job. Each transaction first takes a transaction-level
+advisory lock with pg_try_advisory_xact_lock. Workers that cannot get it
+skip the tick, so one worker does the scan while the others stand by.
+
+The cursor is (dateTime, id), so appointments sharing a time are never split
+or repeated across pages. A new offset starts at now + offset, which means
+deploying a new offset does not send a burst of late reminders. Appointments
+are only reminded while still in the future: after downtime, reminders that
+fell due while no scanner was running are sent late, and those whose
+appointment has already started are skipped. An appointment booked or moved
+to a time the cursor has already passed gets no reminder for that offset,
+because its booking confirmation covers it.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from . import metrics
+from .notifications import contact_messages, describe_appointment, outbox_wakeup, utcnow
+from .scheduling import FREE_STATUSES, utc
+
+logger = logging.getLogger(__name__)
+
+REMINDER_OFFSETS = os.getenv("REMINDER_OFFSETS", "24h,1h")                  # Comma-separated; units m, h or d
+REMINDER_SCAN_INTERVAL = float(os.getenv("REMINDER_SCAN_INTERVAL", "60"))   # Seconds between scans
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))          # Appointments per transaction
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() == "true"
+
+# pg_advisory_xact_lock key
+REMINDER_LOCK = 0x48504D5303
+
+MAX_ID = 2**31 - 1  # A cursor id past every appointment at that time
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+reminders_queued = metrics.counter("reminders_queued_total", "Reminder messages written to the outbox", ("offset",))
+scan_duration = metrics.histogram("reminder_scan_seconds", "Time taken by one reminder scan of all offsets")
+
+def parse_offsets(value: str) -> list[int]:
+    """"24h,1h,30m" -> [86400, 3600, 1800] seconds, largest first."""
+    offsets = set()
+    for item in filter(None, (part.strip().lower() for part in value.split(","))):
+        unit = item[-1]
+        if unit not in UNITS or not item[:-1].isdigit():
+            raise ValueError(f"Invalid reminder offset {item!r}; expected a number followed by m, h or d")
+        offsets.add(int(item[:-1]) * UNITS[unit])
+    return sorted(offsets, reverse=True)
+
+def offset_label(seconds: int) -> str:
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds % size == 0:
+            count = seconds // size
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return f"{seconds} seconds"
+
+def reminder_messages(appointment, offset: int) -> list[dict]:
+    """Outbox rows reminding the patient of one appointment; `appointment` includes patient and doctor."""
+    body = f"Reminder: you have an appointment coming up. {describe_appointment(appointment.doctor, appointment)}"
+    subject = f"Appointment Reminder ({offset_label(offset)})"
+    return [{**message, "kind": "reminder"} for message in contact_messages(appointment.patient, subject, body, appointment.id)]
+
+def window_start(through: datetime, through_id: int, now: datetime) -> tuple[datetime, int]:
+    """The scan resumes after the stored cursor, but never before now: started appointments get no reminder."""
+    return max((utc(through), through_id), (now, MAX_ID))
+
+# --- Stores ---
+
+class PrismaReminderStore:
+    def __init__(self, db):
+        self.db = db
+
+    async def advance(self, offset: int, now: datetime, limit: int) -> tuple[int, bool] | None:
+        """Queue reminders for the next page of due appointments and move the cursor past them.
+
+        Returns (messages queued, whether the window is finished), or None when
+        another worker holds the lock.
+        """
+        target = now + timedelta(seconds=offset)
+        async with self.db.tx() as tx:
+            locked = await tx.query_raw("SELECT pg_try_advisory_xact_lock($1::bigint) AS locked", REMINDER_LOCK)
+            if not locked[0]["locked"]:
+                return None
+            state = await tx.reminderstate.find_unique(where={"offsetSeconds": offset})
+            if state is None:
+                await tx.reminderstate.create(data={"offsetSeconds": offset, "through": target, "throughId": MAX_ID})
+                return 0, True
+            start, start_id = window_start(state.through, state.throughId, now)
+            due = await tx.appointment.find_many(
+                where={
+                    "dateTime": {"gte": start, "lte": target},
+                    "status": {"not_in": list(FREE_STATUSES)},
+                    "OR": [{"dateTime": {"gt": start}}, {"id": {"gt": start_id}}],
+                },
+                order=[{"dateTime": "asc"}, {"id": "asc"}],
+                take=limit,
+                include={"patient": True, "doctor": True}
+            )
+            messages = [message for appointment in due for message in reminder_messages(appointment, offset)]
+            if messages:
+                await tx.notificationoutbox.create_many(data=[{**message, "availableAt": now} for message in messages])
+            done = len(due) < limit
+            through, through_id = (target, MAX_ID) if done else (due[-1].dateTime, due[-1].id)
+            await tx.reminderstate.update(
+                where={"offsetSeconds": offset},
+                data={"through": through, "throughId": through_id}
+            )
+        return len(messages), done
+
+class MemoryReminderStore:
+    """In-process store with the same interface as PrismaReminderStore, for benchmarks and local runs.
+
+    Appointments are kept sorted by (dateTime, id) and found with bisect, the
+    in-memory equivalent of the dateTime index range query.
+    """
+
+    def __init__(self, appointments=()):
+        self.keys = []
+        self.appointments = []
+        self.state = {}
+        self.messages = []
+        for appointment in sorted(appointments, key=lambda a: (utc(a.dateTime), a.id)):
+            self.keys.append((utc(appointment.dateTime), appointment.id))
+            self.appointments.append(appointment)
+
+    async def advance(self, offset: int, now: datetime, limit: int) -> tuple[int, bool] | None:
+        target = now + timedelta(seconds=offset)
+        if offset not in self.state:
+            self.state[offset] = (target, MAX_ID)
+            return 0, True
+        start = window_start(*self.state[offset], now)
+        index = bisect.bisect_right(self.keys, start)
+        due = []
+        while index < len(self.keys) and len(due) < limit and self.keys[index][0] <= target:
+            if self.appointments[index].status not in FREE_STATUSES:
+                due.append(self.appointments[index])
+            index += 1
+        messages = [message for appointment in due for message in reminder_messages(appointment, offset)]
+        self.messages.extend(messages)
+        done = len(due) < limit
+        self.state[offset] = (target, MAX_ID) if done else (utc(due[-1].dateTime), due[-1].id)
+        return len(messages), done
+
+# --- Scanner ---
+
+class ReminderScanner:
+    def __init__(
+        self,
+        store,
+        offsets: list[int] | None = None,
+        interval: float = REMINDER_SCAN_INTERVAL,
+        batch_size: int = REMINDER_BATCH_SIZE,
+    ):
+        self.store = store
+        self.offsets = parse_offsets(REMINDER_OFFSETS) if offsets is None else offsets
+        self.interval = interval
+        self.batch_size = batch_size
+        self._scheduler = None
+        self._scanning = asyncio.Lock()  # Held for the duration of a scan
+        self._stopping = False
+
+    async def run_once(self, now: datetime | None = None) -> int | None:
+        """Scan every offset up to `now`; returns the messages queued, or None if another worker holds the lock."""
+        now = now or utcnow()
+        start = time.perf_counter()
+        queued = 0
+        for offset in self.offsets:
+            while True:
+                result = await self.store.advance(offset, now, self.batch_size)
+                if result is None:
+                    return None
+                count, done = result
+                if count:
+                    reminders_queued.inc(count, offset=offset_label(offset))
+                    queued += count
+                if done:
+                    break
+        scan_duration.observe(time.perf_counter() - start)
+        if queued:
+            outbox_wakeup.set()
+            logger.info("Queued %d appointment reminder messages", queued)
+        return queued
+
+    async def tick(self):
+        async with self._scanning:
+            if self._stopping:
+                return
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Appointment reminder scan failed: %s", e, exc_info=True)
+
+    def start(self):
+        if self._scheduler is not None or not self.offsets:
+            return
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        self._scheduler = AsyncIOScheduler(timezone="UTC")
+        # One scan at a time per worker; ticks missed while a scan runs long are merged, not queued up
+        self._scheduler.add_job(
+            self.tick, "interval", seconds=self.interval, id="appointment-reminders",
+            max_instances=1, coalesce=True, next_run_time=utcnow()
+        )
+        self._scheduler.start()
+
+    async def stop(self):
+        """Stop scheduling scans and wait for a running one to finish, so the caller can then disconnect the database."""
+        if self._scheduler is not None:
+            self._stopping = True
+            self._scheduler.pause()
+            # The asyncio executor cancels running jobs on shutdown whatever `wait` says, so wait here first
+            async with self._scanning:
+                self._scheduler.shutdown(wait=False)
+            self._scheduler = None
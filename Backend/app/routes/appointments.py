@@ -1,38 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from prisma import Prisma
 from pydantic import BaseModel
 from ..database import get_db
 from ..routes.auth import get_current_active_user
-from datetime import datetime
-import re
+from ..notifications import enqueue_notifications, enqueue_summary_notifications
+from ..events import appointment_event, publish
+from ..changes import log_changes
+from ..stats import day_of, invalidate_summary, record, record_days
+from ..pagination import APPOINTMENT_ORDER, apply_cursor, page, prisma_order
+from ..fieldsets import parse_fieldset
+from ..conditional import etag_for, not_modified, tag
+from ..reference_data import doctors as doctor_cache, patients as patient_cache
+from ..schemas import (
+    APPOINTMENT, APPOINTMENT_BATCH, APPOINTMENT_LIST, APPOINTMENT_PAGE,
+    AppointmentBatchResult, AppointmentPage, AppointmentResponse, render,
+)
+from ..scheduling import DoctorSchedule, availability, holds_slot, is_booking_conflict, utc
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
 import logging
-from twilio.rest import Client
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-# Twilio configuration
-TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
-
-# SendGrid configuration
-SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_SENDER_EMAIL = os.getenv("SENDGRID_SENDER_EMAIL")
-
-# Initialize Twilio and SendGrid clients
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-sendgrid_client = SendGridAPIClient(SENDGRID_API_KEY)
-
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+APPOINTMENT_BATCH_MAX = int(os.getenv("APPOINTMENT_BATCH_MAX", "500"))        # Bookings per batch, after expanding series
+APPOINTMENT_BATCH_TIMEOUT = float(os.getenv("APPOINTMENT_BATCH_TIMEOUT", "30"))  # Seconds the batch transaction may run
+RECURRENCE_MAX = 52
+
 class AppointmentCreate(BaseModel):
     patientId: int
     doctorId: int
@@ -40,6 +37,12 @@ class AppointmentCreate(BaseModel):
     status: str = "Scheduled"
     purpose: str | None = None
 
+def slot_taken(doctor_id: int, appointment_id: int | None = None) -> HTTPException:
+    detail = f"Doctor {doctor_id} is already booked at that time"
+    if appointment_id is not None:
+        detail += f" (appointment {appointment_id})"
+    return HTTPException(status_code=409, detail=detail)
+
 class AppointmentUpdate(BaseModel):
     patientId: int | None = None
     doctorId: int | None = None
@@ -47,68 +50,18 @@ class AppointmentUpdate(BaseModel):
     status: str | None = None
     purpose: str | None = None
 
-async def send_notifications(patient: dict, appointment: dict, doctor: dict, action: str):
-    """
-    Send an immediate SMS and email notification for the appointment.
-    """
-    try:
-        # Prepare the message body
-        date_time = appointment["dateTime"]
-        message_body = (
-            f"Your appointment has been {action}: "
-            f"Date: {date_time}, "
-            f"Doctor: {doctor['name']}, "
-            f"Purpose: {appointment['purpose'] or 'N/A'}."
-        )
-
-        # Send immediate SMS
-        if "phone" in patient and patient["phone"]:
-            logger.debug(f"Sending immediate SMS to {patient['phone']}")
-            twilio_client.messages.create(
-                body=message_body,
-                from_=TWILIO_PHONE_NUMBER,
-                to=patient["phone"],
-            )
-            logger.info(f"Immediate SMS sent successfully to {patient['phone']}")
-        else:
-            logger.warning(f"No phone number provided for patient: {patient.get('id')}")
-
-        # Send email
-        if "email" in patient and patient["email"]:
-            email_pattern = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
-            if email_pattern.match(patient["email"]):
-                logger.debug(f"Sending email to {patient['email']}")
-                email_message = Mail(
-                    from_email=SENDGRID_SENDER_EMAIL,
-                    to_emails=patient["email"],
-                    subject=f"Appointment {action.capitalize()} Confirmation",
-                    plain_text_content=message_body,
-                    html_content=f"<p>{message_body}</p>",
-                )
-                response = sendgrid_client.send(email_message)
-                logger.info(f"Email sent successfully to {patient['email']}, status: {response.status_code}")
-            else:
-                logger.warning(f"Invalid email format for patient {patient.get('id')}: {patient['email']}")
-        else:
-            logger.warning(f"No email provided for patient: {patient.get('id')}")
-
-    except Exception as e:
-        logger.error(f"Error sending notifications: {str(e)}", exc_info=True)
-        # Log the error but don't raise an exception to avoid interrupting the appointment process
-        pass
-
-@router.post("/", status_code=201)
+@router.post("/", status_code=201, response_model=AppointmentResponse)
 async def create_appointment(
     appointment: AppointmentCreate,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    logger.debug(f"Creating appointment with data: {appointment}")
+    logger.debug("Creating appointment with data: %s", appointment)
     try:
         # Validate patient and doctor existence
-        patient = await db.patient.find_unique(where={"id": appointment.patientId})
-        doctor = await db.doctor.find_unique(where={"id": appointment.doctorId})
-        logger.debug(f"Patient: {patient}, Doctor: {doctor}")
+        patient = await patient_cache.get(db, appointment.patientId)
+        doctor = await doctor_cache.get(db, appointment.doctorId)
+        logger.debug("Patient %s, doctor %s found", appointment.patientId, appointment.doctorId)
         if not patient:
             raise HTTPException(status_code=400, detail=f"Patient with ID {appointment.patientId} not found")
         if not doctor:
@@ -117,243 +70,431 @@ async def create_appointment(
         # Parse dateTime
         try:
             parsed_date = datetime.fromisoformat(appointment.dateTime.replace("Z", "+00:00"))
-            logger.debug(f"Parsed dateTime: {parsed_date}")
+            logger.debug("Parsed dateTime: %s", parsed_date)
         except ValueError as e:
-            logger.error(f"Invalid dateTime format: {e}")
+            logger.error("Invalid dateTime format: %s", e)
             raise HTTPException(status_code=400, detail="Invalid dateTime format, expected ISO 8601 (e.g., 2025-04-12T10:00:00Z)")
 
         # Check for existing appointment with same patientId, doctorId, and dateTime
-        existing_appointment = await db.appointment.find_first(
+        existing_appointment = await db.appointment.find_unique(
             where={
-                "patientId": appointment.patientId,
-                "doctorId": appointment.doctorId,
-                "dateTime": parsed_date,
+                "patientId_doctorId_dateTime": {
+                    "patientId": appointment.patientId,
+                    "doctorId": appointment.doctorId,
+                    "dateTime": parsed_date,
+                }
             },
             include={"patient": True, "doctor": True}
         )
 
         if existing_appointment:
-            logger.debug(f"Found existing appointment: {existing_appointment.id}, status: {existing_appointment.status}")
+            logger.debug("Found existing appointment: %s, status: %s", existing_appointment.id, existing_appointment.status)
             if existing_appointment.status == "Scheduled" and appointment.status == "Confirmed":
-                logger.info(f"Updating existing appointment {existing_appointment.id} from 'Scheduled' to 'Confirmed'")
-                updated_appointment = await db.appointment.update(
-                    where={"id": existing_appointment.id},
-                    data={
-                        "status": "Confirmed",
-                        "purpose": appointment.purpose if appointment.purpose is not None else existing_appointment.purpose,
-                    },
-                    include={"patient": True, "doctor": True}
-                )
-                # Send notifications for the update
-                await send_notifications(
-                    patient=patient.__dict__,
-                    appointment={
-                        "dateTime": updated_appointment.dateTime.isoformat(),
-                        "purpose": updated_appointment.purpose,
-                    },
-                    doctor=doctor.__dict__,
-                    action="updated"
-                )
-                # Serialize the response for the updated appointment
-                return {
-                    "id": updated_appointment.id,
-                    "patientId": updated_appointment.patientId,
-                    "doctorId": updated_appointment.doctorId,
-                    "patient": {
-                        "id": updated_appointment.patient.id,
-                        "name": updated_appointment.patient.name,
-                        "email": updated_appointment.patient.email,
-                        "phone": updated_appointment.patient.phone,
-                        "dob": updated_appointment.patient.dob if isinstance(updated_appointment.patient.dob, str) else (updated_appointment.patient.dob.isoformat() if updated_appointment.patient.dob else None),
-                        "medicalHistory": updated_appointment.patient.medicalHistory,
-                        "appointments": None
-                    },
-                    "doctor": {
-                        "id": updated_appointment.doctor.id,
-                        "name": updated_appointment.doctor.name,
-                        "specialty": updated_appointment.doctor.specialty,
-                        "appointments": None
-                    },
-                    "dateTime": updated_appointment.dateTime.isoformat(),
-                    "status": updated_appointment.status,
-                    "purpose": updated_appointment.purpose
-                }
+                logger.info("Updating existing appointment %s from 'Scheduled' to 'Confirmed'", existing_appointment.id)
+                async with db.tx() as tx:
+                    updated_appointment = await tx.appointment.update(
+                        where={"id": existing_appointment.id},
+                        data={
+                            "status": "Confirmed",
+                            "purpose": appointment.purpose if appointment.purpose is not None else existing_appointment.purpose,
+                        },
+                        include={"patient": True, "doctor": True}
+                    )
+                    await enqueue_notifications(tx, patient, doctor, updated_appointment, "updated")
+                    await log_changes(tx, "appointment", "updated", [updated_appointment])
+                await publish(db, appointment_event("updated", updated_appointment))
+                return render(APPOINTMENT, updated_appointment, status_code=201)
             else:
-                logger.warning(f"Duplicate appointment detected for patient {appointment.patientId}, doctor {appointment.doctorId}, at {parsed_date}")
+                logger.warning("Duplicate appointment detected for patient %s, doctor %s, at %s", appointment.patientId, appointment.doctorId, parsed_date)
                 raise HTTPException(
                     status_code=400,
                     detail="An appointment already exists for this patient, doctor, and time. Cannot create a duplicate."
                 )
 
-        # Create new appointment if no matching appointment exists
-        new_appointment = await db.appointment.create(
-            data={
-                "patient": {"connect": {"id": appointment.patientId}},
-                "doctor": {"connect": {"id": appointment.doctorId}},
-                "dateTime": parsed_date,
-                "status": appointment.status,
-                "purpose": appointment.purpose,
-            },
-            include={"patient": True, "doctor": True}
+        # Reject bookings that overlap another of the doctor's appointments
+        if holds_slot(appointment.status):
+            clashes = await availability.conflicts(db, appointment.doctorId, parsed_date)
+            if clashes:
+                raise slot_taken(appointment.doctorId, clashes[0])
+
+        # Create new appointment if no matching appointment exists. The insert and its dashboard
+        # count commit together; a booking that raced past the check above fails on the constraints.
+        try:
+            async with db.tx() as tx:
+                new_appointment = await tx.appointment.create(
+                    data={
+                        "patient": {"connect": {"id": appointment.patientId}},
+                        "doctor": {"connect": {"id": appointment.doctorId}},
+                        "dateTime": parsed_date,
+                        "status": appointment.status,
+                        "purpose": appointment.purpose,
+                    },
+                    include={"patient": True, "doctor": True}
+                )
+                await record(tx, "appointments", new_appointment.dateTime)
+                await enqueue_notifications(tx, patient, doctor, new_appointment, "confirmed")
+                await log_changes(tx, "appointment", "created", [new_appointment])
+        except Exception as e:
+            if not is_booking_conflict(e):
+                raise
+            logger.warning("Booking conflict for doctor %s at %s: %s", appointment.doctorId, parsed_date, e)
+            availability.forget(appointment.doctorId)
+            raise slot_taken(appointment.doctorId)
+        logger.debug("Created appointment %s", new_appointment.id)
+        invalidate_summary()
+        availability.add(new_appointment)
+        await publish(db, appointment_event("created", new_appointment))
+
+        return render(APPOINTMENT, new_appointment, status_code=201)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating appointment: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+class Recurrence(BaseModel):
+    frequency: str = "weekly"  # "daily" or "weekly"
+    interval: int = 1          # Every `interval` days/weeks
+    count: int                 # Occurrences, including the first
+
+class BatchCreate(AppointmentCreate):
+    recurrence: Recurrence | None = None
+
+class BatchUpdate(AppointmentUpdate):
+    id: int
+
+class AppointmentBatch(BaseModel):
+    create: list[BatchCreate] = []
+    update: list[BatchUpdate] = []
+    cancel: list[int] = []
+
+def parse_date_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def expand(item: BatchCreate, start: datetime) -> list[datetime]:
+    """Start times of every occurrence in a (possibly recurring) booking."""
+    recurrence = item.recurrence
+    if recurrence is None:
+        return [start]
+    step = timedelta(days=recurrence.interval * (7 if recurrence.frequency == "weekly" else 1))
+    return [start + step * i for i in range(recurrence.count)]
+
+@router.post("/batch", response_model=AppointmentBatchResult)
+async def batch_appointments(
+    batch: AppointmentBatch,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Create, update and cancel many appointments in one all-or-nothing transaction.
+
+    A create with `recurrence` (e.g. {"frequency": "weekly", "count": 12})
+    books every occurrence. Patients and doctors are checked with one query
+    each, overlaps are checked against each doctor's schedule as it will be
+    after the whole batch, and each affected patient gets one combined
+    notification. Errors are returned per item and nothing is written.
+    """
+    errors = []
+
+    def reject(item: str, error: str, conflict: bool = False):
+        errors.append({"item": item, "error": error, "conflict": conflict})
+
+    # Expand creates into individual bookings
+    creates = []  # (label, item, start)
+    for i, item in enumerate(batch.create):
+        label = f"create[{i}]"
+        try:
+            start = parse_date_time(item.dateTime)
+        except ValueError:
+            reject(label, "Invalid dateTime format, expected ISO 8601 (e.g., 2025-04-12T10:00:00Z)")
+            continue
+        if item.recurrence is not None:
+            recurrence = item.recurrence
+            if recurrence.frequency not in ("daily", "weekly"):
+                reject(label, "recurrence.frequency must be 'daily' or 'weekly'")
+                continue
+            if recurrence.interval < 1 or not 1 <= recurrence.count <= RECURRENCE_MAX:
+                reject(label, f"recurrence.interval must be at least 1 and recurrence.count between 1 and {RECURRENCE_MAX}")
+                continue
+        occurrences = expand(item, start)
+        creates.extend(
+            (f"{label}#{n}" if len(occurrences) > 1 else label, item, occurrence)
+            for n, occurrence in enumerate(occurrences)
         )
-        logger.debug(f"Created appointment: {new_appointment}")
-
-        # Send notifications for the new appointment
-        await send_notifications(
-            patient=patient.__dict__,
-            appointment={
-                "dateTime": new_appointment.dateTime.isoformat(),
-                "purpose": new_appointment.purpose,
-            },
-            doctor=doctor.__dict__,
-            action="confirmed"
+
+    ids = [item.id for item in batch.update] + batch.cancel
+    if len(ids) != len(set(ids)):
+        raise HTTPException(status_code=400, detail="Each appointment may appear only once across update and cancel")
+    if len(creates) + len(ids) > APPOINTMENT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {APPOINTMENT_BATCH_MAX} appointments")
+    if not creates and not ids and not errors:
+        return render(APPOINTMENT_BATCH, {"created": [], "updated": [], "cancelled": []})
+
+    existing = {
+        appointment.id: appointment
+        for appointment in await db.appointment.find_many(where={"id": {"in": ids}})
+    } if ids else {}
+
+    # Resolve each update to the appointment it will become
+    updates = []  # (label, item, existing, data, doctorId, start, status)
+    for i, item in enumerate(batch.update):
+        label = f"update[{i}]"
+        current = existing.get(item.id)
+        if current is None:
+            reject(label, f"Appointment {item.id} not found")
+            continue
+        data = {}
+        if item.patientId is not None:
+            data["patient"] = {"connect": {"id": item.patientId}}
+        if item.doctorId is not None:
+            data["doctor"] = {"connect": {"id": item.doctorId}}
+        if item.dateTime:
+            try:
+                data["dateTime"] = parse_date_time(item.dateTime)
+            except ValueError:
+                reject(label, "Invalid dateTime format, expected ISO 8601 (e.g., 2025-04-12T10:00:00Z)")
+                continue
+        if item.status:
+            data["status"] = item.status
+        if item.purpose is not None:
+            data["purpose"] = item.purpose
+        updates.append((
+            label, item, current, data,
+            item.doctorId if item.doctorId is not None else current.doctorId,
+            data.get("dateTime", current.dateTime),
+            data.get("status", current.status),
+        ))
+    cancels = []
+    for i, appointment_id in enumerate(batch.cancel):
+        if appointment_id in existing:
+            cancels.append(existing[appointment_id])
+        else:
+            reject(f"cancel[{i}]", f"Appointment {appointment_id} not found")
+
+    # One IN query each for every patient and doctor the batch touches
+    patient_ids = {item.patientId for _, item, _ in creates}
+    patient_ids |= {item.patientId if item.patientId is not None else current.patientId for _, item, current, *_ in updates}
+    patient_ids |= {appointment.patientId for appointment in cancels}
+    doctor_ids = {item.doctorId for _, item, _ in creates} | {doctor_id for *_, doctor_id, _, _ in updates}
+    doctor_ids |= {current.doctorId for _, _, current, *_ in updates} | {appointment.doctorId for appointment in cancels}
+    patients = {p.id: p for p in await db.patient.find_many(where={"id": {"in": list(patient_ids)}})} if patient_ids else {}
+    doctors = {d.id: d for d in await db.doctor.find_many(where={"id": {"in": list(doctor_ids)}})} if doctor_ids else {}
+    for label, item, _ in creates:
+        if item.patientId not in patients:
+            reject(label, f"Patient with ID {item.patientId} not found")
+        elif item.doctorId not in doctors:
+            reject(label, f"Doctor with ID {item.doctorId} not found")
+    for label, item, _, _, doctor_id, _, _ in updates:
+        if item.patientId is not None and item.patientId not in patients:
+            reject(label, "Invalid patient ID")
+        elif doctor_id not in doctors:
+            reject(label, "Invalid doctor ID")
+
+    # Conflict check against each doctor's schedule as it will stand after the batch
+    if not errors:
+        schedules = {}
+        for doctor_id in doctor_ids:
+            starts = [utc(start) for _, item, start in creates if item.doctorId == doctor_id]
+            starts += [utc(start) for *_, target, start, _ in updates if target == doctor_id]
+            if not starts:  # Only removals for this doctor, nothing to check
+                schedules[doctor_id] = DoctorSchedule()
+                continue
+            loaded = await availability.covering(db, doctor_id, min(starts), max(starts))
+            schedules[doctor_id] = DoctorSchedule(loaded.bookings, since=loaded.since)
+        for appointment in cancels:
+            schedules[appointment.doctorId].remove(appointment.id, appointment.dateTime)
+        for _, _, current, *_ in updates:
+            schedules[current.doctorId].remove(current.id, current.dateTime)
+        for label, item, current, _, doctor_id, start, status in updates:
+            if holds_slot(status):
+                if schedules[doctor_id].conflicts(start):
+                    reject(label, f"Doctor {doctor_id} is already booked at that time", conflict=True)
+                else:
+                    schedules[doctor_id].add(current.id, start)
+        for label, item, start in creates:
+            if holds_slot(item.status):
+                if schedules[item.doctorId].conflicts(start):
+                    reject(label, f"Doctor {item.doctorId} is already booked at that time", conflict=True)
+                else:
+                    schedules[item.doctorId].add(-1, start)  # Placeholder id until the row exists
+
+    if errors:
+        conflict = all(error["conflict"] for error in errors)
+        raise HTTPException(
+            status_code=409 if conflict else 400,
+            detail=[{"item": error["item"], "error": error["error"]} for error in errors]
         )
 
-        # Serialize the response
-        return {
-            "id": new_appointment.id,
-            "patientId": new_appointment.patientId,
-            "doctorId": new_appointment.doctorId,
-            "patient": {
-                "id": new_appointment.patient.id,
-                "name": new_appointment.patient.name,
-                "email": new_appointment.patient.email,
-                "phone": new_appointment.patient.phone,
-                "dob": new_appointment.patient.dob if isinstance(new_appointment.patient.dob, str) else (new_appointment.patient.dob.isoformat() if new_appointment.patient.dob else None),
-                "medicalHistory": new_appointment.patient.medicalHistory,
-                "appointments": None
-            },
-            "doctor": {
-                "id": new_appointment.doctor.id,
-                "name": new_appointment.doctor.name,
-                "specialty": new_appointment.doctor.specialty,
-                "appointments": None
-            },
-            "dateTime": new_appointment.dateTime.isoformat(),
-            "status": new_appointment.status,
-            "purpose": new_appointment.purpose
-        }
+    include = {"patient": True, "doctor": True}
+    try:
+        async with db.tx(timeout=timedelta(seconds=APPOINTMENT_BATCH_TIMEOUT)) as tx:
+            if cancels:
+                await tx.appointment.delete_many(where={"id": {"in": [appointment.id for appointment in cancels]}})
+            updated = [
+                (current, await tx.appointment.update(where={"id": current.id}, data=data, include=include))
+                for _, _, current, data, *_ in updates
+            ]
+            created = [
+                await tx.appointment.create(
+                    data={
+                        "patient": {"connect": {"id": item.patientId}},
+                        "doctor": {"connect": {"id": item.doctorId}},
+                        "dateTime": start,
+                        "status": item.status,
+                        "purpose": item.purpose,
+                    },
+                    include=include
+                )
+                for _, item, start in creates
+            ]
+            deltas = Counter()
+            for appointment in cancels:
+                deltas[day_of(appointment.dateTime)] -= 1
+            for current, appointment in updated:
+                deltas[day_of(current.dateTime)] -= 1
+                deltas[day_of(appointment.dateTime)] += 1
+            for appointment in created:
+                deltas[day_of(appointment.dateTime)] += 1
+            await record_days(tx, "appointments", deltas)
+            # One combined notification per affected patient
+            changes = defaultdict(list)
+            for appointment in created:
+                changes[appointment.patientId].append(("confirmed", appointment.doctor, appointment))
+            for _, appointment in updated:
+                changes[appointment.patientId].append(("updated", appointment.doctor, appointment))
+            for appointment in cancels:
+                changes[appointment.patientId].append(("cancelled", doctors[appointment.doctorId], appointment))
+            for patient_id, patient_changes in changes.items():
+                await enqueue_summary_notifications(tx, patients[patient_id], patient_changes)
+            await log_changes(tx, "appointment", "deleted", cancels)
+            await log_changes(tx, "appointment", "updated", [appointment for _, appointment in updated])
+            await log_changes(tx, "appointment", "created", created)
     except Exception as e:
-        logger.error(f"Error creating appointment: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        if not is_booking_conflict(e):
+            raise
+        logger.warning("Booking conflict in appointment batch: %s", e)
+        for doctor_id in doctor_ids:
+            availability.forget(doctor_id)
+        raise HTTPException(status_code=409, detail="One of the bookings conflicts with another appointment")
+
+    invalidate_summary()
+    for appointment in cancels:
+        availability.remove(appointment)
+    for current, appointment in updated:
+        availability.replace(current, appointment)
+    for appointment in created:
+        availability.add(appointment)
+
+    await publish(
+        db,
+        *(appointment_event("deleted", appointment) for appointment in cancels),
+        *(appointment_event("updated", appointment, current) for current, appointment in updated),
+        *(appointment_event("created", appointment) for appointment in created),
+    )
+
+    return render(APPOINTMENT_BATCH, {
+        "created": created,
+        "updated": [appointment for _, appointment in updated],
+        "cancelled": [appointment.id for appointment in cancels],
+    })
 
-@router.get("/{appointment_id}")
+@router.get("/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
     appointment_id: int,
+    request: Request,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    logger.debug(f"Fetching appointment with ID: {appointment_id}")
+    logger.debug("Fetching appointment with ID: %s", appointment_id)
     try:
+        # `fields`/`include` (see app/fieldsets.py) trade the typed response for a trimmed one
+        fieldset = parse_fieldset("appointment", fields, include, default_include="patient,doctor")
         appointment = await db.appointment.find_unique(
             where={"id": appointment_id},
-            include={"patient": True, "doctor": True}
+            include=fieldset.prisma_include()
         )
-        if not appointment or not appointment.patient or not appointment.doctor:
+        if not appointment:
             raise HTTPException(status_code=404, detail="Appointment or related data not found")
-        # Explicitly serialize the response
-        return {
-            "id": appointment.id,
-            "patientId": appointment.patientId,
-            "doctorId": appointment.doctorId,
-            "patient": {
-                "id": appointment.patient.id,
-                "name": appointment.patient.name,
-                "email": appointment.patient.email,
-                "phone": appointment.patient.phone,
-                "dob": appointment.patient.dob if isinstance(appointment.patient.dob, str) else (appointment.patient.dob.isoformat() if appointment.patient.dob else None),
-                "medicalHistory": appointment.patient.medicalHistory,
-                "appointments": None
-            },
-            "doctor": {
-                "id": appointment.doctor.id,
-                "name": appointment.doctor.name,
-                "specialty": appointment.doctor.specialty,
-                "appointments": None
-            },
-            "dateTime": appointment.dateTime.isoformat(),
-            "status": appointment.status,
-            "purpose": appointment.purpose
-        }
+        etag = etag_for(request, appointment)
+        unchanged = not_modified(request, etag)
+        if unchanged:
+            return unchanged
+        if fields is not None or include is not None:
+            return tag(ORJSONResponse(fieldset.project(appointment)), etag)
+        if not appointment.patient or not appointment.doctor:
+            raise HTTPException(status_code=404, detail="Appointment or related data not found")
+        return tag(render(APPOINTMENT, appointment), etag)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching appointment {appointment_id}: {str(e)}", exc_info=True)
+        logger.error("Error fetching appointment %s: %s", appointment_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@router.get("/")
+@router.get("/", response_model=list[AppointmentResponse] | AppointmentPage)
 async def list_appointments(
+    request: Request,
     patient_id: int | None = None,
     doctor_id: int | None = None,
     date: str | None = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    logger.debug(f"Listing appointments with filters: patient_id={patient_id}, doctor_id={doctor_id}, date={date}")
+    logger.debug("Listing appointments with filters: patient_id=%s, doctor_id=%s, date=%s", patient_id, doctor_id, date)
     try:
-        logger.debug("Building query filters")
+        fieldset = parse_fieldset("appointment", fields, include, default_include="patient,doctor")
         where = {}
         if patient_id:
             where["patientId"] = patient_id
         if doctor_id:
             where["doctorId"] = doctor_id
         if date:
-            logger.debug(f"Parsing date: {date}")
+            logger.debug("Parsing date: %s", date)
             start = datetime.fromisoformat(date.replace("Z", "+00:00")).replace(hour=0, minute=0)
             end = start.replace(hour=23, minute=59)
             where["dateTime"] = {"gte": start, "lte": end}
         
-        logger.debug("Executing Prisma query")
+        # Passing `cursor` (empty for the first page) switches to keyset paging on (dateTime, id)
         appointments = await db.appointment.find_many(
-            where=where,
-            include={"patient": True, "doctor": True},
-            skip=skip,
+            where=apply_cursor(where, APPOINTMENT_ORDER, cursor),
+            include=fieldset.prisma_include(),
+            skip=skip if cursor is None else 0,
             take=limit,
-            order={"dateTime": "asc"}
+            order=prisma_order(APPOINTMENT_ORDER)
         )
-        logger.debug(f"Retrieved {len(appointments)} appointments")
-        
-        logger.debug("Filtering valid appointments")
-        valid_appointments = [
-            {
-                "id": appt.id,
-                "patientId": appt.patientId,
-                "doctorId": appt.doctorId,
-                "patient": {
-                    "id": appt.patient.id,
-                    "name": appt.patient.name,
-                    "email": appt.patient.email,
-                    "phone": appt.patient.phone,
-                    "dob": appt.patient.dob if isinstance(appt.patient.dob, str) else (appt.patient.dob.isoformat() if appt.patient.dob else None),
-                    "medicalHistory": appt.patient.medicalHistory,
-                    "appointments": None
-                },
-                "doctor": {
-                    "id": appt.doctor.id,
-                    "name": appt.doctor.name,
-                    "specialty": appt.doctor.specialty,
-                    "appointments": None
-                },
-                "dateTime": appt.dateTime.isoformat(),
-                "status": appt.status,
-                "purpose": appt.purpose
-            }
-            for appt in appointments if appt.patient and appt.doctor
-        ]
-        logger.debug(f"Returning {len(valid_appointments)} valid appointments")
-        return valid_appointments
+        logger.debug("Retrieved %s appointments", len(appointments))
+        etag = etag_for(request, appointments)
+        unchanged = not_modified(request, etag)
+        if unchanged:
+            return unchanged
+        if fields is not None or include is not None:
+            items = fieldset.project_all(appointments)
+            return tag(ORJSONResponse(page(items, appointments, APPOINTMENT_ORDER, limit) if cursor is not None else items), etag)
+
+        valid_appointments = [appt for appt in appointments if appt.patient and appt.doctor]
+        logger.debug("Returning %s valid appointments", len(valid_appointments))
+        if cursor is not None:
+            return tag(render(APPOINTMENT_PAGE, page(valid_appointments, appointments, APPOINTMENT_ORDER, limit)), etag)
+        return tag(render(APPOINTMENT_LIST, valid_appointments), etag)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error listing appointments: {str(e)}", exc_info=True)
+        logger.error("Error listing appointments: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@router.put("/{appointment_id}")
+@router.put("/{appointment_id}", response_model=AppointmentResponse)
 async def update_appointment(
     appointment_id: int,
     appointment: AppointmentUpdate,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    logger.debug(f"Updating appointment {appointment_id} with data: {appointment}")
+    logger.debug("Updating appointment %s with data: %s", appointment_id, appointment)
     try:
         existing = await db.appointment.find_unique(where={"id": appointment_id}, include={"patient": True, "doctor": True})
         if not existing:
@@ -363,11 +504,11 @@ async def update_appointment(
         patient = existing.patient
         doctor = existing.doctor
         if appointment.patientId is not None:
-            patient = await db.patient.find_unique(where={"id": appointment.patientId})
+            patient = await patient_cache.get(db, appointment.patientId)
             if not patient:
                 raise HTTPException(status_code=400, detail="Invalid patient ID")
         if appointment.doctorId is not None:
-            doctor = await db.doctor.find_unique(where={"id": appointment.doctorId})
+            doctor = await doctor_cache.get(db, appointment.doctorId)
             if not doctor:
                 raise HTTPException(status_code=400, detail="Invalid doctor ID")
         
@@ -383,49 +524,44 @@ async def update_appointment(
         if appointment.purpose is not None:
             update_data["purpose"] = appointment.purpose
 
-        updated_appointment = await db.appointment.update(
-            where={"id": appointment_id},
-            data=update_data,
-            include={"patient": True, "doctor": True}
-        )
+        # Moving the appointment, or re-activating a cancelled one, must not overlap another booking
+        doctor_id = appointment.doctorId if appointment.doctorId is not None else existing.doctorId
+        new_time = update_data.get("dateTime", existing.dateTime)
+        new_status = update_data.get("status", existing.status)
+        if holds_slot(new_status) and (
+            doctor_id != existing.doctorId or utc(new_time) != utc(existing.dateTime) or not holds_slot(existing.status)
+        ):
+            clashes = await availability.conflicts(db, doctor_id, new_time, ignore=appointment_id)
+            if clashes:
+                raise slot_taken(doctor_id, clashes[0])
 
-        # Send notifications for the update
-        await send_notifications(
-            patient=patient.__dict__,
-            appointment={
-                "dateTime": updated_appointment.dateTime.isoformat(),
-                "purpose": updated_appointment.purpose,
-            },
-            doctor=doctor.__dict__,
-            action="updated"
-        )
+        try:
+            async with db.tx() as tx:
+                updated_appointment = await tx.appointment.update(
+                    where={"id": appointment_id},
+                    data=update_data,
+                    include={"patient": True, "doctor": True}
+                )
+                if updated_appointment.dateTime != existing.dateTime:
+                    await record(tx, "appointments", existing.dateTime, -1)
+                    await record(tx, "appointments", updated_appointment.dateTime)
+                await enqueue_notifications(tx, patient, doctor, updated_appointment, "updated")
+                await log_changes(tx, "appointment", "updated", [updated_appointment])
+        except Exception as e:
+            if not is_booking_conflict(e):
+                raise
+            logger.warning("Booking conflict moving appointment %s to doctor %s at %s: %s", appointment_id, doctor_id, new_time, e)
+            availability.forget(doctor_id)
+            raise slot_taken(doctor_id)
+        invalidate_summary()
+        availability.replace(existing, updated_appointment)
+        await publish(db, appointment_event("updated", updated_appointment, existing))
 
-        # Serialize the response
-        return {
-            "id": updated_appointment.id,
-            "patientId": updated_appointment.patientId,
-            "doctorId": updated_appointment.doctorId,
-            "patient": {
-                "id": updated_appointment.patient.id,
-                "name": updated_appointment.patient.name,
-                "email": updated_appointment.patient.email,
-                "phone": updated_appointment.patient.phone,
-                "dob": updated_appointment.patient.dob if isinstance(updated_appointment.patient.dob, str) else (updated_appointment.patient.dob.isoformat() if updated_appointment.patient.dob else None),
-                "medicalHistory": updated_appointment.patient.medicalHistory,
-                "appointments": None
-            },
-            "doctor": {
-                "id": updated_appointment.doctor.id,
-                "name": updated_appointment.doctor.name,
-                "specialty": updated_appointment.doctor.specialty,
-                "appointments": None
-            },
-            "dateTime": updated_appointment.dateTime.isoformat(),
-            "status": updated_appointment.status,
-            "purpose": updated_appointment.purpose
-        }
+        return render(APPOINTMENT, updated_appointment)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating appointment {appointment_id}: {str(e)}", exc_info=True)
+        logger.error("Error updating appointment %s: %s", appointment_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.delete("/{appointment_id}")
@@ -434,12 +570,21 @@ async def cancel_appointment(
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    logger.debug(f"Deleting appointment {appointment_id}")
+    logger.debug("Deleting appointment %s", appointment_id)
     try:
         existing = await db.appointment.find_unique(where={"id": appointment_id})
         if not existing:
             raise HTTPException(status_code=404, detail="Appointment not found")
-        return await db.appointment.delete(where={"id": appointment_id})
+        async with db.tx() as tx:
+            deleted = await tx.appointment.delete(where={"id": appointment_id})
+            await log_changes(tx, "appointment", "deleted", [existing])
+            await record(tx, "appointments", existing.dateTime, -1)
+        invalidate_summary()
+        availability.remove(existing)
+        await publish(db, appointment_event("deleted", existing))
+        return deleted
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting appointment {appointment_id}: {str(e)}", exc_info=True)
+        logger.error("Error deleting appointment %s: %s", appointment_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
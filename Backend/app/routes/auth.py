@@ -140,20 +140,48 @@ from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from pydantic import BaseModel
 from prisma import Prisma
 from ..database import get_db
-from passlib.context import CryptContext
+from ..cache import LRUTTLCache
+from ..passwords import hash_password, verify_password
 import jwt
 import json
+import logging
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 SECRET_KEY = "your-secret-key"  # Replace with a secure key and use env vars
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 7 * 24 * 60
 
+# Validated tokens are cached so authenticated requests skip the user lookup.
+# invalidate_user only sees changes made through this API; a role or password
+# changed directly in the database is picked up once the entry expires, so the
+# TTL is kept short and capped at AUTH_CACHE_TTL_MAX.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_MAX = 60.0
+AUTH_CACHE_TTL = min(float(os.getenv("AUTH_CACHE_TTL", "30")), AUTH_CACHE_TTL_MAX)
+# Build the user from the signed user_id/role claims instead of reading the User table.
+# Role changes then only take effect when the token is reissued.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+token_cache = LRUTTLCache("auth_token", AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+class CurrentUser(BaseModel):
+    id: int
+    email: str
+    role: str
+    createdAt: Optional[datetime] = None
+
+def invalidate_user(email: str):
+    """Forget every cached token for a user; call after the user is changed or deleted."""
+    token_cache.delete_where(lambda user: user.email == email)
+
 class UserResponse(BaseModel):
     id: int
     email: str
@@ -179,7 +207,7 @@ async def register_user(user: UserCreate, db: Prisma = Depends(get_db)):
         )
 
     # Hash the password
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
 
     # Create the user
     new_user = await db.user.create({
@@ -187,6 +215,7 @@ async def register_user(user: UserCreate, db: Prisma = Depends(get_db)):
         "password": hashed_password,
         "role": user.role
     })
+    invalidate_user(new_user.email)
 
     return {
         "id": new_user.id,
@@ -206,25 +235,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Prisma = Depends(get_db)):
-    print(f"Received login request: username={form_data.username}, password={form_data.password}")
     user = await db.user.find_unique(where={"email": form_data.username})
     if not user:
-        print(f"User not found for email: {form_data.username}")
+        logger.info("Login failed for %s: no such user", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password. If the system data was reset, please register a new user.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    password_valid = pwd_context.verify(form_data.password, user.password)
-    print(f"Password verification result: {password_valid}")
+    password_valid = await verify_password(form_data.password, user.password)
     if not password_valid:
-        print(f"Password verification failed for user: {form_data.username}")
+        logger.info("Login failed for %s: wrong password", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    print(f"Login successful for user: {form_data.username}")
+    logger.debug("Login succeeded for %s", form_data.username)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email, "role": user.role, "user_id": user.id},
@@ -265,6 +292,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Prisma = Dep
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -272,9 +302,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Prisma = Dep
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
-    user = await db.user.find_unique(where={"email": email})
-    if user is None:
-        raise credentials_exception
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("user_id") is not None and payload.get("role"):
+        user = CurrentUser(id=payload["user_id"], email=email, role=payload["role"])
+    else:
+        record = await db.user.find_unique(where={"email": email})
+        if record is None:
+            raise credentials_exception
+        user = CurrentUser(id=record.id, email=record.email, role=record.role, createdAt=record.createdAt)
+    # Never cache a token past its own expiry
+    token_cache.set(token, user, ttl=payload.get("exp", 0) - time.time())
     return user
 
 def get_current_active_user(current_user=Depends(get_current_user)):
@@ -0,0 +1,277 @@
+import codecs
+import csv
+import json
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from enum import Enum
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from prisma import Prisma
+from pydantic import BaseModel, ValidationError
+from ..database import get_db
+from ..routes.auth import get_current_active_user
+from ..routes.patients import PatientCreate
+from ..routes.doctors import DoctorCreate
+from ..routes.appointments import AppointmentCreate
+from ..stats import day_of, invalidate_summary, record_days
+from ..reference_data import doctors as doctor_cache, patients as patient_cache
+from ..scheduling import DoctorSchedule, availability, holds_slot
+from ..changes import log_inserted, max_id
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))  # Errors listed in the report; the count is always exact
+
+class ImportEntity(str, Enum):
+    patients = "patients"
+    doctors = "doctors"
+    appointments = "appointments"
+
+class ImportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class RowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    entity: str
+    received: int
+    created: int
+    failed: int
+    errors: list[RowError]
+
+# --- Parsing ---
+
+async def read_lines(request: Request):
+    """Yield the uploaded body line by line as it arrives, without buffering the whole file."""
+    decoder = codecs.getincrementaldecoder("utf-8")()  # Multi-byte characters may straddle chunks
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def read_records(request: Request, fmt: ImportFormat):
+    """Yield (row number, raw dict or parse error) for each record in the upload."""
+    row = 0
+    if fmt == ImportFormat.ndjson:
+        async for line in read_lines(request):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+                yield row, record if isinstance(record, dict) else ValueError("Expected a JSON object")
+            except ValueError as e:
+                yield row, e
+        return
+    header = None
+    buffer = ""
+    async for line in read_lines(request):
+        buffer += line
+        # A quoted field may contain newlines; the record is complete once its quotes balance
+        if buffer.count('"') % 2:
+            continue
+        text, buffer = buffer, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+        else:
+            # Empty CSV cells stand for missing optional values
+            yield row, {key: value if value != "" else None for key, value in zip(header, values)}
+
+def describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+# --- Set-based validation per batch; each returns (rows to create, errors) ---
+
+async def prepare_patients(db: Prisma, batch: list) -> tuple[list, list]:
+    rows, errors = [], []
+    for row, record in batch:
+        try:
+            rows.append((row, PatientCreate.model_validate(record)))
+        except ValidationError as e:
+            errors.append(RowError(row=row, error=describe(e)))
+    seen = Counter(patient.email for _, patient in rows)
+    existing = {
+        patient.email
+        for patient in await db.patient.find_many(where={"email": {"in": list(seen)}})
+    }
+    valid = []
+    for row, patient in rows:
+        if patient.email in existing:
+            errors.append(RowError(row=row, error="Email already exists"))
+        elif seen[patient.email] > 1:
+            errors.append(RowError(row=row, error="Email appears more than once in this batch"))
+        else:
+            valid.append(patient.model_dump())
+    return valid, errors
+
+async def prepare_doctors(db: Prisma, batch: list) -> tuple[list, list]:
+    valid, errors = [], []
+    for row, record in batch:
+        try:
+            valid.append(DoctorCreate.model_validate(record).model_dump())
+        except ValidationError as e:
+            errors.append(RowError(row=row, error=describe(e)))
+    return valid, errors
+
+async def prepare_appointments(db: Prisma, batch: list) -> tuple[list, list]:
+    rows, errors = [], []
+    for row, record in batch:
+        try:
+            appointment = AppointmentCreate.model_validate(record)
+            parsed_date = datetime.fromisoformat(appointment.dateTime.replace("Z", "+00:00"))
+            if parsed_date.tzinfo is None:
+                parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+            rows.append((row, appointment, parsed_date))
+        except ValidationError as e:
+            errors.append(RowError(row=row, error=describe(e)))
+        except ValueError:
+            errors.append(RowError(row=row, error="Invalid dateTime format, expected ISO 8601 (e.g., 2025-04-12T10:00:00Z)"))
+    if not rows:
+        return [], errors
+    patient_ids = {appointment.patientId for _, appointment, _ in rows}
+    doctor_ids = {appointment.doctorId for _, appointment, _ in rows}
+    known_patients = {p.id for p in await db.patient.find_many(where={"id": {"in": list(patient_ids)}})}
+    known_doctors = {d.id for d in await db.doctor.find_many(where={"id": {"in": list(doctor_ids)}})}
+    # One query returns a superset of the possible clashes; exact matches are picked out below
+    booked = {
+        (a.patientId, a.doctorId, a.dateTime)
+        for a in await db.appointment.find_many(where={
+            "patientId": {"in": list(patient_ids)},
+            "doctorId": {"in": list(doctor_ids)},
+            "dateTime": {"in": list({parsed_date for _, _, parsed_date in rows})},
+        })
+    }
+    valid = []
+    accepted: dict[int, DoctorSchedule] = {}  # Rows earlier in this batch, per doctor
+    for row, appointment, parsed_date in rows:
+        key = (appointment.patientId, appointment.doctorId, parsed_date)
+        in_batch = accepted.setdefault(appointment.doctorId, DoctorSchedule())
+        if appointment.patientId not in known_patients:
+            errors.append(RowError(row=row, error=f"Patient with ID {appointment.patientId} not found"))
+        elif appointment.doctorId not in known_doctors:
+            errors.append(RowError(row=row, error=f"Doctor with ID {appointment.doctorId} not found"))
+        elif key in booked:
+            errors.append(RowError(row=row, error="An appointment already exists for this patient, doctor, and time"))
+        elif holds_slot(appointment.status) and (
+            in_batch.conflicts(parsed_date) or await availability.conflicts(db, appointment.doctorId, parsed_date)
+        ):
+            errors.append(RowError(row=row, error=f"Doctor {appointment.doctorId} is already booked at that time"))
+        else:
+            booked.add(key)
+            if holds_slot(appointment.status):
+                in_batch.add(row, parsed_date)
+            valid.append({
+                "patientId": appointment.patientId,
+                "doctorId": appointment.doctorId,
+                "dateTime": parsed_date,
+                "status": appointment.status,
+                "purpose": appointment.purpose,
+            })
+    return valid, errors
+
+PREPARE = {
+    ImportEntity.patients: prepare_patients,
+    ImportEntity.doctors: prepare_doctors,
+    ImportEntity.appointments: prepare_appointments,
+}
+
+async def write_batch(db: Prisma, entity: ImportEntity, rows: list) -> int:
+    """Insert one validated batch, its dashboard counts and its change log entries in a single transaction."""
+    now = datetime.now(timezone.utc)
+    async with db.tx() as tx:
+        if entity == ImportEntity.patients:
+            watermark = await max_id(tx, "Patient")
+            created = await tx.patient.create_many(data=rows)
+            await record_days(tx, "patients", {day_of(now): created})
+            await log_inserted(tx, "patient", "Patient", watermark)
+        elif entity == ImportEntity.doctors:
+            watermark = await max_id(tx, "Doctor")
+            created = await tx.doctor.create_many(data=rows)
+            await record_days(tx, "doctors", {day_of(now): created})
+            await log_inserted(tx, "doctor", "Doctor", watermark)
+        else:
+            watermark = await max_id(tx, "Appointment")
+            created = await tx.appointment.create_many(data=rows)
+            await record_days(tx, "appointments", Counter(day_of(row["dateTime"]) for row in rows))
+            await log_inserted(tx, "appointment", "Appointment", watermark)
+    invalidate_summary()
+    if entity == ImportEntity.patients:
+        await patient_cache.invalidate()
+    elif entity == ImportEntity.doctors:
+        await doctor_cache.invalidate()
+    else:
+        # Loaded schedules for these doctors are now stale; they reload on next use
+        for doctor_id in {row["doctorId"] for row in rows}:
+            availability.forget(doctor_id)
+    return created
+
+@router.post("/{entity}", response_model=ImportReport)
+async def import_entity(
+    entity: ImportEntity,
+    request: Request,
+    format: ImportFormat = ImportFormat.ndjson,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Bulk-load patients, doctors or appointments from a streamed NDJSON or CSV upload (admin only).
+
+    Rows are validated and written IMPORT_BATCH_SIZE at a time; each batch
+    commits on its own, so a bad row only fails itself. Imported appointments
+    do not send notifications.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this resource"
+        )
+    received = created = failed = 0
+    errors: list[RowError] = []
+
+    async def flush(batch: list):
+        nonlocal created, failed
+        parsed = [(row, record) for row, record in batch if not isinstance(record, Exception)]
+        batch_errors = [RowError(row=row, error=describe(record)) for row, record in batch if isinstance(record, Exception)]
+        valid, invalid = await PREPARE[entity](db, parsed)
+        batch_errors.extend(invalid)
+        if valid:
+            try:
+                created += await write_batch(db, entity, valid)
+            except Exception as e:
+                # Usually a concurrent write won a unique key; the whole batch was rolled back
+                rejected = {error.row for error in invalid}
+                batch_errors.extend(
+                    RowError(row=row, error=f"Batch rolled back: {e}") for row, _ in parsed if row not in rejected
+                )
+        failed += len(batch_errors)
+        errors.extend(batch_errors[:max(0, IMPORT_MAX_ERRORS - len(errors))])
+
+    batch = []
+    async for row, record in read_records(request, format):
+        received += 1
+        batch.append((row, record))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    errors.sort(key=lambda error: error.row)
+    return ImportReport(entity=entity.value, received=received, created=created, failed=failed, errors=errors)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from prisma import Prisma
+from ..database import get_db
+from ..routes.auth import get_current_active_user
+from ..changes import CHANGES_PAGE_MAX, ENTITIES, latest_seq, read_changes
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+@router.get("/")
+async def list_changes(
+    since: int | None = None,
+    limit: int = 500,
+    entities: str | None = None,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Everything created, updated or deleted after the cursor `since`, oldest first.
+
+    Each change is {seq, entity, id, action, data}. `data` holds the row's columns,
+    or null for a delete. Pass `next` back as `since` until `hasMore` is false.
+    Without `since`, the response only carries the current cursor: take it before
+    a full download, then sync from it. 410 means the cursor predates the
+    compacted log, so the client must download everything again.
+    """
+    if not 1 <= limit <= CHANGES_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {CHANGES_PAGE_MAX}")
+    chosen = [name.strip() for name in (entities or ",".join(ENTITIES)).split(",") if name.strip()]
+    unknown = [name for name in chosen if name not in ENTITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown entities: {', '.join(unknown)}; expected {', '.join(ENTITIES)}")
+    if since is None:
+        return {"changes": [], "next": await latest_seq(db), "hasMore": False}
+    return await read_changes(db, since, limit, chosen)
@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date as Date, datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from prisma import Prisma
 from pydantic import BaseModel
 from ..database import get_db
 from ..routes.auth import get_current_active_user
+from ..stats import appointment_days, invalidate_summary, record, record_days
+from ..pagination import DOCTOR_ORDER, apply_cursor, page, prisma_order
+from ..fieldsets import parse_fieldset
+from ..conditional import etag_for, not_modified, tag
+from ..reference_data import doctors as doctor_cache
+from ..events import doctor_event, publish
+from ..changes import log_changes
+from ..scheduling import APPOINTMENT_MINUTES, DURATION, WORKDAY_END, WORKDAY_START, availability
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
@@ -20,44 +29,103 @@ async def create_doctor(
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    return await db.doctor.create(
-        data={
-            "name": doctor.name,
-            "specialty": doctor.specialty,
-        }
-    )
+    async with db.tx() as tx:
+        new_doctor = await tx.doctor.create(
+            data={
+                "name": doctor.name,
+                "specialty": doctor.specialty,
+            }
+        )
+        await log_changes(tx, "doctor", "created", [new_doctor])
+        await record(tx, "doctors", new_doctor.createdAt)
+    invalidate_summary()
+    await doctor_cache.invalidate()
+    await publish(db, doctor_event("created", new_doctor))
+    return new_doctor
 
 @router.get("/{doctor_id}")
 async def get_doctor(
     doctor_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
+    """A doctor with their newest appointments (NESTED_LIMIT by default; `include=appointments:N` for more)."""
+    fieldset = parse_fieldset("doctor", fields, include, default_include="appointments")
     doctor = await db.doctor.find_unique(
         where={"id": doctor_id},
-        include={"appointments": True}
+        include=fieldset.prisma_include()
     )
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return doctor
+    etag = etag_for(request, doctor)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    return fieldset.project(doctor)
+
+@router.get("/{doctor_id}/availability")
+async def get_availability(
+    doctor_id: int,
+    date: Date | None = None,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Free appointment slots for one doctor on `date` (UTC, defaults to today)."""
+    doctor = await doctor_cache.get(db, doctor_id)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    day = date or datetime.now(timezone.utc).date()
+    slots = await availability.free_slots(db, doctor_id, day)
+    return {
+        "doctorId": doctor_id,
+        "date": day.isoformat(),
+        "slotMinutes": APPOINTMENT_MINUTES,
+        "workingHours": {"start": WORKDAY_START.isoformat("minutes"), "end": WORKDAY_END.isoformat("minutes")},
+        "slots": [{"start": slot.isoformat(), "end": (slot + DURATION).isoformat()} for slot in slots],
+    }
 
 @router.get("/")
 async def list_doctors(
+    request: Request,
+    response: Response,
     specialty: str | None = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
+    fieldset = parse_fieldset("doctor", fields, include)
     where = {}
     if specialty:
         where["specialty"] = {"contains": specialty}
-    return await db.doctor.find_many(
-        where=where,
-        skip=skip,
-        take=limit,
-        order={"id": "asc"}
-    )
+    # Passing `cursor` (empty for the first page) switches to keyset paging and a {"items", "next_cursor"} response
+    query = {
+        "where": apply_cursor(where, DOCTOR_ORDER, cursor),
+        "skip": skip if cursor is None else 0,
+        "take": limit,
+        "order": prisma_order(DOCTOR_ORDER),
+    }
+    if fieldset.include:
+        doctors = await db.doctor.find_many(include=fieldset.prisma_include(), **query)
+    else:
+        doctors = await doctor_cache.find_many(db, **query)
+    etag = etag_for(request, doctors)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    items = fieldset.project_all(doctors)
+    if cursor is not None:
+        return page(items, doctors, DOCTOR_ORDER, limit)
+    return items
 
 @router.put("/{doctor_id}")
 async def update_doctor(
@@ -66,16 +134,21 @@ async def update_doctor(
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    existing = await db.doctor.find_unique(where={"id": doctor_id})
+    existing = await doctor_cache.get(db, doctor_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return await db.doctor.update(
-        where={"id": doctor_id},
-        data={
-            "name": doctor.name,
-            "specialty": doctor.specialty,
-        }
-    )
+    async with db.tx() as tx:
+        updated = await tx.doctor.update(
+            where={"id": doctor_id},
+            data={
+                "name": doctor.name,
+                "specialty": doctor.specialty,
+            }
+        )
+        await log_changes(tx, "doctor", "updated", [updated])
+    await doctor_cache.invalidate(doctor_id)
+    await publish(db, doctor_event("updated", updated))
+    return updated
 
 @router.delete("/{doctor_id}")
 async def delete_doctor(
@@ -86,4 +159,18 @@ async def delete_doctor(
     existing = await db.doctor.find_unique(where={"id": doctor_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    return await db.doctor.delete(where={"id": doctor_id})
\ No newline at end of file
+    async with db.tx() as tx:
+        # Appointments are removed by the cascade, so count and list them first
+        cascaded = await appointment_days(tx, "doctorId", doctor_id)
+        booked = await tx.appointment.find_many(where={"doctorId": doctor_id})
+        deleted = await tx.doctor.delete(where={"id": doctor_id})
+        await log_changes(tx, "appointment", "deleted", booked)
+        await log_changes(tx, "doctor", "deleted", [existing])
+        await record(tx, "doctors", existing.createdAt, -1)
+        await record_days(tx, "appointments", cascaded)
+    invalidate_summary()
+    availability.forget(doctor_id)
+    await doctor_cache.invalidate(doctor_id)
+    # Clients drop the doctor's appointments along with the doctor, as the cascade did
+    await publish(db, doctor_event("deleted", existing))
+    return deleted
\ No newline at end of file
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date as Date
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from prisma import Prisma
+from ..database import get_db
+from ..routes.auth import get_current_user
+from ..events import ENTITIES, EVENTS_HEARTBEAT, KEEPALIVE_FRAME, broker
+
+router = APIRouter(tags=["events"])
+
+# EventSource cannot set headers, so browsers pass the token as ?token= instead
+optional_bearer = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+async def stream(entities: set[str], doctor_ids: set[int], day: Date | None, last_event_id: str | None):
+    # Subscribing here rather than in the route ties the subscription to the generator's cleanup
+    subscription = broker.subscribe(entities, doctor_ids, day, last_event_id)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                frame = KEEPALIVE_FRAME  # Keeps proxies from closing an idle stream
+            if frame is None:
+                return
+            yield frame
+    finally:
+        broker.unsubscribe(subscription)
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    types: str = "appointments,patients,doctors",
+    doctor_id: str | None = None,
+    date: Date | None = None,
+    token: str | None = None,
+    bearer: str | None = Depends(optional_bearer),
+    db: Prisma = Depends(get_db)
+):
+    """Server-Sent Events stream of changes, as `change` events (see app/events.py).
+
+    `doctor_id` (comma-separated) and `date` (UTC day) narrow appointment and
+    doctor events to one screen's view. A `resync` event means the client
+    missed changes and should refetch.
+    """
+    await get_current_user(bearer or token or "", db)
+    names = [name.strip() for name in types.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ENTITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(unknown)}; expected {', '.join(ENTITIES)}")
+    try:
+        doctor_ids = {int(value) for value in (doctor_id or "").split(",") if value.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="doctor_id must be a comma-separated list of ids")
+    if broker.full:
+        raise HTTPException(status_code=503, detail="Too many live connections on this server, try again shortly")
+    return StreamingResponse(
+        stream({ENTITIES[name] for name in names}, doctor_ids, date, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # An explicit Content-Encoding makes the compression middleware pass the stream through
+        # instead of buffering events inside the compressor.
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from enum import Enum
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from prisma import Prisma
+from ..database import get_db
+from ..routes.auth import get_current_active_user
+from ..pagination import apply_cursor, next_cursor, prisma_order
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+EXPORT_ORDER = [("id", "asc")]
+
+class ExportEntity(str, Enum):
+    patients = "patients"
+    doctors = "doctors"
+    appointments = "appointments"
+    medical_histories = "medical-histories"
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+# Scalar columns written for each entity, in CSV header order
+COLUMNS = {
+    ExportEntity.patients: ["id", "name", "email", "phone", "dob", "createdAt", "updatedAt"],
+    ExportEntity.doctors: ["id", "name", "specialty", "createdAt", "updatedAt"],
+    ExportEntity.appointments: ["id", "patientId", "doctorId", "dateTime", "status", "purpose", "createdAt", "updatedAt"],
+    ExportEntity.medical_histories: ["id", "patientId", "diagnosis", "treatment", "date", "updatedAt"],
+}
+
+def parse_datetime(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} format, expected ISO 8601 (e.g., 2025-04-12T10:00:00Z)")
+
+def table(db: Prisma, entity: ExportEntity):
+    return {
+        ExportEntity.patients: db.patient,
+        ExportEntity.doctors: db.doctor,
+        ExportEntity.appointments: db.appointment,
+        ExportEntity.medical_histories: db.medicalhistory,
+    }[entity]
+
+def serialize(row, columns: list[str]) -> dict:
+    record = {}
+    for column in columns:
+        value = getattr(row, column)
+        record[column] = value.isoformat() if isinstance(value, datetime) else value
+    return record
+
+def encode_chunk(records: list[dict], columns: list[str], fmt: ExportFormat, header: bool) -> str:
+    if fmt == ExportFormat.ndjson:
+        return "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+async def stream_rows(db: Prisma, entity: ExportEntity, where: dict, fmt: ExportFormat):
+    """Read the table in id order, EXPORT_CHUNK_SIZE rows at a time, so memory stays flat however many rows match."""
+    columns = COLUMNS[entity]
+    cursor = None
+    first = True
+    while True:
+        rows = await table(db, entity).find_many(
+            where=apply_cursor(where, EXPORT_ORDER, cursor),
+            take=EXPORT_CHUNK_SIZE,
+            order=prisma_order(EXPORT_ORDER)
+        )
+        if rows or first:
+            yield encode_chunk([serialize(row, columns) for row in rows], columns, fmt, header=first)
+        first = False
+        cursor = next_cursor(rows, EXPORT_ORDER, EXPORT_CHUNK_SIZE)
+        if cursor is None:
+            break
+
+@router.get("/{entity}")
+async def export_entity(
+    entity: ExportEntity,
+    format: ExportFormat = ExportFormat.ndjson,
+    updated_since: str | None = None,
+    name: str | None = None,
+    email: str | None = None,
+    specialty: str | None = None,
+    patient_id: int | None = None,
+    doctor_id: int | None = None,
+    date: str | None = None,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Stream every matching row as NDJSON or CSV.
+
+    Accepts the same filters as the matching list route, plus `updated_since`
+    to export only rows changed after a previous run's watermark.
+    """
+    where = {}
+    if updated_since:
+        where["updatedAt"] = {"gte": parse_datetime(updated_since, "updated_since")}
+    if entity == ExportEntity.patients:
+        if name:
+            where["name"] = {"contains": name}
+        if email:
+            where["email"] = {"contains": email}
+    elif entity == ExportEntity.doctors:
+        if specialty:
+            where["specialty"] = {"contains": specialty}
+    elif entity == ExportEntity.appointments:
+        if patient_id:
+            where["patientId"] = patient_id
+        if doctor_id:
+            where["doctorId"] = doctor_id
+        if date:
+            start = parse_datetime(date, "date").replace(hour=0, minute=0)
+            end = start.replace(hour=23, minute=59)
+            where["dateTime"] = {"gte": start, "lte": end}
+    elif entity == ExportEntity.medical_histories:
+        if patient_id:
+            where["patientId"] = patient_id
+
+    # Rows changed after this instant are picked up by the next run that passes it as updated_since
+    watermark = datetime.now(timezone.utc).isoformat()
+    media_type = "application/x-ndjson" if format == ExportFormat.ndjson else "text/csv"
+    filename = f"{entity.value}.{format.value}"
+    return StreamingResponse(
+        stream_rows(db, entity, where, format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Watermark": watermark,
+        }
+    )
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from prisma import Prisma
 from pydantic import BaseModel
 from ..database import get_db
+from ..pagination import MEDICAL_HISTORY_ORDER, apply_cursor, page, prisma_order
+from ..fieldsets import parse_fieldset
+from ..conditional import etag_for, not_modified, tag
+from ..changes import log_changes
 
 router = APIRouter(prefix="/medical-histories", tags=["medical-histories"])
 
@@ -22,43 +26,70 @@ async def create_medical_history(history: MedicalHistoryCreate, db: Prisma = Dep
     patient = await db.patient.find_unique(where={"id": history.patientId})
     if not patient:
         raise HTTPException(status_code=400, detail="Invalid patient ID")
-    return await db.medicalhistory.create(
-        data={
-            "patientId": history.patientId,
-            "diagnosis": history.diagnosis,
-            "treatment": history.treatment,
-            "date": history.date,
-        }
-    )
+    async with db.tx() as tx:
+        created = await tx.medicalhistory.create(
+            data={
+                "patientId": history.patientId,
+                "diagnosis": history.diagnosis,
+                "treatment": history.treatment,
+                "date": history.date,
+            }
+        )
+        await log_changes(tx, "medicalhistory", "created", [created])
+    return created
 
 @router.get("/{history_id}")
-async def get_medical_history(history_id: int, db: Prisma = Depends(get_db)):
-    """Retrieve a medical history entry."""
+async def get_medical_history(
+    history_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    include: str | None = None,
+    db: Prisma = Depends(get_db)
+):
+    """Retrieve a medical history entry, with its patient unless `include` says otherwise."""
+    fieldset = parse_fieldset("medicalhistory", fields, include, default_include="patient")
     history = await db.medicalhistory.find_unique(
         where={"id": history_id},
-        include={"patient": True}
+        include=fieldset.prisma_include()
     )
     if not history:
         raise HTTPException(status_code=404, detail="Medical history not found")
-    return history
+    etag = etag_for(request, history)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    return fieldset.project(history)
 
 @router.get("/patient/{patient_id}")
 async def get_patient_medical_histories(
     patient_id: int,
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
     db: Prisma = Depends(get_db)
 ):
-    """List all medical history entries for a patient."""
+    """List all medical history entries for a patient, newest first. Pass `cursor` (empty for the first page) for keyset paging."""
     patient = await db.patient.find_unique(where={"id": patient_id})
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return await db.medicalhistory.find_many(
-        where={"patientId": patient_id},
-        skip=skip,
+    histories = await db.medicalhistory.find_many(
+        where=apply_cursor({"patientId": patient_id}, MEDICAL_HISTORY_ORDER, cursor),
+        skip=skip if cursor is None else 0,
         take=limit,
-        order={"date": "desc"}
+        order=prisma_order(MEDICAL_HISTORY_ORDER)
     )
+    etag = etag_for(request, histories)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    if cursor is not None:
+        return page(histories, histories, MEDICAL_HISTORY_ORDER, limit)
+    return histories
 
 @router.put("/{history_id}")
 async def update_medical_history(history_id: int, history: MedicalHistoryUpdate, db: Prisma = Depends(get_db)):
@@ -66,14 +97,17 @@ async def update_medical_history(history_id: int, history: MedicalHistoryUpdate,
     existing = await db.medicalhistory.find_unique(where={"id": history_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Medical history not found")
-    return await db.medicalhistory.update(
-        where={"id": history_id},
-        data={
-            "diagnosis": history.diagnosis,
-            "treatment": history.treatment,
-            "date": history.date,
-        }
-    )
+    async with db.tx() as tx:
+        updated = await tx.medicalhistory.update(
+            where={"id": history_id},
+            data={
+                "diagnosis": history.diagnosis,
+                "treatment": history.treatment,
+                "date": history.date,
+            }
+        )
+        await log_changes(tx, "medicalhistory", "updated", [updated])
+    return updated
 
 @router.delete("/{history_id}")
 async def delete_medical_history(history_id: int, db: Prisma = Depends(get_db)):
@@ -81,4 +115,7 @@ async def delete_medical_history(history_id: int, db: Prisma = Depends(get_db)):
     existing = await db.medicalhistory.find_unique(where={"id": history_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Medical history not found")
-    return await db.medicalhistory.delete(where={"id": history_id})
\ No newline at end of file
+    async with db.tx() as tx:
+        deleted = await tx.medicalhistory.delete(where={"id": history_id})
+        await log_changes(tx, "medicalhistory", "deleted", [existing])
+    return deleted
\ No newline at end of file
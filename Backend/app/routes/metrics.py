@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from .. import metrics
+from ..instrumentation import SLOW_QUERY_SECONDS, slow_samples
+from ..routes.auth import get_current_active_user
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint for this worker's counters and histograms."""
+    return metrics.render()
+
+@router.get("/metrics/slow-queries")
+async def get_slow_queries(current_user=Depends(get_current_active_user)):
+    """This worker's most recent database operations slower than SLOW_QUERY_SECONDS, newest first (admin only)."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this resource"
+        )
+    return {"threshold_ms": SLOW_QUERY_SECONDS * 1000, "samples": list(reversed(slow_samples))}
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from prisma import Prisma
 from pydantic import BaseModel
 from ..database import get_db
 from ..routes.auth import get_current_active_user  # Import auth dependency
+from ..stats import appointment_days, invalidate_summary, record, record_days
+from ..pagination import PATIENT_ORDER, apply_cursor, page, prisma_order
+from ..scheduling import availability
+from ..fieldsets import parse_fieldset
+from ..conditional import etag_for, not_modified, tag
+from ..reference_data import patients as patient_cache
+from ..events import appointment_event, patient_event, publish
+from ..changes import log_changes
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
@@ -26,49 +34,90 @@ async def create_patient(
     existing = await db.patient.find_unique(where={"email": patient.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already exists")
-    return await db.patient.create(
-        data={
-            "name": patient.name,
-            "email": patient.email,
-            "phone": patient.phone,
-            "dob": patient.dob,
-        }
-    )
+    async with db.tx() as tx:
+        new_patient = await tx.patient.create(
+            data={
+                "name": patient.name,
+                "email": patient.email,
+                "phone": patient.phone,
+                "dob": patient.dob,
+            }
+        )
+        await log_changes(tx, "patient", "created", [new_patient])
+        await record(tx, "patients", new_patient.createdAt)
+    invalidate_summary()
+    await patient_cache.invalidate()
+    await publish(db, patient_event("created", new_patient))
+    return new_patient
 
 @router.get("/{patient_id}")
 async def get_patient(
     patient_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
+    """A patient with their newest medical history entries and appointments (NESTED_LIMIT of each by default).
+
+    `include` and `fields` choose the relations and columns; see app/fieldsets.py.
+    """
+    fieldset = parse_fieldset("patient", fields, include, default_include="medicalHistory,appointments")
     patient = await db.patient.find_unique(
         where={"id": patient_id},
-        include={"medicalHistory": True, "appointments": True}
+        include=fieldset.prisma_include()
     )
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient
+    etag = etag_for(request, patient)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    return fieldset.project(patient)
 
 @router.get("/")
 async def list_patients(
+    request: Request,
+    response: Response,
     name: str | None = None,
     email: str | None = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
+    fieldset = parse_fieldset("patient", fields, include)
     where = {}
     if name:
         where["name"] = {"contains": name}
     if email:
         where["email"] = {"contains": email}
-    return await db.patient.find_many(
-        where=where,
-        skip=skip,
-        take=limit,
-        order={"id": "asc"}
-    )
+    # Passing `cursor` (empty for the first page) switches to keyset paging and a {"items", "next_cursor"} response
+    query = {
+        "where": apply_cursor(where, PATIENT_ORDER, cursor),
+        "skip": skip if cursor is None else 0,
+        "take": limit,
+        "order": prisma_order(PATIENT_ORDER),
+    }
+    if fieldset.include:
+        patients = await db.patient.find_many(include=fieldset.prisma_include(), **query)
+    else:
+        patients = await patient_cache.find_many(db, **query)
+    etag = etag_for(request, patients)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    tag(response, etag)
+    items = fieldset.project_all(patients)
+    if cursor is not None:
+        return page(items, patients, PATIENT_ORDER, limit)
+    return items
 
 @router.put("/{patient_id}")
 async def update_patient(
@@ -77,17 +126,22 @@ async def update_patient(
     db: Prisma = Depends(get_db),
     current_user=Depends(get_current_active_user)
 ):
-    existing = await db.patient.find_unique(where={"id": patient_id})
+    existing = await patient_cache.get(db, patient_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return await db.patient.update(
-        where={"id": patient_id},
-        data={
-            "name": patient.name,
-            "phone": patient.phone,
-            "dob": patient.dob,
-        }
-    )
+    async with db.tx() as tx:
+        updated = await tx.patient.update(
+            where={"id": patient_id},
+            data={
+                "name": patient.name,
+                "phone": patient.phone,
+                "dob": patient.dob,
+            }
+        )
+        await log_changes(tx, "patient", "updated", [updated])
+    await patient_cache.invalidate(patient_id)
+    await publish(db, patient_event("updated", updated))
+    return updated
 
 @router.delete("/{patient_id}")
 async def delete_patient(
@@ -98,4 +152,20 @@ async def delete_patient(
     existing = await db.patient.find_unique(where={"id": patient_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return await db.patient.delete(where={"id": patient_id})
\ No newline at end of file
+    async with db.tx() as tx:
+        # Appointments are removed by the cascade, so count and list them first
+        cascaded = await appointment_days(tx, "patientId", patient_id)
+        booked = await tx.appointment.find_many(where={"patientId": patient_id})
+        deleted = await tx.patient.delete(where={"id": patient_id})
+        await log_changes(tx, "appointment", "deleted", booked)
+        await log_changes(tx, "patient", "deleted", [existing])
+        await record(tx, "patients", existing.createdAt, -1)
+        await record_days(tx, "appointments", cascaded)
+    invalidate_summary()
+    await patient_cache.invalidate(patient_id)
+    for appointment in booked:
+        availability.remove(appointment)
+    await publish(
+        db, patient_event("deleted", existing), *(appointment_event("deleted", appointment) for appointment in booked)
+    )
+    return deleted
\ No newline at end of file
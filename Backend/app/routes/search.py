@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+from prisma import Prisma
+from ..database import get_db
+from ..routes.auth import get_current_active_user
+from ..search import SOURCES, search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+SEARCH_LIMIT_MAX = 100
+
+@router.get("/")
+async def search_records(
+    q: str,
+    types: str = "patients,doctors,diagnoses",
+    limit: int = 20,
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Ranked, typo-tolerant search over patient names and emails, doctor names and specialties, and diagnoses.
+
+    Each word is matched as a prefix, so this also serves type-ahead.
+    """
+    kinds = [kind.strip() for kind in types.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}; expected {', '.join(SOURCES)}")
+    if not 1 <= limit <= SEARCH_LIMIT_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_LIMIT_MAX}")
+    return {"query": q, "results": await search(db, q, kinds, limit)}
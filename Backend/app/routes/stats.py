@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from prisma import Prisma
+from ..database import get_db
+from ..routes.auth import get_current_active_user
+from ..stats import dashboard_summary, rebuild_daily_counts
+from ..cache import hit_ratio
+from ..reference_data import doctors as doctor_cache, patients as patient_cache
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/dashboard")
+async def get_dashboard_stats(
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Totals plus the last 30 days against the 30 days before, per patients, doctors and appointments."""
+    return await dashboard_summary(db)
+
+@router.post("/rebuild")
+async def rebuild_stats(
+    db: Prisma = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Recompute the summary table from the base tables (admin only)."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this resource"
+        )
+    await rebuild_daily_counts(db)
+    return await dashboard_summary(db)
+
+@router.get("/cache")
+async def get_cache_stats(current_user=Depends(get_current_active_user)):
+    """Hit ratio and evictions for the reference-data caches, plus hit ratios of the in-process caches.
+
+    Figures are for this worker process (evictions come from the server when CACHE_BACKEND=redis);
+    /metrics exposes the same counters for Prometheus.
+    """
+    return {
+        "doctors": await doctor_cache.stats(),
+        "patients": await patient_cache.stats(),
+        "auth_token": {"hit_ratio": hit_ratio("auth_token")},
+        "dashboard_stats": {"hit_ratio": hit_ratio("dashboard_stats")},
+    }
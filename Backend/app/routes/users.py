@@ -3,11 +3,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from prisma import Prisma
 from pydantic import BaseModel, EmailStr
 from ..database import get_db
-from passlib.context import CryptContext
-from .auth import get_current_active_user
+from ..passwords import hash_password
+from ..pagination import USER_ORDER, apply_cursor, page, prisma_order
+from .auth import get_current_active_user, invalidate_user
 
 router = APIRouter(prefix="/users", tags=["users"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -20,6 +20,10 @@ class UserResponse(BaseModel):
     role: str
     createdAt: datetime
 
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: str | None
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=UserResponse)
 async def create_user(user_data: UserCreate, db: Prisma = Depends(get_db)):
     """Create a new user account."""
@@ -35,7 +39,7 @@ async def create_user(user_data: UserCreate, db: Prisma = Depends(get_db)):
         )
     
     # Hash the password
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # Create the user
     new_user = await db.user.create(
@@ -45,14 +49,22 @@ async def create_user(user_data: UserCreate, db: Prisma = Depends(get_db)):
             "role": user_data.role
         }
     )
+    invalidate_user(new_user.email)
     
     # Return user without password
     return new_user
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user = Depends(get_current_active_user)):
+async def read_users_me(
+    db: Prisma = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
     """Get current authenticated user's information."""
-    return current_user
+    # The cached identity may not carry createdAt, so read the full record
+    user = await db.user.find_unique(where={"id": current_user.id})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
@@ -73,14 +85,15 @@ async def get_user(
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@router.get("/", response_model=list[UserResponse])
+@router.get("/", response_model=list[UserResponse] | UserPage)
 async def list_users(
     skip: int = 0, 
     limit: int = 10, 
+    cursor: str | None = None,
     db: Prisma = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """List all users (admin only)."""
+    """List all users (admin only). Pass `cursor` (empty for the first page) for keyset paging."""
     # Check if current user is admin
     if current_user.role != "admin":
         raise HTTPException(
@@ -89,8 +102,11 @@ async def list_users(
         )
         
     users = await db.user.find_many(
-        skip=skip,
+        where=apply_cursor({}, USER_ORDER, cursor),
+        skip=skip if cursor is None else 0,
         take=limit,
-        order={"id": "asc"}
+        order=prisma_order(USER_ORDER)
     )
+    if cursor is not None:
+        return page(users, users, USER_ORDER, limit)
     return users
\ No newline at end of file
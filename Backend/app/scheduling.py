@@ -0,0 +1,188 @@
+"""Doctor availability and booking-conflict checks backed by an in-memory interval index.
+
+Every appointment occupies [dateTime, dateTime + APPOINTMENT_MINUTES). Each
+doctor's bookings are kept as a list sorted by start time, so "does this
+booking overlap another" and "which bookings fall on day D" are binary
+searches instead of table scans. A doctor's schedule is loaded from the
+database the first time it is needed and kept in step by the write routes;
+it is reloaded after AVAILABILITY_INDEX_TTL seconds so writes made by other
+server processes are picked up. Only bookings that can still overlap a new
+appointment are loaded, i.e. those starting from one duration before the
+load. Questions about earlier times are answered by a query bounded to the
+range asked about.
+
+The index only answers quickly; the database has the final say. The
+Appointment_doctor_slot_excl exclusion constraint rejects overlapping active
+bookings even when two requests race past the in-memory check, and
+`is_booking_conflict` recognises its errors so routes can answer 409.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left, insort
+from datetime import date, datetime, time as clock, timedelta, timezone
+from prisma.errors import PrismaError, UniqueViolationError
+
+APPOINTMENT_MINUTES = int(os.getenv("APPOINTMENT_MINUTES", "30"))  # Must match the interval in Appointment_doctor_slot_excl
+WORKDAY_START = clock.fromisoformat(os.getenv("WORKDAY_START", "09:00"))
+WORKDAY_END = clock.fromisoformat(os.getenv("WORKDAY_END", "17:00"))
+WORKING_DAYS = {int(day) for day in os.getenv("WORKING_DAYS", "0,1,2,3,4").split(",") if day.strip()}  # Monday is 0
+AVAILABILITY_INDEX_TTL = float(os.getenv("AVAILABILITY_INDEX_TTL", "60"))
+
+DURATION = timedelta(minutes=APPOINTMENT_MINUTES)
+
+# Appointments with these statuses no longer hold their slot
+FREE_STATUSES = {"Cancelled"}
+
+def utc(value: datetime) -> datetime:
+    """Naive datetimes are taken as UTC, matching how Prisma stores them."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def holds_slot(status: str | None) -> bool:
+    return status not in FREE_STATUSES
+
+BOOKING_CONSTRAINTS = ("Appointment_doctor_slot_excl", "Appointment_patientId_doctorId_dateTime_key")
+
+def is_booking_conflict(error: Exception) -> bool:
+    """True when a write failed on the overlap or duplicate-booking constraint."""
+    if isinstance(error, UniqueViolationError):
+        return True
+    message = str(error)
+    return isinstance(error, PrismaError) and (
+        "23P01" in message or any(name in message for name in BOOKING_CONSTRAINTS)
+    )
+
+class DoctorSchedule:
+    """One doctor's bookings as (start, appointment id) pairs sorted by start.
+
+    Bookings starting before `since` may be missing; None means the schedule is complete.
+    """
+
+    def __init__(self, bookings=(), since: datetime | None = None):
+        self.bookings = sorted((utc(start), appointment_id) for start, appointment_id in bookings)
+        self.since = None if since is None else utc(since)
+        self.loaded_at = time.monotonic()
+
+    def covers(self, start: datetime) -> bool:
+        """True when every booking that can overlap an appointment starting at or after `start` is here."""
+        return self.since is None or utc(start) - DURATION >= self.since
+
+    def add(self, appointment_id: int, start: datetime):
+        insort(self.bookings, (utc(start), appointment_id))
+
+    def remove(self, appointment_id: int, start: datetime) -> bool:
+        entry = (utc(start), appointment_id)
+        i = bisect_left(self.bookings, entry)
+        if i < len(self.bookings) and self.bookings[i] == entry:
+            del self.bookings[i]
+            return True
+        return False
+
+    def conflicts(self, start: datetime, ignore: int | None = None) -> list[int]:
+        """Ids of bookings overlapping a new appointment starting at `start`."""
+        start = utc(start)
+        # Only bookings starting in (start - DURATION, start + DURATION) can overlap
+        i = bisect_left(self.bookings, (start - DURATION + timedelta(microseconds=1),))
+        clashes = []
+        while i < len(self.bookings) and self.bookings[i][0] < start + DURATION:
+            if self.bookings[i][1] != ignore:
+                clashes.append(self.bookings[i][1])
+            i += 1
+        return clashes
+
+    def between(self, start: datetime, end: datetime) -> list[tuple[datetime, int]]:
+        """Bookings starting in [start, end)."""
+        lo = bisect_left(self.bookings, (utc(start),))
+        hi = bisect_left(self.bookings, (utc(end),))
+        return self.bookings[lo:hi]
+
+    def free_slots(self, day: date) -> list[datetime]:
+        """Start times of the APPOINTMENT_MINUTES slots on `day` that overlap no booking."""
+        if day.weekday() not in WORKING_DAYS:
+            return []
+        opens = datetime.combine(day, WORKDAY_START, tzinfo=timezone.utc)
+        closes = datetime.combine(day, WORKDAY_END, tzinfo=timezone.utc)
+        # Bookings that started up to one duration before opening can still overlap the first slot
+        busy = iter(self.between(opens - DURATION + timedelta(microseconds=1), closes))
+        booking = next(busy, None)
+        slots = []
+        slot = opens
+        while slot + DURATION <= closes:
+            # Skip bookings that end at or before this slot starts
+            while booking is not None and booking[0] + DURATION <= slot:
+                booking = next(busy, None)
+            if booking is None or booking[0] >= slot + DURATION:
+                slots.append(slot)
+            slot += DURATION
+        return slots
+
+class AvailabilityIndex:
+    """Per-doctor schedules, loaded lazily and shared by every request in this process."""
+
+    def __init__(self, ttl: float = AVAILABILITY_INDEX_TTL):
+        self.ttl = ttl
+        self._schedules: dict[int, DoctorSchedule] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    async def schedule(self, db, doctor_id: int) -> DoctorSchedule:
+        schedule = self._schedules.get(doctor_id)
+        if schedule is not None and time.monotonic() - schedule.loaded_at < self.ttl:
+            return schedule
+        lock = self._locks.setdefault(doctor_id, asyncio.Lock())
+        async with lock:
+            schedule = self._schedules.get(doctor_id)
+            if schedule is None or time.monotonic() - schedule.loaded_at >= self.ttl:
+                schedule = await self._load(db, doctor_id, datetime.now(timezone.utc) - DURATION)
+                self._schedules[doctor_id] = schedule
+        return schedule
+
+    async def _load(self, db, doctor_id: int, since: datetime, until: datetime | None = None) -> DoctorSchedule:
+        window = {"gte": since} if until is None else {"gte": since, "lt": until}
+        rows = await db.appointment.find_many(
+            where={"doctorId": doctor_id, "status": {"not_in": list(FREE_STATUSES)}, "dateTime": window}
+        )
+        return DoctorSchedule(((row.dateTime, row.id) for row in rows), since=since)
+
+    async def covering(self, db, doctor_id: int, start: datetime, end: datetime) -> DoctorSchedule:
+        """A schedule holding every booking that can overlap an appointment starting in [start, end].
+
+        Ranges older than the cached schedule are read from the database for this call only.
+        """
+        schedule = await self.schedule(db, doctor_id)
+        if schedule.covers(start):
+            return schedule
+        return await self._load(db, doctor_id, utc(start) - DURATION, utc(end) + DURATION)
+
+    async def conflicts(self, db, doctor_id: int, start: datetime, ignore: int | None = None) -> list[int]:
+        return (await self.covering(db, doctor_id, start, start)).conflicts(start, ignore)
+
+    async def free_slots(self, db, doctor_id: int, day: date) -> list[datetime]:
+        opens = datetime.combine(day, WORKDAY_START, tzinfo=timezone.utc)
+        closes = datetime.combine(day, WORKDAY_END, tzinfo=timezone.utc)
+        return (await self.covering(db, doctor_id, opens, closes)).free_slots(day)
+
+    # Write-side hooks; a doctor that has not been loaded yet picks the change up when it is
+
+    def add(self, appointment):
+        schedule = self._schedules.get(appointment.doctorId)
+        if schedule is not None and holds_slot(appointment.status):
+            schedule.add(appointment.id, appointment.dateTime)
+
+    def remove(self, appointment):
+        schedule = self._schedules.get(appointment.doctorId)
+        if schedule is not None:
+            schedule.remove(appointment.id, appointment.dateTime)
+
+    def replace(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+    def forget(self, doctor_id: int):
+        self._schedules.pop(doctor_id, None)
+
+    def clear(self):
+        self._schedules.clear()
+
+availability = AvailabilityIndex()
@@ -0,0 +1,77 @@
+"""Response schemas shared by the routes.
+
+Routes that return many rows render them through a TypeAdapter built once at
+import time: pydantic-core reads the Prisma objects by attribute and writes
+JSON bytes directly, skipping FastAPI's per-field jsonable_encoder pass. The
+same models are declared as `response_model` so the OpenAPI docs stay typed.
+Datetimes keep the `+00:00` offset the API has always sent; pydantic would
+write `Z` on its own.
+"""
+from datetime import date, datetime
+from typing import Annotated
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict, PlainSerializer, TypeAdapter, field_validator
+
+# datetime.isoformat(), as jsonable_encoder and orjson write it
+IsoDatetime = Annotated[datetime, PlainSerializer(lambda value: value.isoformat(), return_type=str, when_used="json")]
+
+class PatientSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    email: str
+    phone: str | None = None
+    dob: str | None = None
+    medicalHistory: list | None = None
+    appointments: None = None  # Not loaded with an appointment; kept for response compatibility
+
+    @field_validator("dob", mode="before")
+    @classmethod
+    def dob_as_string(cls, value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+class DoctorSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    specialty: str
+    appointments: None = None
+
+class AppointmentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    patientId: int
+    doctorId: int
+    patient: PatientSummary
+    doctor: DoctorSummary
+    dateTime: IsoDatetime
+    status: str
+    purpose: str | None = None
+
+class AppointmentPage(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    items: list[AppointmentResponse]
+    next_cursor: str | None = None
+
+class AppointmentBatchResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    created: list[AppointmentResponse]
+    updated: list[AppointmentResponse]
+    cancelled: list[int]
+
+APPOINTMENT = TypeAdapter(AppointmentResponse)
+APPOINTMENT_LIST = TypeAdapter(list[AppointmentResponse])
+APPOINTMENT_PAGE = TypeAdapter(AppointmentPage)
+APPOINTMENT_BATCH = TypeAdapter(AppointmentBatchResult)
+
+def render(adapter: TypeAdapter, value, status_code: int = 200) -> Response:
+    """Validate `value` (Prisma objects or dicts of them) against `adapter` and return it as a JSON response."""
+    content = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    return Response(content=content, status_code=status_code, media_type="application/json")
@@ -0,0 +1,52 @@
+"""Ranked search across patients, doctors and diagnoses.
+
+Each table has a generated `searchVector` column (see the add_search
+migration) with a GIN index. Every word of the query is matched as a prefix
+(`word:*`), so partial input works for type-ahead. Trigram similarity (`%`,
+backed by the gin_trgm_ops indexes) also matches misspelt names. A result's
+score is the full-text rank plus the trigram similarity.
+"""
+import re
+
+SEARCH_MAX_TERMS = 8
+
+# type -> SQL for one ranked source; $1 is the prefix tsquery text, $2 the raw query, $3 the limit
+SOURCES = {
+    "patients": '''
+        SELECT 'patient' AS type, p."id", p."name" AS title, p."email" AS subtitle, NULL::int AS "patientId",
+               (ts_rank(p."searchVector", to_tsquery('simple', $1)) + similarity(p."name", $2))::float AS score
+        FROM "Patient" p
+        WHERE p."searchVector" @@ to_tsquery('simple', $1) OR p."name" % $2
+        ORDER BY score DESC LIMIT $3''',
+    "doctors": '''
+        SELECT 'doctor' AS type, d."id", d."name" AS title, d."specialty" AS subtitle, NULL::int AS "patientId",
+               (ts_rank(d."searchVector", to_tsquery('simple', $1))
+                + GREATEST(similarity(d."name", $2), similarity(d."specialty", $2)))::float AS score
+        FROM "Doctor" d
+        WHERE d."searchVector" @@ to_tsquery('simple', $1) OR d."name" % $2 OR d."specialty" % $2
+        ORDER BY score DESC LIMIT $3''',
+    "diagnoses": '''
+        SELECT 'diagnosis' AS type, h."id", h."diagnosis" AS title, p."name" AS subtitle, h."patientId",
+               (ts_rank(h."searchVector", to_tsquery('english', $1)) + similarity(h."diagnosis", $2))::float AS score
+        FROM "MedicalHistory" h JOIN "Patient" p ON p."id" = h."patientId"
+        WHERE h."searchVector" @@ to_tsquery('english', $1) OR h."diagnosis" % $2
+        ORDER BY score DESC LIMIT $3''',
+}
+
+def prefix_query(text: str) -> str | None:
+    """`word1:* & word2:*` from free text; None when there is nothing to search for.
+
+    Only word characters survive, so user input cannot inject tsquery operators.
+    """
+    terms = re.findall(r"\w+", text.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+async def search(db, text: str, types: list[str], limit: int) -> list[dict]:
+    tsquery = prefix_query(text)
+    if tsquery is None or not types:
+        return []
+    parts = [f"({SOURCES[kind]})" for kind in types]
+    sql = "SELECT * FROM (" + " UNION ALL ".join(parts) + ") results ORDER BY score DESC LIMIT $3"
+    return await db.query_raw(sql, tsquery, text.strip(), limit)
@@ -0,0 +1,94 @@
+"""Dashboard statistics backed by the DailyCount summary table.
+
+Each row holds the number of patients, doctors (by createdAt) or appointments
+(by dateTime) for one UTC day. Prisma stores timestamps in UTC, so a plain
+::date cast in SQL gives the same day as `day_of`. The write routes adjust the
+affected rows with an atomic upsert inside their own transaction, and call
+`invalidate_summary` once it has committed, so the dashboard sums at most a
+few hundred summary rows however large the base tables grow.
+`rebuild_daily_counts` recomputes the table with COUNT/GROUP BY if it drifts.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from .cache import LRUTTLCache
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+PERIOD_DAYS = 30
+
+METRICS = ("patients", "doctors", "appointments")
+
+summary_cache = LRUTTLCache("dashboard_stats", 1, STATS_CACHE_TTL)
+
+def day_of(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+async def record(db, metric: str, value: datetime, delta: int = 1):
+    """Add `delta` to the count for the UTC day of `value`."""
+    await record_days(db, metric, {day_of(value): delta})
+
+async def record_days(db, metric: str, deltas: dict):
+    """Apply several per-day adjustments ({date: delta}) for one metric."""
+    for day, delta in deltas.items():
+        if not delta:
+            continue
+        await db.execute_raw(
+            'INSERT INTO "DailyCount" ("metric", "day", "count") VALUES ($1, $2::date, $3) '
+            'ON CONFLICT ("metric", "day") DO UPDATE SET "count" = "DailyCount"."count" + EXCLUDED."count"',
+            metric, day.isoformat(), delta
+        )
+
+def invalidate_summary():
+    """Drop the cached dashboard; call after the transaction that adjusted DailyCount commits."""
+    summary_cache.clear()
+
+async def appointment_days(db, column: str, value: int) -> dict:
+    """Appointments per UTC day for one patient or doctor, used before a cascading delete."""
+    assert column in ("patientId", "doctorId")
+    rows = await db.query_raw(
+        f'SELECT "dateTime"::date AS day, COUNT(*)::int AS n FROM "Appointment" WHERE "{column}" = $1 GROUP BY 1',
+        value
+    )
+    return {date.fromisoformat(str(row["day"])[:10]): -row["n"] for row in rows}
+
+async def rebuild_daily_counts(db):
+    """Recompute every summary row from the base tables."""
+    async with db.tx() as tx:
+        await tx.execute_raw('DELETE FROM "DailyCount"')
+        await tx.execute_raw(
+            'INSERT INTO "DailyCount" ("metric", "day", "count") '
+            'SELECT \'patients\', "createdAt"::date, COUNT(*) FROM "Patient" GROUP BY 2 '
+            'UNION ALL '
+            'SELECT \'doctors\', "createdAt"::date, COUNT(*) FROM "Doctor" GROUP BY 2 '
+            'UNION ALL '
+            'SELECT \'appointments\', "dateTime"::date, COUNT(*) FROM "Appointment" GROUP BY 2'
+        )
+    summary_cache.clear()
+
+async def dashboard_summary(db) -> dict:
+    cached = summary_cache.get("dashboard")
+    if cached is not None:
+        return cached
+    today = datetime.now(timezone.utc).date()
+    current_start = today - timedelta(days=PERIOD_DAYS - 1)
+    previous_start = current_start - timedelta(days=PERIOD_DAYS)
+    rows = await db.query_raw(
+        'SELECT "metric", '
+        'COALESCE(SUM("count"), 0)::int AS total, '
+        'COALESCE(SUM("count") FILTER (WHERE "day" BETWEEN $1::date AND $2::date), 0)::int AS current, '
+        'COALESCE(SUM("count") FILTER (WHERE "day" >= $3::date AND "day" < $1::date), 0)::int AS previous '
+        'FROM "DailyCount" GROUP BY "metric"',
+        current_start.isoformat(), today.isoformat(), previous_start.isoformat()
+    )
+    summary = {metric: {"total": 0, "current": 0, "previous": 0} for metric in METRICS}
+    for row in rows:
+        if row["metric"] in summary:
+            summary[row["metric"]] = {"total": row["total"], "current": row["current"], "previous": row["previous"]}
+    summary["period"] = {
+        "currentStart": current_start.isoformat(),
+        "previousStart": previous_start.isoformat(),
+        "end": today.isoformat(),
+    }
+    summary_cache.set("dashboard", summary)
+    return summary
@@ -0,0 +1,118 @@
+"""Conflict checks and free-slot lookups: the in-memory interval index against naive scans.
+
+    python -m benchmarks.bench_availability --bookings 1000 10000 100000 --lookups 20000
+    python -m benchmarks.bench_availability --database --doctor-id 1 --lookups 2000
+
+The default run is offline: "naive" scans the doctor's full booking list for
+every lookup, which is what fetching all of a doctor's appointments and
+filtering them in Python costs. With --database the naive side instead issues
+the equivalent overlap query for each lookup against DATABASE_URL, and the
+index is loaded from the same rows.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from app.scheduling import DURATION, DoctorSchedule, utc
+from .common import report
+
+def synthetic_bookings(count: int, rng: random.Random) -> list[tuple[datetime, int]]:
+    """`count` non-overlapping bookings on slot boundaries, starting 2025-01-01."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    slots = rng.sample(range(count * 4), count)
+    return [(start + DURATION * slot, appointment_id) for appointment_id, slot in enumerate(slots, 1)]
+
+def naive_conflicts(bookings: list, start: datetime) -> list[int]:
+    return [appointment_id for booked, appointment_id in bookings if booked < start + DURATION and start < booked + DURATION]
+
+def naive_free_slots(bookings: list, day: date) -> list[datetime]:
+    schedule = DoctorSchedule()
+    schedule.bookings = sorted(
+        (booked, appointment_id) for booked, appointment_id in bookings if booked.date() in (day, day - timedelta(days=1))
+    )
+    return schedule.free_slots(day)
+
+def timed(fn, queries: list) -> tuple[float, list]:
+    start = time.perf_counter()
+    answers = [fn(query) for query in queries]
+    return time.perf_counter() - start, answers
+
+def compare(bookings: list, lookups: int, rng: random.Random) -> dict:
+    first, last = bookings[0][0], bookings[-1][0]
+    for booked, _ in bookings:
+        first, last = min(first, booked), max(last, booked)
+    span = int((last - first) / DURATION) + 1
+    starts = [first + DURATION * rng.randrange(span) + timedelta(minutes=rng.choice((0, 10, 20))) for _ in range(lookups)]
+    days = [start.date() for start in starts[: max(1, lookups // 20)]]
+
+    load_start = time.perf_counter()
+    schedule = DoctorSchedule(bookings)
+    load_s = time.perf_counter() - load_start
+
+    naive_s, naive_answers = timed(lambda start: naive_conflicts(bookings, start), starts)
+    index_s, index_answers = timed(schedule.conflicts, starts)
+    assert [sorted(a) for a in naive_answers] == [sorted(a) for a in index_answers], "index disagrees with scan"
+    naive_slots_s, naive_slots = timed(lambda day: naive_free_slots(bookings, day), days)
+    index_slots_s, index_slots = timed(schedule.free_slots, days)
+    assert naive_slots == index_slots, "free slots disagree"
+    return {
+        "bookings": len(bookings),
+        "index_load_ms": round(load_s * 1000, 2),
+        "conflict_checks": lookups,
+        "conflict_naive_us": round(naive_s / lookups * 1e6, 2),
+        "conflict_index_us": round(index_s / lookups * 1e6, 2),
+        "free_slot_queries": len(days),
+        "free_slots_naive_us": round(naive_slots_s / len(days) * 1e6, 2),
+        "free_slots_index_us": round(index_slots_s / len(days) * 1e6, 2),
+    }
+
+async def compare_database(args, rng: random.Random) -> dict:
+    from prisma import Prisma
+    db = Prisma()
+    await db.connect()
+    try:
+        rows = await db.appointment.find_many(where={"doctorId": args.doctor_id})
+        if not rows:
+            raise SystemExit(f"Doctor {args.doctor_id} has no appointments to measure against")
+        bookings = [(utc(row.dateTime), row.id) for row in rows]
+        first = min(booked for booked, _ in bookings)
+        span = int((max(booked for booked, _ in bookings) - first) / DURATION) + 1
+        starts = [first + DURATION * rng.randrange(span) for _ in range(args.lookups)]
+        schedule = DoctorSchedule(bookings)
+
+        start = time.perf_counter()
+        for slot in starts:
+            await db.appointment.find_first(where={
+                "doctorId": args.doctor_id,
+                "dateTime": {"gt": slot - DURATION, "lt": slot + DURATION},
+            })
+        query_s = time.perf_counter() - start
+        index_s, _ = timed(schedule.conflicts, starts)
+        return {
+            "doctor_id": args.doctor_id,
+            "bookings": len(bookings),
+            "conflict_checks": args.lookups,
+            "conflict_query_us": round(query_s / args.lookups * 1e6, 2),
+            "conflict_index_us": round(index_s / args.lookups * 1e6, 2),
+        }
+    finally:
+        await db.disconnect()
+
+def main(args):
+    rng = random.Random(args.random_seed)
+    if args.database:
+        report({"database": asyncio.run(compare_database(args, rng))}, args.output)
+        return
+    runs = [compare(synthetic_bookings(count, rng), args.lookups, rng) for count in args.bookings]
+    report({"runs": runs}, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, nargs="+", default=[1000, 10000, 100000], help="Bookings for one doctor")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--database", action="store_true", help="Compare against overlap queries on DATABASE_URL")
+    parser.add_argument("--doctor-id", type=int, default=1)
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    main(parser.parse_args())
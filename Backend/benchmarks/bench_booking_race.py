@@ -0,0 +1,103 @@
+"""Fire many simultaneous bookings at one doctor's slot and check that exactly one wins.
+
+    python -m benchmarks.bench_booking_race --email admin@example.com --bookings 2000 --concurrency 200 --workers 4
+
+Each request books a different patient into the same slot, so only the
+overlap constraint can reject them. Several uvicorn workers give each process
+its own availability index, which forces most conflicts through the database
+rather than the in-memory pre-check. The doctor and patients are created
+before the run and deleted afterwards. The bookings made through the API
+were counted in DailyCount, so the teardown takes them off again, as
+DELETE /doctors/{id} would.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import httpx
+from prisma import Prisma
+from app.changes import log_changes
+from app.stats import appointment_days, record_days
+from .common import bearer_headers, report, summarize, uvicorn_server
+
+async def setup(db: Prisma, bookings: int, tag: str) -> tuple[int, list[int]]:
+    doctor = await db.doctor.create(data={"name": f"Dr. Race {tag}", "specialty": "Benchmark"})
+    await db.patient.create_many(data=[
+        {"name": f"Race Patient {i}", "email": f"race.{tag}.{i}@example.com"} for i in range(bookings)
+    ])
+    patients = await db.patient.find_many(where={"email": {"startswith": f"race.{tag}."}})
+    return doctor.id, [patient.id for patient in patients]
+
+async def teardown(db: Prisma, doctor_id: int, tag: str):
+    async with db.tx() as tx:
+        # The cascade removes the booked appointments; count them and log their deletes with it
+        cascaded = await appointment_days(tx, "doctorId", doctor_id)
+        booked = await tx.appointment.find_many(where={"doctorId": doctor_id})
+        await tx.doctor.delete(where={"id": doctor_id})
+        await tx.patient.delete_many(where={"email": {"startswith": f"race.{tag}."}})
+        await record_days(tx, "appointments", cascaded)
+        await log_changes(tx, "appointment", "deleted", booked)
+
+async def race(base_url: str, headers: dict, doctor_id: int, patient_ids: list[int], slot: datetime, concurrency: int) -> dict:
+    statuses: dict[int, int] = {}
+    latencies: list[float] = []
+    remaining = iter(patient_ids)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        async def worker():
+            for patient_id in remaining:
+                start = time.perf_counter()
+                response = await client.post("/appointments/", json={
+                    "patientId": patient_id, "doctorId": doctor_id, "dateTime": slot.isoformat(),
+                })
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    created = statuses.get(201, 0)
+    conflicts = statuses.get(409, 0)
+    return {
+        **summarize(latencies, elapsed, errors=len(latencies) - created - conflicts),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "created": created,
+        "conflicts_rejected": conflicts,
+        "correct": created == 1 and conflicts == len(patient_ids) - 1,
+    }
+
+async def main(args):
+    tag = uuid.uuid4().hex[:8]
+    db = Prisma()
+    await db.connect()
+    doctor_id, patient_ids = await setup(db, args.bookings, tag)
+    # Next Monday at 10:00 UTC, well inside working hours
+    today = datetime.now(timezone.utc).replace(hour=10, minute=0, second=0, microsecond=0)
+    slot = today + timedelta(days=7 - today.weekday())
+    try:
+        with uvicorn_server(args.port, env={"NOTIFICATION_PROVIDER": "fake"}, workers=args.workers):
+            result = await race(
+                f"http://127.0.0.1:{args.port}", bearer_headers(args.email), doctor_id, patient_ids, slot, args.concurrency
+            )
+        stored = await db.appointment.count(where={"doctorId": doctor_id})
+    finally:
+        await teardown(db, doctor_id, tag)
+        await db.disconnect()
+    report({
+        "bookings": args.bookings,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "appointments_stored": stored,
+        **result,
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True, help="Existing user the bookings are made as")
+    parser.add_argument("--bookings", type=int, default=2000, help="Parallel booking attempts, one patient each")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""Bytes transferred and server CPU for repeat loads of the list pages, with and without ETags and compression.
+
+    python -m benchmarks.bench_conditional --email admin@example.com --repeat 200
+
+Each endpoint is loaded `--repeat` times in three modes:
+  plain        no compression, no validator (what every page mount used to cost)
+  compressed   Accept-Encoding: br, gzip
+  revalidated  compressed, sending the ETag from the first response (unchanged data answers 304)
+Server CPU is read from /proc for the uvicorn process, so run it on the same machine.
+"""
+import argparse
+import time
+import httpx
+from .common import bearer_headers, cpu_seconds, report, uvicorn_server
+
+ENDPOINTS = [
+    "/patients/?limit=100",
+    "/doctors/?limit=100",
+    "/appointments/?limit=100",
+]
+
+def load(client: httpx.Client, url: str, headers: dict, repeat: int, pid: int, revalidate: bool) -> dict:
+    etag = None
+    downloaded = 0
+    statuses = {}
+    cpu_start = cpu_seconds(pid)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        request_headers = dict(headers)
+        if revalidate and etag:
+            request_headers["If-None-Match"] = etag
+        response = client.get(url, headers=request_headers)
+        etag = response.headers.get("etag", etag)
+        downloaded += response.num_bytes_downloaded
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - start
+    return {
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "bytes_per_request": round(downloaded / repeat),
+        "server_cpu_ms_per_request": round((cpu_seconds(pid) - cpu_start) / repeat * 1000, 3),
+        "latency_ms": round(elapsed / repeat * 1000, 2),
+    }
+
+def main(args):
+    auth = bearer_headers(args.email)
+    modes = {
+        "plain": ({**auth, "Accept-Encoding": "identity"}, False),
+        "compressed": ({**auth, "Accept-Encoding": "br, gzip"}, False),
+        "revalidated": ({**auth, "Accept-Encoding": "br, gzip"}, True),
+    }
+    results = {"repeat": args.repeat, "endpoints": {}}
+    with uvicorn_server(args.port, env={"NOTIFICATION_PROVIDER": "fake"}) as server:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+            for url in ENDPOINTS:
+                results["endpoints"][url] = {
+                    mode: load(client, url, headers, args.repeat, server.pid, revalidate)
+                    for mode, (headers, revalidate) in modes.items()
+                }
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True, help="Existing user the requests are made as")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,49 @@
+"""Requests/sec for GET /patients/ with the shared Prisma client vs. connect-per-request.
+
+Needs DATABASE_URL pointing at a seeded database:
+    python -m benchmarks.bench_db_pool --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import httpx
+from prisma import Prisma
+from app.main import app
+from app.database import connect_db, disconnect_db, get_db
+from app.routes.auth import get_current_active_user
+from .common import report, run_load, stub_user
+
+async def connect_per_request_db():
+    # The previous get_db: a new client and engine connection for every request
+    db = Prisma()
+    await db.connect()
+    try:
+        yield db
+    finally:
+        await db.disconnect()
+
+async def main(args):
+    app.dependency_overrides[get_current_active_user] = stub_user
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        app.dependency_overrides[get_db] = connect_per_request_db
+        results["connect_per_request"] = await run_load(
+            client, "GET", "/patients/", requests=args.requests, concurrency=args.concurrency
+        )
+        del app.dependency_overrides[get_db]
+
+        await connect_db()
+        try:
+            results["shared_client"] = await run_load(
+                client, "GET", "/patients/", requests=args.requests, concurrency=args.concurrency
+            )
+        finally:
+            await disconnect_db()
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,251 @@
+"""End-to-end load test: a mixed clinic workload against a real server, with results per route.
+
+    python -m benchmarks.bench_e2e --seed-patients 100000 --output base.json       # seed, then measure
+    python -m benchmarks.bench_e2e --output head.json --baseline base.json         # measure, compare to base.json
+
+It starts app.main:app under uvicorn with the fake notification providers, so
+no SMS or email leaves the machine. It then runs --users virtual users for
+--duration seconds after a --warmup. Each virtual user repeatedly picks a
+step from WORKLOAD by weight: logins, patient lists and lookups, search,
+appointment lists, availability, booking, rescheduling, and the dashboard.
+Appointments booked during the run are deleted afterwards.
+
+Needs DATABASE_URL pointing at a migrated database. --seed-patients first
+runs prisma/seed.py with that many patients, which also creates the login
+used here (admin@example.com / admin123). Without it, the existing data and
+user are used.
+
+Booking and rescheduling pick random slots. The 409 answers for slots
+already taken are expected, so they are counted but not treated as errors.
+
+The report has throughput and p50/p95/p99 for each route template, the run
+settings and the git commit. With --baseline, every route is compared to an
+earlier report. A route is flagged as a regression when its p95 or
+throughput is worse by more than --threshold percent. With
+--fail-on-regression, the exit status is then 1, so CI can gate on it.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from app.scheduling import APPOINTMENT_MINUTES, WORKDAY_END, WORKDAY_START, WORKING_DAYS
+from .common import cpu_seconds, peak_rss_mb, report, summarize, uvicorn_server
+
+SEARCH_TERMS = ["john", "pri", "garc", "chen", "smi", "hyper", "migr", "cardio", "pedia", "asth", "olga", "khan"]
+PURPOSES = ["Checkup", "Follow-up", "Consultation"]
+
+class Context:
+    def __init__(self, client, headers: dict, args, patients: tuple[int, int], doctors: tuple[int, int]):
+        self.client = client
+        self.headers = headers
+        self.args = args
+        self.patients = patients
+        self.doctors = doctors
+        self.booked: list[int] = []
+
+    def patient_id(self, rng: random.Random) -> int:
+        return rng.randint(*self.patients)
+
+    def doctor_id(self, rng: random.Random) -> int:
+        return rng.randint(*self.doctors)
+
+    async def get(self, url: str, **params):
+        return await self.client.get(url, params=params, headers=self.headers)
+
+def future_slot(rng: random.Random) -> datetime:
+    """A weekday working-hours slot in the next 60 days."""
+    today = datetime.now(timezone.utc).date()
+    while True:
+        day = today + timedelta(days=rng.randint(1, 60))
+        if day.weekday() in WORKING_DAYS:
+            break
+    start = datetime.combine(day, WORKDAY_START, tzinfo=timezone.utc)
+    slots = int((datetime.combine(day, WORKDAY_END, tzinfo=timezone.utc) - start) / timedelta(minutes=APPOINTMENT_MINUTES))
+    return start + timedelta(minutes=APPOINTMENT_MINUTES * rng.randrange(slots))
+
+# Each step returns (route template, response)
+
+async def login(ctx: Context, rng):
+    data = {"username": ctx.args.email, "password": ctx.args.password}
+    return "POST /auth/login", await ctx.client.post("/auth/login", data=data)
+
+async def list_patients(ctx: Context, rng):
+    return "GET /patients/", await ctx.get("/patients/", limit=20, skip=rng.randrange(0, 200, 20))
+
+async def get_patient(ctx: Context, rng):
+    return "GET /patients/{patient_id}", await ctx.get(f"/patients/{ctx.patient_id(rng)}")
+
+async def search(ctx: Context, rng):
+    return "GET /search/", await ctx.get("/search/", q=rng.choice(SEARCH_TERMS))
+
+async def doctor_day(ctx: Context, rng):
+    day = future_slot(rng).date().isoformat()
+    return "GET /appointments/?doctor_id&date", await ctx.get("/appointments/", doctor_id=ctx.doctor_id(rng), date=day)
+
+async def availability(ctx: Context, rng):
+    day = future_slot(rng).date().isoformat()
+    return "GET /doctors/{doctor_id}/availability", await ctx.get(f"/doctors/{ctx.doctor_id(rng)}/availability", date=day)
+
+async def book(ctx: Context, rng):
+    body = {
+        "patientId": ctx.patient_id(rng),
+        "doctorId": ctx.doctor_id(rng),
+        "dateTime": future_slot(rng).isoformat(),
+        "status": "Scheduled",
+        "purpose": rng.choice(PURPOSES),
+    }
+    response = await ctx.client.post("/appointments/", json=body, headers=ctx.headers)
+    if response.status_code == 201:
+        ctx.booked.append(response.json()["id"])
+    return "POST /appointments/", response
+
+async def reschedule(ctx: Context, rng):
+    if not ctx.booked:
+        return await book(ctx, rng)
+    appointment_id = rng.choice(ctx.booked)
+    body = {"dateTime": future_slot(rng).isoformat()}
+    return "PUT /appointments/{appointment_id}", await ctx.client.put(
+        f"/appointments/{appointment_id}", json=body, headers=ctx.headers
+    )
+
+async def dashboard(ctx: Context, rng):
+    return "GET /stats/dashboard", await ctx.get("/stats/dashboard")
+
+# (step, weight): roughly a front desk's mix of reads and writes
+WORKLOAD = [
+    (login, 3), (list_patients, 15), (get_patient, 12), (search, 15), (doctor_day, 15),
+    (availability, 12), (book, 10), (reschedule, 8), (dashboard, 10),
+]
+EXPECTED = {"POST /appointments/": {409}, "PUT /appointments/{appointment_id}": {409}}
+
+async def virtual_user(ctx: Context, index: int, measure_from: float, deadline: float, results: dict):
+    rng = random.Random(f"{ctx.args.seed}:{index}")
+    steps, weights = zip(*WORKLOAD)
+    while time.perf_counter() < deadline:
+        step = rng.choices(steps, weights)[0]
+        start = time.perf_counter()
+        route, response = await step(ctx, rng)
+        if start < measure_from:
+            continue
+        result = results[route]
+        result["latencies"].append(time.perf_counter() - start)
+        result["statuses"][response.status_code] += 1
+        if response.status_code >= 400 and response.status_code not in EXPECTED.get(route, ()):
+            result["errors"] += 1
+
+async def id_range(table: str) -> tuple[int, int]:
+    from prisma import Prisma
+    db = Prisma()
+    await db.connect()
+    try:
+        rows = await db.query_raw(f'SELECT MIN("id") AS lo, MAX("id") AS hi FROM "{table}"')
+    finally:
+        await db.disconnect()
+    if rows[0]["lo"] is None:
+        raise SystemExit(f"No rows in {table}; run with --seed-patients or seed the database first")
+    return rows[0]["lo"], rows[0]["hi"]
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    """Per-route percentage changes against an earlier report; positive latency or negative rps changes are worse."""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    routes, regressions = {}, []
+    for route, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if before is None:
+            continue
+        delta = {
+            "p50_pct": change(now["p50_ms"], before["p50_ms"]),
+            "p95_pct": change(now["p95_ms"], before["p95_ms"]),
+            "p99_pct": change(now["p99_ms"], before["p99_ms"]),
+            "rps_pct": change(now["rps"], before["rps"]),
+        }
+        routes[route] = delta
+        if (delta["p95_pct"] or 0) > threshold or (delta["rps_pct"] or 0) < -threshold:
+            regressions.append(route)
+    return {"baseline_commit": baseline.get("commit"), "threshold_pct": threshold, "routes": routes, "regressions": regressions}
+
+async def run(args) -> dict:
+    import httpx
+    patients, doctors = await id_range("Patient"), await id_range("Doctor")
+    env = {"NOTIFICATION_PROVIDER": "fake", "LOG_LEVEL": "WARNING"}
+    results = defaultdict(lambda: {"latencies": [], "statuses": defaultdict(int), "errors": 0})
+    with uvicorn_server(args.port, env=env, workers=args.workers, stdout=subprocess.DEVNULL) as server:
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=30, limits=limits) as client:
+            response = await client.post("/auth/login", data={"username": args.email, "password": args.password})
+            if response.status_code != 200:
+                raise SystemExit(f"Login as {args.email} failed ({response.status_code}): {response.text}")
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+            ctx = Context(client, headers, args, patients, doctors)
+            start = time.perf_counter()
+            measure_from, deadline = start + args.warmup, start + args.warmup + args.duration
+            cpu_start = cpu_seconds(server.pid)
+            await asyncio.gather(*(virtual_user(ctx, i, measure_from, deadline, results) for i in range(args.users)))
+            elapsed = time.perf_counter() - measure_from
+            server_stats = {}
+            if args.workers == 1:  # With more workers the master process does none of the work
+                server_stats = {
+                    "server_cpu_pct": round((cpu_seconds(server.pid) - cpu_start) / (time.perf_counter() - start) * 100, 1),
+                    "server_peak_rss_mb": peak_rss_mb(server.pid),
+                }
+            for appointment_id in ctx.booked:
+                await client.delete(f"/appointments/{appointment_id}", headers=headers)
+    routes = {
+        route: {**summarize(result["latencies"], elapsed, result["errors"]), "statuses": dict(sorted(result["statuses"].items()))}
+        for route, result in sorted(results.items())
+    }
+    latencies = [value for result in results.values() for value in result["latencies"]]
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            "users": args.users, "duration_s": args.duration, "warmup_s": args.warmup, "workers": args.workers,
+            "seed": args.seed, "patients": patients, "doctors": doctors,
+        },
+        "total": summarize(latencies, elapsed, sum(result["errors"] for result in results.values())),
+        **server_stats,
+        "routes": routes,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10.0, help="Seconds run before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=42, help="Seeds the virtual users and, with --seed-patients, the data")
+    parser.add_argument("--seed-patients", type=int, help="Run prisma/seed.py with this many patients first")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change flagged as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+    if args.seed_patients:
+        subprocess.run(
+            [sys.executable, "prisma/seed.py", "--patients", str(args.seed_patients), "--seed", str(args.seed)], check=True
+        )
+    results = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(results, json.load(f), args.threshold)
+    report(results, args.output)
+    if args.fail_on_regression and results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
@@ -0,0 +1,168 @@
+"""How many /events subscribers one worker can hold, and how fast it can fan events out to them.
+
+    python -m benchmarks.bench_events --clients 100,1000,5000 --rate 200
+    python -m benchmarks.bench_events --mode http --email admin@example.com --clients 100,1000 --rate 50
+
+broker  runs the EventBroker in-process with memory delivery. This is the
+        fan-out cost alone: matching, queueing and one encoded frame shared
+        by every subscriber.
+http    starts one uvicorn worker with EVENTS_BACKEND=postgres and opens
+        --clients real SSE streams for a doctor created for the run. Events
+        come from booking that doctor's appointments through
+        POST /appointments/, so they take the route's publish and the
+        LISTEN path end to end. The doctor, patient and appointments are
+        deleted afterwards. It needs DATABASE_URL and an existing user.
+
+Each run publishes --rate events per second for --duration seconds. It
+reports events delivered per second, how many clients received every event,
+and publish-to-receive latency (from sending the request, in http mode).
+http runs also report server RSS and CPU.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from app.scheduling import APPOINTMENT_MINUTES
+from .common import bearer_headers, cpu_seconds, peak_rss_mb, percentile, report, uvicorn_server
+
+def sample_event(number: int) -> dict:
+    return {
+        "entity": "appointment", "action": "updated", "id": number, "patientId": 1 + number % 500,
+        "doctorId": 1 + number % 20, "dateTime": datetime.now(timezone.utc).isoformat(),
+        "status": "Confirmed", "purpose": None, "sentAt": time.time(),
+    }
+
+async def publish_at_rate(send, rate: int, duration: float) -> int:
+    """Call `send(events)` every 10ms with enough events to hold `rate` per second; returns the total sent."""
+    sent, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < duration:
+        due = int(elapsed * rate) - sent
+        if due > 0:
+            await send([sample_event(sent + i) for i in range(due)])
+            sent += due
+        await asyncio.sleep(0.01)
+    return sent
+
+def summarize_delivery(received: list[int], latencies: list[float], sent: int, elapsed: float) -> dict:
+    return {
+        "events_sent": sent,
+        "deliveries_per_s": round(sum(received) / elapsed, 1),
+        "clients_complete": sum(1 for count in received if count >= sent),
+        "min_received": min(received) if received else 0,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def run_broker(clients: int, args) -> dict:
+    from app.events import EventBroker
+    broker = EventBroker(backend="memory", max_clients=clients)
+    subscriptions = [broker.subscribe({"appointment"}, set(), None) for _ in range(clients)]
+    received = [0] * clients
+    latencies: list[float] = []
+
+    async def consume(index: int, subscription):
+        while (frame := await subscription.queue.get()) is not None:
+            received[index] += 1
+            if index % 50 == 0:  # Decoding every frame would measure the client, not the broker
+                data = frame.split(b"data: ", 1)[1]
+                latencies.append(time.time() - json.loads(data)["sentAt"])
+
+    consumers = [asyncio.create_task(consume(i, s)) for i, s in enumerate(subscriptions)]
+    start = time.perf_counter()
+
+    async def send(events):
+        broker.dispatch(events)
+
+    sent = await publish_at_rate(send, args.rate, args.duration)
+    await asyncio.sleep(0.5)  # Let the consumers drain
+    elapsed = time.perf_counter() - start
+    await broker.stop()
+    await asyncio.gather(*consumers)
+    return {"clients": clients, **summarize_delivery(received, latencies, sent, elapsed)}
+
+async def run_http(clients: int, args) -> dict:
+    import httpx
+    headers = bearer_headers(args.email)
+    received = [0] * clients
+    latencies: list[float] = []
+    connected = 0
+    sent_at: dict[datetime, float] = {}  # Booked slot -> when its request was sent
+    first_slot = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=3650)
+
+    async def listen(index: int, client: httpx.AsyncClient, doctor_id: int, ready: asyncio.Event, stop: asyncio.Event):
+        nonlocal connected
+        params = {"types": "appointments", "doctor_id": doctor_id}
+        async with client.stream("GET", "/events", params=params, headers=headers) as response:
+            connected += 1
+            if connected == clients:
+                ready.set()
+            async for line in response.aiter_lines():
+                if line.startswith("data: {\"entity\""):
+                    received[index] += 1
+                    if index % 50 == 0:
+                        slot = datetime.fromisoformat(json.loads(line[6:])["dateTime"])
+                        latencies.append(time.time() - sent_at[slot])
+                if stop.is_set():
+                    return
+
+    env = {"NOTIFICATION_PROVIDER": "fake", "EVENTS_BACKEND": "postgres", "EVENTS_MAX_CLIENTS": str(clients)}
+    with uvicorn_server(args.port, env=env) as server:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None, limits=limits) as client:
+            doctor = (await client.post("/doctors/", json={"name": "Bench Events", "specialty": "Benchmark"}, headers=headers)).json()
+            patient = (await client.post("/patients/", json={
+                "name": "Bench Events", "email": f"bench-events-{time.time_ns()}@example.com", "phone": None, "dob": "1990-01-01",
+            }, headers=headers)).json()
+            ready, stop = asyncio.Event(), asyncio.Event()
+            listeners = [asyncio.create_task(listen(i, client, doctor["id"], ready, stop)) for i in range(clients)]
+            await asyncio.wait_for(ready.wait(), 120)
+            cpu_start = cpu_seconds(server.pid)
+            start = time.perf_counter()
+
+            async def book(slot: datetime):
+                sent_at[slot] = time.time()
+                body = {"patientId": patient["id"], "doctorId": doctor["id"], "dateTime": slot.isoformat()}
+                response = await client.post("/appointments/", json=body, headers=headers)
+                response.raise_for_status()
+
+            async def send(events):
+                slots = [first_slot + timedelta(minutes=APPOINTMENT_MINUTES * (len(sent_at) + i)) for i in range(len(events))]
+                await asyncio.gather(*(book(slot) for slot in slots))
+
+            sent = await publish_at_rate(send, args.rate, args.duration)
+            await asyncio.sleep(1.0)
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(server.pid) - cpu_start
+            stop.set()
+            for listener in listeners:
+                listener.cancel()
+            await asyncio.gather(*listeners, return_exceptions=True)
+            await client.delete(f"/doctors/{doctor['id']}", headers=headers)
+            await client.delete(f"/patients/{patient['id']}", headers=headers)
+        rss = peak_rss_mb(server.pid)
+    return {
+        "clients": clients,
+        **summarize_delivery(received, latencies, sent, elapsed),
+        "server_cpu_pct": round(cpu / elapsed * 100, 1),
+        "server_peak_rss_mb": rss,
+    }
+
+async def main(args):
+    run = run_broker if args.mode == "broker" else run_http
+    results = [await run(int(count), args) for count in args.clients.split(",")]
+    report({"mode": args.mode, "rate": args.rate, "duration_s": args.duration, "runs": results}, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("broker", "http"), default="broker")
+    parser.add_argument("--clients", default="100,1000,5000", help="Comma-separated subscriber counts to try")
+    parser.add_argument("--rate", type=int, default=200, help="Events published per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--email", help="Existing user the streams are opened as (http mode)")
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+    if args.mode == "http" and not args.email:
+        parser.error("--email is required with --mode http")
+    asyncio.run(main(args))
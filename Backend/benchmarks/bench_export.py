@@ -0,0 +1,54 @@
+"""Rows/sec and server peak RSS for a full streaming export.
+
+Seed first (200k patients gives about a million appointments), then export:
+    python -m benchmarks.bench_indexes --seed 200000
+    python -m benchmarks.bench_export --email admin@example.com --entity appointments --format ndjson csv
+
+The app runs under uvicorn in a subprocess so its memory is measured on its own.
+"""
+import argparse
+import time
+import httpx
+from .common import bearer_headers, peak_rss_mb, report, uvicorn_server
+
+def export(base_url: str, headers: dict, entity: str, fmt: str) -> dict:
+    rows = 0
+    size = 0
+    start = time.perf_counter()
+    with httpx.stream("GET", f"{base_url}/export/{entity}", params={"format": fmt}, headers=headers, timeout=None) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            rows += 1
+            size += len(line) + 1
+    elapsed = time.perf_counter() - start
+    if fmt == "csv":
+        rows -= 1  # Header
+    return {
+        "format": fmt,
+        "rows": rows,
+        "megabytes": round(size / 2**20, 1),
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed) if elapsed else 0,
+    }
+
+def main(args):
+    headers = bearer_headers(args.email)
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {"entity": args.entity, "chunk_size": args.chunk_size, "runs": []}
+    with uvicorn_server(args.port, env={"EXPORT_CHUNK_SIZE": str(args.chunk_size)}) as server:
+        results["server_rss_before_mb"] = peak_rss_mb(server.pid)
+        for fmt in args.format:
+            run = export(base_url, headers, args.entity, fmt)
+            run["server_peak_rss_mb"] = peak_rss_mb(server.pid)
+            results["runs"].append(run)
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True, help="Existing user the export is authorized as")
+    parser.add_argument("--entity", default="appointments")
+    parser.add_argument("--format", nargs="+", default=["ndjson", "csv"])
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,152 @@
+"""Query plans and timings for the appointment, medical-history and search access paths.
+
+Run once before and once after applying the index migration, then compare the two files:
+    python -m benchmarks.bench_indexes --seed 200000 --label before --output before.json
+    prisma migrate deploy
+    python -m benchmarks.bench_indexes --label after --output after.json
+
+--seed adds that many synthetic patients (plus doctors, appointments and
+histories in proportion) before measuring; omit it to reuse existing data.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from prisma import Prisma
+from .common import report
+
+CHUNK = 5000
+SPECIALTIES = ["Cardiology", "Neurology", "Pediatrics", "Dermatology", "Orthopedics", "Oncology", "Radiology"]
+FIRST_NAMES = ["John", "Jane", "Ravi", "Priya", "Maria", "Ahmed", "Wei", "Olga", "Kwame", "Sofia"]
+LAST_NAMES = ["Smith", "Sharma", "Garcia", "Chen", "Okafor", "Ivanova", "Khan", "Silva", "Brown", "Patel"]
+
+# Explicit columns: `SELECT *` would include the searchVector tsvector, which query_raw cannot deserialize
+PATIENT_COLUMNS = '"id", "name", "email", "phone", "dob", "createdAt", "updatedAt"'
+DOCTOR_COLUMNS = '"id", "name", "specialty", "createdAt", "updatedAt"'
+HISTORY_COLUMNS = '"id", "patientId", "diagnosis", "treatment", "date", "updatedAt"'
+
+# (name, SQL, params) mirroring the Prisma queries issued by the routes
+QUERIES = [
+    ("appointments_by_patient",
+     'SELECT * FROM "Appointment" WHERE "patientId" = $1 ORDER BY "dateTime" ASC LIMIT 10', ["patient_id"]),
+    ("appointments_by_doctor_day",
+     'SELECT * FROM "Appointment" WHERE "doctorId" = $1 AND "dateTime" >= $2::timestamp AND "dateTime" <= $3::timestamp '
+     'ORDER BY "dateTime" ASC LIMIT 10', ["doctor_id", "day_start", "day_end"]),
+    ("appointments_by_day",
+     'SELECT * FROM "Appointment" WHERE "dateTime" >= $1::timestamp AND "dateTime" <= $2::timestamp '
+     'ORDER BY "dateTime" ASC LIMIT 10', ["day_start", "day_end"]),
+    ("duplicate_booking_check",
+     'SELECT * FROM "Appointment" WHERE "patientId" = $1 AND "doctorId" = $2 AND "dateTime" = $3::timestamp LIMIT 1',
+     ["patient_id", "doctor_id", "slot"]),
+    ("histories_by_patient",
+     f'SELECT {HISTORY_COLUMNS} FROM "MedicalHistory" WHERE "patientId" = $1 ORDER BY "date" DESC LIMIT 10', ["patient_id"]),
+    ("patients_name_contains",
+     f'SELECT {PATIENT_COLUMNS} FROM "Patient" WHERE "name" LIKE $1 ORDER BY "id" ASC LIMIT 10', ["name_pattern"]),
+    ("patients_email_contains",
+     f'SELECT {PATIENT_COLUMNS} FROM "Patient" WHERE "email" LIKE $1 ORDER BY "id" ASC LIMIT 10', ["email_pattern"]),
+    ("doctors_specialty_contains",
+     f'SELECT {DOCTOR_COLUMNS} FROM "Doctor" WHERE "specialty" LIKE $1 ORDER BY "id" ASC LIMIT 10', ["specialty_pattern"]),
+]
+
+async def id_range(db: Prisma, table: str) -> tuple[int, int]:
+    rows = await db.query_raw(f'SELECT MIN("id") AS lo, MAX("id") AS hi FROM "{table}"')
+    return rows[0]["lo"], rows[0]["hi"]
+
+async def seed(db: Prisma, patients: int, rng: random.Random):
+    start = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+    run = rng.randrange(1_000_000)
+    for offset in range(0, patients, CHUNK):
+        await db.patient.create_many(data=[
+            {
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "email": f"bench{run}.{offset + i}@example.com",
+                "phone": f"+1555{rng.randrange(10**7):07d}",
+                "dob": f"{rng.randint(1940, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            }
+            for i in range(min(CHUNK, patients - offset))
+        ])
+    await db.doctor.create_many(data=[
+        {"name": f"Dr. {rng.choice(LAST_NAMES)}", "specialty": rng.choice(SPECIALTIES)}
+        for _ in range(max(1, patients // 100))
+    ])
+    patient_lo, patient_hi = await id_range(db, "Patient")
+    doctor_lo, doctor_hi = await id_range(db, "Doctor")
+    booked = set()  # One booking per doctor and slot, as the booking constraints require
+    for kind, count in (("appointment", patients * 5), ("history", patients * 2)):
+        for offset in range(0, count, CHUNK):
+            rows = []
+            for _ in range(min(CHUNK, count - offset)):
+                when = start + timedelta(days=rng.randrange(730), minutes=30 * rng.randrange(20))
+                patient_id = rng.randint(patient_lo, patient_hi)
+                if kind == "appointment":
+                    doctor_id = rng.randint(doctor_lo, doctor_hi)
+                    if (doctor_id, when) in booked:
+                        continue
+                    booked.add((doctor_id, when))
+                    rows.append({"patientId": patient_id, "doctorId": doctor_id,
+                                 "dateTime": when, "status": "Scheduled"})
+                else:
+                    rows.append({"patientId": patient_id, "diagnosis": "Checkup", "date": when})
+            if kind == "appointment":
+                await db.appointment.create_many(data=rows, skip_duplicates=True)
+            else:
+                await db.medicalhistory.create_many(data=rows)
+
+async def measure(db: Prisma, params: dict, repeat: int) -> dict:
+    results = {}
+    for name, sql, keys in QUERIES:
+        args = [params[key] for key in keys]
+        plan = (await db.query_raw(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", *args))[0]["QUERY PLAN"][0]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await db.query_raw(sql, *args)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {
+            "plan_root": plan["Plan"]["Node Type"],
+            "execution_ms": plan["Execution Time"],
+            "median_roundtrip_ms": round(timings[len(timings) // 2], 3),
+            "plan": plan["Plan"],
+        }
+    return results
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    db = Prisma()
+    await db.connect()
+    try:
+        if args.seed:
+            await seed(db, args.seed, rng)
+        await db.execute_raw('ANALYZE "Patient", "Doctor", "Appointment", "MedicalHistory"')
+        sample = await db.query_raw('SELECT "patientId", "doctorId", "dateTime" FROM "Appointment" ORDER BY random() LIMIT 1')
+        if not sample:
+            raise SystemExit("No appointments found; run with --seed first")
+        slot = datetime.fromisoformat(str(sample[0]["dateTime"]).replace("Z", "+00:00"))
+        day_start = slot.replace(hour=0, minute=0, second=0, microsecond=0)
+        params = {
+            "patient_id": sample[0]["patientId"],
+            "doctor_id": sample[0]["doctorId"],
+            "slot": slot.strftime("%Y-%m-%d %H:%M:%S"),
+            "day_start": day_start.strftime("%Y-%m-%d %H:%M:%S"),
+            "day_end": (day_start + timedelta(hours=23, minutes=59)).strftime("%Y-%m-%d %H:%M:%S"),
+            "name_pattern": "%Shar%",
+            "email_pattern": "%123%",
+            "specialty_pattern": "%ology%",
+        }
+        counts = {table: (await db.query_raw(f'SELECT COUNT(*)::int AS n FROM "{table}"'))[0]["n"]
+                  for table in ("Patient", "Doctor", "Appointment", "MedicalHistory")}
+        results = {"label": args.label, "rows": counts, "queries": await measure(db, params, args.repeat)}
+    finally:
+        await db.disconnect()
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic patients to insert before measuring")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
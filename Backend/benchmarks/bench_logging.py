@@ -0,0 +1,59 @@
+"""Request throughput and server CPU under different logging setups.
+
+    python -m benchmarks.bench_logging --email admin@example.com --requests 2000
+
+The server is restarted for each mode with these settings:
+  off            LOG_LEVEL=WARNING (the default level drops the per-request records)
+  info           LOG_LEVEL=INFO, JSON via the background writer
+  debug_async    LOG_LEVEL=DEBUG, JSON via the background writer
+  debug_sync     LOG_LEVEL=DEBUG, JSON written on the request path (LOG_QUEUE_SIZE=0)
+  debug_sampled  LOG_LEVEL=DEBUG, 1% of app DEBUG/INFO records kept
+Server output goes to --log-file (default /dev/null), so terminal speed does not
+skew the numbers. Server CPU is read from /proc, so run it on the same machine.
+"""
+import argparse
+import asyncio
+import httpx
+from .common import bearer_headers, cpu_seconds, report, run_load, uvicorn_server
+
+MODES = {
+    "off": {"LOG_LEVEL": "WARNING"},
+    "info": {"LOG_LEVEL": "INFO"},
+    "debug_async": {"LOG_LEVEL": "DEBUG"},
+    "debug_sync": {"LOG_LEVEL": "DEBUG", "LOG_QUEUE_SIZE": "0"},
+    "debug_sampled": {"LOG_LEVEL": "DEBUG", "LOG_SAMPLE_RATES": "app=0.01"},
+}
+
+ENDPOINTS = ["/appointments/?limit=20", "/appointments/{appointment_id}"]
+
+async def measure(args, env: dict, headers: dict, log) -> dict:
+    results = {}
+    with uvicorn_server(args.port, env={"NOTIFICATION_PROVIDER": "fake", **env}, stdout=log) as server:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", headers=headers, timeout=60) as client:
+            listed = (await client.get("/appointments/?limit=1")).json()
+            if not listed:
+                raise SystemExit("No appointments found; seed the database first")
+            for endpoint in ENDPOINTS:
+                url = endpoint.format(appointment_id=listed[0]["id"])
+                await run_load(client, "GET", url, requests=50, concurrency=args.concurrency)  # Warm-up
+                cpu_start = cpu_seconds(server.pid)
+                stats = await run_load(client, "GET", url, requests=args.requests, concurrency=args.concurrency)
+                stats["server_cpu_ms_per_request"] = round((cpu_seconds(server.pid) - cpu_start) / args.requests * 1000, 3)
+                results[endpoint] = stats
+    return results
+
+async def main(args):
+    headers = bearer_headers(args.email)
+    with open(args.log_file, "w") as log:
+        results = {mode: await measure(args, env, headers, log) for mode, env in MODES.items()}
+    report({"requests": args.requests, "concurrency": args.concurrency, "modes": results}, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True, help="Existing user the requests are made as")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--log-file", default="/dev/null", help="Where the server's log output goes")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""p99 latency of GET /patients/ while /auth/login is hammered with valid credentials.
+
+Needs DATABASE_URL pointing at a seeded database and an existing user:
+    python -m benchmarks.bench_login_load --email admin@example.com --password admin123
+
+Each scenario is measured with bcrypt in the password executor and, for
+comparison, run inline on the event loop as the handlers used to do.
+"""
+import argparse
+import asyncio
+import httpx
+from app.main import app
+from app.database import connect_db, disconnect_db
+from app.routes.auth import get_current_active_user
+from app import passwords
+from .common import report, run_load, stub_user
+
+async def inline_run(fn, *args):
+    # The old behaviour: bcrypt runs on the event loop thread
+    return fn(*args)
+
+async def hammer_login(client, args, stop: asyncio.Event) -> dict:
+    counts = {"ok": 0, "shed_503": 0, "other": 0}
+
+    async def worker():
+        while not stop.is_set():
+            response = await client.post("/auth/login", data={"username": args.email, "password": args.password})
+            key = "ok" if response.status_code == 200 else "shed_503" if response.status_code == 503 else "other"
+            counts[key] += 1
+
+    await asyncio.gather(*(worker() for _ in range(args.login_concurrency)))
+    return counts
+
+async def measure(client, args) -> dict:
+    idle = await run_load(client, "GET", "/patients/", requests=args.requests, concurrency=args.concurrency)
+    stop = asyncio.Event()
+    logins = asyncio.create_task(hammer_login(client, args, stop))
+    await asyncio.sleep(0.5)  # Let the login burst build up
+    loaded = await run_load(client, "GET", "/patients/", requests=args.requests, concurrency=args.concurrency)
+    stop.set()
+    return {"patients_idle": idle, "patients_during_logins": loaded, "logins": await logins}
+
+async def main(args):
+    # Only the login route authenticates for real; /patients/ measures the listing itself
+    app.dependency_overrides[get_current_active_user] = stub_user
+    await connect_db()
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+            results["executor"] = await measure(client, args)
+            executor_run = passwords._run
+            passwords._run = inline_run
+            try:
+                results["inline"] = await measure(client, args)
+            finally:
+                passwords._run = executor_run
+    finally:
+        passwords.shutdown()
+        await disconnect_db()
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
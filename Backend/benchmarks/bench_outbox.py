@@ -0,0 +1,72 @@
+"""Throughput of the notification outbox pipeline with fake providers; needs no database or provider accounts.
+
+    python -m benchmarks.bench_outbox --messages 2000 --latency 0.05 --concurrency 1 8 32 --email-batch 1 500
+
+Every appointment gets `--updates` notifications in a row to exercise coalescing.
+"""
+import argparse
+import asyncio
+import time
+from app.notifications import FakeProvider, MemoryOutboxStore, OutboxWorker, TokenBucket
+from .common import report
+
+async def drain(args, concurrency: int, email_batch: int) -> dict:
+    store = MemoryOutboxStore()
+    for i in range(args.messages // 2):
+        for update in range(args.updates):
+            await store.enqueue([
+                {"channel": "sms", "recipient": f"+1555{i:07d}", "body": f"Update {update}", "appointmentId": i},
+                {"channel": "email", "recipient": f"patient{i}@example.com", "subject": "Appointment",
+                 "body": f"Update {update}", "appointmentId": i},
+            ], delay=0)
+    providers = {
+        "sms": FakeProvider("sms", latency=args.latency, failure_rate=args.failure_rate),
+        "email": FakeProvider("email", latency=args.latency, failure_rate=args.failure_rate, max_batch=email_batch),
+    }
+    rate_limits = {
+        "sms": TokenBucket(args.sms_rate, args.sms_rate),
+        "email": TokenBucket(args.email_rate, args.email_rate),
+    }
+    worker = OutboxWorker(
+        store, providers, rate_limits, concurrency=concurrency, batch_size=args.batch_size,
+        max_attempts=args.max_attempts,
+    )
+    start = time.perf_counter()
+    while await worker.run_once():
+        pass
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for message in store.messages:
+        statuses[message.status] = statuses.get(message.status, 0) + 1
+    sent = statuses.get("sent", 0)
+    return {
+        "concurrency": concurrency,
+        "email_batch": email_batch,
+        "statuses": statuses,
+        "provider_requests": {channel: provider.requests for channel, provider in providers.items()},
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_s": round(sent / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def main(args):
+    results = [
+        await drain(args, concurrency, email_batch)
+        for concurrency in args.concurrency
+        for email_batch in args.email_batch
+    ]
+    report({"runs": results}, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=1, help="Notifications queued per appointment before draining")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated provider round-trip in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--sms-rate", type=float, default=0, help="SMS requests per second, 0 for unlimited")
+    parser.add_argument("--email-rate", type=float, default=0, help="Email requests per second, 0 for unlimited")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--email-batch", type=int, nargs="+", default=[1, 500])
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,176 @@
+"""Cost of the appointment reminder scan with a large number of future appointments.
+
+    python -m benchmarks.bench_reminders --appointments 1000000
+    python -m benchmarks.bench_reminders --mode db --appointments 1000000
+
+memory  runs ReminderScanner over MemoryReminderStore, which finds the due
+        window with bisect over (dateTime, id). It needs no database. It also
+        reports the memory an alternative design would need: a heap holding
+        one entry per future reminder.
+db      inserts --appointments appointments spread over --days, runs the
+        scanner against PostgreSQL, and prints the plan of the window query.
+        Run it against a scratch database: it writes reminder state and outbox
+        rows. The benchmark doctors and patients are deleted afterwards, and
+        their appointments are removed with them. It needs DATABASE_URL.
+
+Both modes start with the cursors at "now" and simulate --ticks scans,
+advancing the clock by --interval seconds each time. They report the time
+per scan and the messages queued per scan. Memory mode also reports the
+memory held by the store, the db mode the server-side timings.
+"""
+import argparse
+import asyncio
+import heapq
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.reminders import MAX_ID, MemoryReminderStore, PrismaReminderStore, ReminderScanner, parse_offsets
+from .common import percentile, report
+
+DOCTORS = 200
+PATIENTS = 5000
+
+def synthetic_appointments(count: int, days: int, now: datetime, rng: random.Random) -> list:
+    patients = [
+        SimpleNamespace(id=i, phone=f"+1555{i:07d}", email=f"patient{i}@example.com") for i in range(PATIENTS)
+    ]
+    doctors = [SimpleNamespace(id=i, name=f"Dr. Bench {i}") for i in range(DOCTORS)]
+    span = days * 86400
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            dateTime=now + timedelta(seconds=rng.randrange(span)),
+            status="Cancelled" if rng.random() < 0.05 else "Scheduled",
+            purpose=None,
+            patient=patients[rng.randrange(PATIENTS)],
+            doctor=doctors[rng.randrange(DOCTORS)],
+        )
+        for i in range(count)
+    ]
+
+async def simulate(scanner: ReminderScanner, now: datetime, args) -> dict:
+    await scanner.run_once(now)  # Initializes the cursors at now + offset
+    timings, queued = [], []
+    for tick in range(1, args.ticks + 1):
+        start = time.perf_counter()
+        count = await scanner.run_once(now + timedelta(seconds=tick * args.interval))
+        timings.append(time.perf_counter() - start)
+        queued.append(count or 0)
+    return {
+        "ticks": args.ticks,
+        "scan_p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "scan_p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "scan_max_ms": round(max(timings) * 1000, 3),
+        "messages_per_scan": round(sum(queued) / len(queued), 1),
+        "messages_total": sum(queued),
+    }
+
+def heap_memory_mb(appointments: list, offsets: list[int]) -> float:
+    """Memory held by a heap of (due time, appointment id, offset), one entry per future reminder."""
+    tracemalloc.start()
+    heap = [
+        (appointment.dateTime.timestamp() - offset, appointment.id, offset)
+        for appointment in appointments
+        for offset in offsets
+    ]
+    heapq.heapify(heap)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return round(size / 2**20, 1)
+
+async def run_memory(args, offsets: list[int]) -> dict:
+    now = datetime.now(timezone.utc)
+    appointments = synthetic_appointments(args.appointments, args.days, now, random.Random(args.seed))
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = MemoryReminderStore(appointments)
+    build = time.perf_counter() - start
+    index_mb = round(tracemalloc.get_traced_memory()[0] / 2**20, 1)
+    tracemalloc.stop()
+    scanner = ReminderScanner(store, offsets, batch_size=args.batch_size)
+    return {
+        "index_build_s": round(build, 3),
+        "index_mb": index_mb,
+        "heap_alternative_mb": heap_memory_mb(appointments, offsets),
+        **await simulate(scanner, now, args),
+    }
+
+async def seed_db(db, args, now: datetime) -> tuple[list[int], list[int]]:
+    from app.scheduling import APPOINTMENT_MINUTES
+    run = random.Random(args.seed).randrange(10**6)
+    await db.doctor.create_many(data=[{"name": f"Dr. Bench {i}", "specialty": "Benchmark"} for i in range(DOCTORS)])
+    await db.patient.create_many(data=[
+        {"name": f"Bench Patient {i}", "email": f"reminders{run}.{i}@example.com", "phone": f"+1555{i:07d}"}
+        for i in range(PATIENTS)
+    ])
+    doctors = [row.id for row in await db.doctor.find_many(where={"specialty": "Benchmark"})]
+    patients = [row.id for row in await db.patient.find_many(where={"email": {"startswith": f"reminders{run}."}})]
+    # Consecutive slots per doctor, spaced so the doctor's bookings never overlap
+    slots_per_doctor = -(-args.appointments // len(doctors))
+    step = max(args.days * 86400 // slots_per_doctor, APPOINTMENT_MINUTES * 60)
+    await db.execute_raw(
+        'INSERT INTO "Appointment" ("patientId", "doctorId", "dateTime", "status") '
+        'SELECT ($1::int[])[1 + i % cardinality($1::int[])], ($2::int[])[1 + i % cardinality($2::int[])], '
+        '$3::timestamp + make_interval(secs => (i / cardinality($2::int[])) * $4::float8), '
+        "CASE WHEN i % 20 = 0 THEN 'Cancelled' ELSE 'Scheduled' END "
+        'FROM generate_series(0, $5 - 1) AS i',
+        patients, doctors, now.replace(tzinfo=None), float(step), args.appointments
+    )
+    await db.execute_raw('ANALYZE "Appointment"')
+    return doctors, patients
+
+async def run_db(args, offsets: list[int]) -> dict:
+    from prisma import Prisma
+    db = Prisma()
+    await db.connect()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    doctors, patients = [], []
+    try:
+        start = time.perf_counter()
+        doctors, patients = await seed_db(db, args, now)
+        seeded = time.perf_counter() - start
+        await db.reminderstate.delete_many(where={"offsetSeconds": {"in": offsets}})
+        scanner = ReminderScanner(PrismaReminderStore(db), offsets, batch_size=args.batch_size)
+        results = await simulate(scanner, now, args)
+        plan = await db.query_raw(
+            'EXPLAIN (ANALYZE, BUFFERS) SELECT "id" FROM "Appointment" '
+            'WHERE "dateTime" >= $1::timestamp AND "dateTime" <= $2::timestamp '
+            'AND ("dateTime" > $1::timestamp OR "id" > $3) AND "status" <> \'Cancelled\' '
+            'ORDER BY "dateTime", "id" LIMIT $4',
+            now.replace(tzinfo=None) + timedelta(seconds=offsets[0]),
+            now.replace(tzinfo=None) + timedelta(seconds=offsets[0] + args.interval),
+            MAX_ID, args.batch_size
+        )
+        return {"seed_s": round(seeded, 1), **results, "window_query_plan": [row["QUERY PLAN"] for row in plan]}
+    finally:
+        await db.notificationoutbox.delete_many(where={"body": {"contains": "Dr. Bench"}})
+        await db.reminderstate.delete_many(where={"offsetSeconds": {"in": offsets}})
+        if patients:
+            await db.patient.delete_many(where={"id": {"in": patients}})
+        if doctors:
+            await db.doctor.delete_many(where={"id": {"in": doctors}})
+        await db.disconnect()
+
+async def main(args):
+    offsets = parse_offsets(args.offsets)
+    run = run_memory if args.mode == "memory" else run_db
+    results = await run(args, offsets)
+    report({
+        "mode": args.mode, "appointments": args.appointments, "days": args.days, "offsets_s": offsets,
+        "interval_s": args.interval, "batch_size": args.batch_size, **results,
+    }, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("memory", "db"), default="memory")
+    parser.add_argument("--appointments", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365, help="Appointments are spread over this many days ahead")
+    parser.add_argument("--offsets", default="24h,1h")
+    parser.add_argument("--interval", type=float, default=60.0, help="Simulated seconds between scans")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
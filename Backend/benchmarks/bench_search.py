@@ -0,0 +1,107 @@
+"""Latency of GET /search queries against a large synthetic dataset.
+
+    python -m benchmarks.bench_search --seed 1000000 --output search.json
+
+--seed adds that many synthetic patients (plus one doctor per 1000 patients and
+one diagnosis per patient) before measuring; omit it to reuse existing data.
+Each query kind runs --repeat times through app.search.search and reports p50/p99.
+An ILIKE scan, the case-insensitive `contains` a search box would otherwise
+need, is measured alongside as the baseline.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from prisma import Prisma
+from app.search import SOURCES, search
+from .bench_indexes import CHUNK, FIRST_NAMES, LAST_NAMES, SPECIALTIES
+from .common import report, summarize
+
+DIAGNOSES = ["Type 2 diabetes", "Hypertension", "Migraine", "Asthma", "Atopic dermatitis",
+             "Fractured radius", "Seasonal influenza", "Iron deficiency anemia", "Osteoarthritis", "Bronchitis"]
+
+# (name, query text, types) covering exact, type-ahead, misspelt and clinical searches
+QUERIES = [
+    ("exact_name", "Priya Sharma", ["patients"]),
+    ("prefix_name", "pri sha", ["patients"]),
+    ("prefix_single_char", "o", ["patients"]),
+    ("typo_name", "Priya Sharmaa", ["patients"]),
+    ("doctor_specialty", "cardio", ["doctors"]),
+    ("diagnosis_stemmed", "diabetic", ["diagnoses"]),
+    ("everything", "ahmed", list(SOURCES)),
+]
+
+# Explicit columns: `SELECT *` would include the searchVector tsvector, which query_raw cannot deserialize
+BASELINE = (
+    'SELECT "id", "name", "email", "phone", "dob", "createdAt", "updatedAt" FROM "Patient" '
+    'WHERE "name" ILIKE $1 ORDER BY "id" ASC LIMIT 20'
+)
+
+async def seed(db: Prisma, patients: int, rng: random.Random):
+    run = rng.randrange(1_000_000)
+    for offset in range(0, patients, CHUNK):
+        await db.patient.create_many(data=[
+            {
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "email": f"search{run}.{offset + i}@example.com",
+                "phone": None,
+                "dob": f"{rng.randint(1940, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            }
+            for i in range(min(CHUNK, patients - offset))
+        ])
+    await db.doctor.create_many(data=[
+        {"name": f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", "specialty": rng.choice(SPECIALTIES)}
+        for _ in range(max(1, patients // 1000))
+    ])
+    bounds = (await db.query_raw('SELECT MIN("id") AS lo, MAX("id") AS hi FROM "Patient"'))[0]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for offset in range(0, patients, CHUNK):
+        await db.medicalhistory.create_many(data=[
+            {
+                "patientId": rng.randint(bounds["lo"], bounds["hi"]),
+                "diagnosis": rng.choice(DIAGNOSES),
+                "treatment": "Follow-up in four weeks",
+                "date": start + timedelta(days=rng.randrange(730)),
+            }
+            for _ in range(min(CHUNK, patients - offset))
+        ])
+
+async def timed(repeat: int, call) -> tuple[dict, int]:
+    latencies = []
+    found = 0
+    began = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(await call())
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - began), found
+
+async def main(args):
+    rng = random.Random(args.random_seed)
+    db = Prisma()
+    await db.connect()
+    try:
+        if args.seed:
+            await seed(db, args.seed, rng)
+        await db.execute_raw('ANALYZE "Patient", "Doctor", "MedicalHistory"')
+        counts = {table: (await db.query_raw(f'SELECT COUNT(*)::int AS n FROM "{table}"'))[0]["n"]
+                  for table in ("Patient", "Doctor", "MedicalHistory")}
+        queries = {}
+        for name, text, types in QUERIES:
+            stats, found = await timed(args.repeat, lambda: search(db, text, types, args.limit))
+            queries[name] = {"query": text, "types": types, "results": found, **stats}
+        baseline, found = await timed(args.repeat, lambda: db.query_raw(BASELINE, "%Sharma%"))
+        queries["baseline_name_contains"] = {"query": "%Sharma%", "results": found, **baseline}
+    finally:
+        await db.disconnect()
+    report({"rows": counts, "limit": args.limit, "queries": queries}, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic patients to insert before measuring")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""CPU time to turn a list of appointments into a JSON response body; needs no database.
+
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 20
+
+Compares the old hand-built dicts (FastAPI's jsonable_encoder plus json.dumps,
+or orjson) with the compiled schema adapter the appointment routes now use.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import orjson
+from fastapi.encoders import jsonable_encoder
+from app.schemas import APPOINTMENT_LIST, render
+from .common import report
+
+def synthetic_appointments(rows: int) -> list:
+    start = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    appointments = []
+    for i in range(rows):
+        patient = SimpleNamespace(
+            id=i, name=f"Patient {i}", email=f"patient{i}@example.com", phone=f"+1555{i:07d}",
+            dob="1990-01-01", medicalHistory=None,
+        )
+        doctor = SimpleNamespace(id=i % 50, name=f"Dr. {i % 50}", specialty="Cardiology")
+        appointments.append(SimpleNamespace(
+            id=i, patientId=i, doctorId=doctor.id, patient=patient, doctor=doctor,
+            dateTime=start + timedelta(minutes=30 * i), status="Scheduled", purpose="Checkup",
+        ))
+    return appointments
+
+def hand_built(appointments: list) -> list[dict]:
+    """The per-row dict the routes used to build before the schema layer."""
+    return [
+        {
+            "id": appt.id,
+            "patientId": appt.patientId,
+            "doctorId": appt.doctorId,
+            "patient": {
+                "id": appt.patient.id,
+                "name": appt.patient.name,
+                "email": appt.patient.email,
+                "phone": appt.patient.phone,
+                "dob": appt.patient.dob if isinstance(appt.patient.dob, str) else (appt.patient.dob.isoformat() if appt.patient.dob else None),
+                "medicalHistory": appt.patient.medicalHistory,
+                "appointments": None
+            },
+            "doctor": {
+                "id": appt.doctor.id,
+                "name": appt.doctor.name,
+                "specialty": appt.doctor.specialty,
+                "appointments": None
+            },
+            "dateTime": appt.dateTime.isoformat(),
+            "status": appt.status,
+            "purpose": appt.purpose
+        }
+        for appt in appointments
+    ]
+
+def dicts_json(appointments: list) -> bytes:
+    content = jsonable_encoder(hand_built(appointments))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def dicts_orjson(appointments: list) -> bytes:
+    return orjson.dumps(jsonable_encoder(hand_built(appointments)))
+
+def schema_adapter(appointments: list) -> bytes:
+    return render(APPOINTMENT_LIST, appointments).body
+
+def measure(fn, appointments: list, repeat: int) -> dict:
+    fn(appointments)  # Warm up
+    cpu = []
+    for _ in range(repeat):
+        start = time.process_time()
+        body = fn(appointments)
+        cpu.append(time.process_time() - start)
+    return {"cpu_ms_median": round(statistics.median(cpu) * 1000, 2), "bytes": len(body)}
+
+def main(args):
+    appointments = synthetic_appointments(args.rows)
+    results = {
+        "rows": args.rows,
+        "hand_built_json": measure(dicts_json, appointments, args.repeat),
+        "hand_built_orjson": measure(dicts_orjson, appointments, args.repeat),
+        "schema_adapter": measure(schema_adapter, appointments, args.repeat),
+    }
+    baseline = results["hand_built_json"]["cpu_ms_median"]
+    results["cpu_ms_saved_per_request"] = round(baseline - results["schema_adapter"]["cpu_ms_median"], 2)
+    report(results, args.output)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,108 @@
+"""Shared helpers for the benchmark scripts.
+
+Every script is run from the Backend directory, e.g. `python -m benchmarks.bench_db_pool`.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    """Throughput and latency percentiles (milliseconds) for one run."""
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def run_load(client, method: str, url: str, *, requests: int, concurrency: int, **kwargs) -> dict:
+    """Fire `requests` calls at `url` with at most `concurrency` in flight."""
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+def stub_user(role: str = "admin"):
+    """Stand-in for `get_current_active_user` so a benchmark measures only the route under test."""
+    return SimpleNamespace(id=0, email="bench@example.com", role=role)
+
+def report(results: dict, output: str | None = None):
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+def bearer_headers(email: str, role: str = "admin", user_id: int = 0) -> dict:
+    """Authorization header for a real server; the email must belong to an existing user."""
+    from app.routes.auth import create_access_token
+    token = create_access_token({"sub": email, "role": role, "user_id": user_id})
+    return {"Authorization": f"Bearer {token}"}
+
+@contextlib.contextmanager
+def uvicorn_server(port: int, env: dict | None = None, workers: int = 1, stdout=None):
+    """Run app.main:app in a subprocess so its memory and CPU can be measured separately from the client.
+
+    `stdout` goes to Popen; subprocess.DEVNULL keeps the server's log output off the terminal.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **(env or {})},
+        stdout=stdout,
+    )
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            with contextlib.closing(socket.socket()) as sock:
+                if sock.connect_ex(("127.0.0.1", port)) == 0:
+                    break
+            time.sleep(0.2)
+        else:
+            raise RuntimeError("uvicorn did not start within 30s")
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def peak_rss_mb(pid: int) -> float:
+    """High-water mark of a process's resident memory (Linux only)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU time a process has used so far (Linux only)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
@@ -0,0 +1,53 @@
+-- CreateExtension
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+-- CheckDuplicates
+-- The old find-then-create booking check could race and store the same booking
+-- twice, which would make the unique index below fail. Stop with a report
+-- instead; prisma/remediation/quarantine_duplicate_appointments.sql moves the
+-- extra rows aside (see "Upgrading an existing database" in the README).
+DO $$
+DECLARE
+  extra INTEGER;
+  sample TEXT;
+BEGIN
+  SELECT COUNT(*), string_agg("id"::text, ', ' ORDER BY "id") FILTER (WHERE rn <= 20)
+  INTO extra, sample
+  FROM (
+    SELECT "id", ROW_NUMBER() OVER (ORDER BY "id") AS rn
+    FROM (
+      SELECT "id", ROW_NUMBER() OVER (PARTITION BY "patientId", "doctorId", "dateTime" ORDER BY "id") AS n
+      FROM "Appointment"
+    ) ranked
+    WHERE n > 1
+  ) duplicates;
+  IF extra > 0 THEN
+    RAISE EXCEPTION '% appointment(s) duplicate an older booking of the same patient, doctor and time', extra
+      USING DETAIL = 'Duplicate appointment ids (first 20): ' || sample,
+            HINT = 'Run prisma/remediation/quarantine_duplicate_appointments.sql, then prisma migrate resolve --rolled-back 20250615090000_add_query_indexes and deploy again.';
+  END IF;
+END $$;
+
+-- CreateIndex
+CREATE UNIQUE INDEX "Appointment_patientId_doctorId_dateTime_key" ON "Appointment"("patientId", "doctorId", "dateTime");
+
+-- CreateIndex
+CREATE INDEX "Appointment_doctorId_dateTime_idx" ON "Appointment"("doctorId", "dateTime");
+
+-- CreateIndex
+CREATE INDEX "Appointment_patientId_dateTime_idx" ON "Appointment"("patientId", "dateTime");
+
+-- CreateIndex
+CREATE INDEX "Appointment_dateTime_idx" ON "Appointment"("dateTime");
+
+-- CreateIndex
+CREATE INDEX "MedicalHistory_patientId_date_idx" ON "MedicalHistory"("patientId", "date");
+
+-- CreateIndex
+CREATE INDEX "Patient_name_idx" ON "Patient" USING GIN ("name" gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "Patient_email_idx" ON "Patient" USING GIN ("email" gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "Doctor_specialty_idx" ON "Doctor" USING GIN ("specialty" gin_trgm_ops);
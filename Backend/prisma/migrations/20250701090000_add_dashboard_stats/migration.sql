@@ -0,0 +1,25 @@
+-- AlterTable
+ALTER TABLE "Appointment" ADD COLUMN     "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- AlterTable
+ALTER TABLE "Doctor" ADD COLUMN     "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- AlterTable
+ALTER TABLE "Patient" ADD COLUMN     "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- CreateTable
+CREATE TABLE "DailyCount" (
+    "metric" TEXT NOT NULL,
+    "day" DATE NOT NULL,
+    "count" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "DailyCount_pkey" PRIMARY KEY ("metric","day")
+);
+
+-- Backfill
+INSERT INTO "DailyCount" ("metric", "day", "count")
+SELECT 'patients', "createdAt"::date, COUNT(*) FROM "Patient" GROUP BY 2
+UNION ALL
+SELECT 'doctors', "createdAt"::date, COUNT(*) FROM "Doctor" GROUP BY 2
+UNION ALL
+SELECT 'appointments', "dateTime"::date, COUNT(*) FROM "Appointment" GROUP BY 2;
@@ -0,0 +1,23 @@
+-- AlterTable
+ALTER TABLE "Appointment" ADD COLUMN     "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- AlterTable
+ALTER TABLE "Doctor" ADD COLUMN     "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- AlterTable
+ALTER TABLE "MedicalHistory" ADD COLUMN     "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- AlterTable
+ALTER TABLE "Patient" ADD COLUMN     "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- CreateIndex
+CREATE INDEX "Appointment_updatedAt_idx" ON "Appointment"("updatedAt");
+
+-- CreateIndex
+CREATE INDEX "Doctor_updatedAt_idx" ON "Doctor"("updatedAt");
+
+-- CreateIndex
+CREATE INDEX "MedicalHistory_updatedAt_idx" ON "MedicalHistory"("updatedAt");
+
+-- CreateIndex
+CREATE INDEX "Patient_updatedAt_idx" ON "Patient"("updatedAt");
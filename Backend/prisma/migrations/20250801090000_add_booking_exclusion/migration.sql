@@ -0,0 +1,39 @@
+-- CreateExtension
+CREATE EXTENSION IF NOT EXISTS "btree_gist";
+
+-- CheckOverlaps
+-- The old booking check allowed overlapping appointments, which would make the
+-- constraint below fail with a bare conflict error. Stop with a report instead;
+-- prisma/remediation/find_overlapping_appointments.sql lists every overlap and
+-- cancel_overlapping_appointments.sql resolves them (see "Upgrading an existing
+-- database" in the README).
+DO $$
+DECLARE
+  pairs INTEGER;
+  sample TEXT;
+BEGIN
+  SELECT COUNT(*), string_agg(pair, ', ' ORDER BY n) FILTER (WHERE n <= 20)
+  INTO pairs, sample
+  FROM (
+    SELECT a."id" || '/' || b."id" AS pair, ROW_NUMBER() OVER (ORDER BY a."id", b."id") AS n
+    FROM "Appointment" a
+    JOIN "Appointment" b
+      ON b."doctorId" = a."doctorId"
+     AND b."id" > a."id"
+     AND b."dateTime" > a."dateTime" - interval '30 minutes'
+     AND b."dateTime" < a."dateTime" + interval '30 minutes'
+    WHERE a."status" <> 'Cancelled' AND b."status" <> 'Cancelled'
+  ) overlaps;
+  IF pairs > 0 THEN
+    RAISE EXCEPTION '% pair(s) of active appointments overlap for the same doctor', pairs
+      USING DETAIL = 'Overlapping appointment ids (first 20 pairs): ' || sample,
+            HINT = 'Run prisma/remediation/cancel_overlapping_appointments.sql, then prisma migrate resolve --rolled-back 20250801090000_add_booking_exclusion and deploy again.';
+  END IF;
+END $$;
+
+-- A doctor cannot hold two active appointments whose 30-minute slots overlap.
+-- Prisma cannot express exclusion constraints, so this one lives only here.
+ALTER TABLE "Appointment" ADD CONSTRAINT "Appointment_doctor_slot_excl" EXCLUDE USING gist (
+  "doctorId" WITH =,
+  tsrange("dateTime", "dateTime" + interval '30 minutes') WITH &&
+) WHERE ("status" <> 'Cancelled');
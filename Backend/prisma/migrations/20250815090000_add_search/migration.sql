@@ -0,0 +1,35 @@
+-- Full-text search vectors, kept in sync by PostgreSQL as generated columns.
+-- Names use the 'simple' configuration (no stemming); diagnoses use 'english'.
+
+-- AlterTable
+ALTER TABLE "Patient" ADD COLUMN "searchVector" tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple', coalesce("name", '')), 'A') ||
+  setweight(to_tsvector('simple', coalesce("email", '')), 'B')
+) STORED;
+
+-- AlterTable
+ALTER TABLE "Doctor" ADD COLUMN "searchVector" tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple', coalesce("name", '')), 'A') ||
+  setweight(to_tsvector('simple', coalesce("specialty", '')), 'B')
+) STORED;
+
+-- AlterTable
+ALTER TABLE "MedicalHistory" ADD COLUMN "searchVector" tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('english', coalesce("diagnosis", '')), 'A') ||
+  setweight(to_tsvector('english', coalesce("treatment", '')), 'B')
+) STORED;
+
+-- CreateIndex
+CREATE INDEX "Patient_searchVector_idx" ON "Patient" USING GIN ("searchVector");
+
+-- CreateIndex
+CREATE INDEX "Doctor_searchVector_idx" ON "Doctor" USING GIN ("searchVector");
+
+-- CreateIndex
+CREATE INDEX "MedicalHistory_searchVector_idx" ON "MedicalHistory" USING GIN ("searchVector");
+
+-- CreateIndex
+CREATE INDEX "Doctor_name_idx" ON "Doctor" USING GIN ("name" gin_trgm_ops);
+
+-- CreateIndex
+CREATE INDEX "MedicalHistory_diagnosis_idx" ON "MedicalHistory" USING GIN ("diagnosis" gin_trgm_ops);
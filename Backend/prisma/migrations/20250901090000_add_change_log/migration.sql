@@ -0,0 +1,38 @@
+-- CreateTable
+CREATE TABLE "ChangeLog" (
+    "id" BIGSERIAL NOT NULL,
+    "seq" BIGINT,
+    "entity" TEXT NOT NULL,
+    "entityId" INTEGER NOT NULL,
+    "action" TEXT NOT NULL,
+    "data" JSONB,
+    "changedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "ChangeLog_pkey" PRIMARY KEY ("id")
+);
+
+-- "seq" is drawn from this sequence after commit (app/changes.py assign_seqs)
+CREATE SEQUENCE "ChangeLog_seq_seq" OWNED BY "ChangeLog"."seq";
+
+-- CreateTable
+CREATE TABLE "ChangeLogState" (
+    "id" INTEGER NOT NULL DEFAULT 1,
+    "horizon" BIGINT NOT NULL DEFAULT 0,
+
+    CONSTRAINT "ChangeLogState_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "ChangeLog_seq_key" ON "ChangeLog"("seq");
+
+-- Entries waiting for a "seq"
+CREATE INDEX "ChangeLog_unsequenced_idx" ON "ChangeLog"("id") WHERE "seq" IS NULL;
+
+-- CreateIndex
+CREATE INDEX "ChangeLog_entity_entityId_seq_idx" ON "ChangeLog"("entity", "entityId", "seq");
+
+-- CreateIndex
+CREATE INDEX "ChangeLog_changedAt_idx" ON "ChangeLog"("changedAt");
+
+-- Seed
+INSERT INTO "ChangeLogState" ("id", "horizon") VALUES (1, 0);
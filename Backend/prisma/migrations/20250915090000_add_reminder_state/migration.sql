@@ -0,0 +1,12 @@
+-- CreateTable
+CREATE TABLE "ReminderState" (
+    "offsetSeconds" INTEGER NOT NULL,
+    "through" TIMESTAMP(3) NOT NULL,
+    "throughId" INTEGER NOT NULL,
+
+    CONSTRAINT "ReminderState_pkey" PRIMARY KEY ("offsetSeconds")
+);
+
+-- AlterTable
+-- Reminders must not be coalesced away by a later confirmation for the same appointment
+ALTER TABLE "NotificationOutbox" ADD COLUMN "kind" TEXT NOT NULL DEFAULT 'notice';
@@ -0,0 +1,70 @@
+-- Cancels overlapping bookings so the add_booking_exclusion migration can add
+-- its constraint, which only covers appointments that are not Cancelled.
+--
+--     psql "$DATABASE_URL" -f prisma/remediation/cancel_overlapping_appointments.sql
+--
+-- For each doctor, bookings are kept in the order they were made (by id): a
+-- booking is cancelled when it overlaps one that is kept. Cancelled rows stay
+-- in "Appointment", so no data and no DailyCount entry is lost. Each one is
+-- also recorded in "AppointmentQuarantine" with its previous status and the
+-- booking it clashed with, so the patients can be contacted and rebooked.
+
+BEGIN;
+
+-- Shared by the scripts in this directory
+CREATE TABLE IF NOT EXISTS "AppointmentQuarantine" (
+    "id" INTEGER NOT NULL,
+    "patientId" INTEGER NOT NULL,
+    "doctorId" INTEGER NOT NULL,
+    "dateTime" TIMESTAMP(3) NOT NULL,
+    "status" TEXT NOT NULL,
+    "purpose" TEXT,
+    "reason" TEXT NOT NULL,
+    "keptId" INTEGER NOT NULL,
+    "quarantinedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "AppointmentQuarantine_pkey" PRIMARY KEY ("id")
+);
+
+DO $$
+DECLARE
+  candidate RECORD;
+  kept INTEGER;
+BEGIN
+  -- Only a booking that overlaps an earlier one can need cancelling. Earlier
+  -- candidates are cancelled first, so a later one is checked against the
+  -- bookings that are really kept.
+  FOR candidate IN
+    SELECT DISTINCT b."id", b."patientId", b."doctorId", b."dateTime", b."status", b."purpose"
+    FROM "Appointment" a
+    JOIN "Appointment" b
+      ON b."doctorId" = a."doctorId"
+     AND b."id" > a."id"
+     AND b."dateTime" > a."dateTime" - interval '30 minutes'
+     AND b."dateTime" < a."dateTime" + interval '30 minutes'
+    WHERE a."status" <> 'Cancelled' AND b."status" <> 'Cancelled'
+    ORDER BY b."id"
+  LOOP
+    SELECT k."id" INTO kept
+    FROM "Appointment" k
+    WHERE k."doctorId" = candidate."doctorId"
+      AND k."id" < candidate."id"
+      AND k."status" <> 'Cancelled'
+      AND k."dateTime" > candidate."dateTime" - interval '30 minutes'
+      AND k."dateTime" < candidate."dateTime" + interval '30 minutes'
+    ORDER BY k."id"
+    LIMIT 1;
+    IF kept IS NOT NULL THEN
+      INSERT INTO "AppointmentQuarantine" ("id", "patientId", "doctorId", "dateTime", "status", "purpose", "reason", "keptId")
+      VALUES (candidate."id", candidate."patientId", candidate."doctorId", candidate."dateTime", candidate."status", candidate."purpose", 'overlap', kept);
+      UPDATE "Appointment" SET "status" = 'Cancelled', "updatedAt" = CURRENT_TIMESTAMP WHERE "id" = candidate."id";
+    END IF;
+  END LOOP;
+END $$;
+
+SELECT q."id", q."patientId", q."doctorId", q."dateTime", q."status" AS "previousStatus", q."keptId"
+FROM "AppointmentQuarantine" q
+WHERE q."reason" = 'overlap'
+ORDER BY q."doctorId", q."dateTime";
+
+COMMIT;
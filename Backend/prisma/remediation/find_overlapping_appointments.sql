@@ -0,0 +1,26 @@
+-- Lists the active appointments that overlap another of the same doctor's
+-- bookings, which the add_booking_exclusion migration refuses to constrain.
+--
+--     psql "$DATABASE_URL" -f prisma/remediation/find_overlapping_appointments.sql
+--
+-- Read-only. Each row pairs an appointment with the earlier-booked (lower id)
+-- appointment it overlaps; cancel_overlapping_appointments.sql cancels the
+-- later one of each pair.
+
+SELECT
+    b."doctorId",
+    a."id" AS "keptId",
+    a."dateTime" AS "keptDateTime",
+    a."patientId" AS "keptPatientId",
+    b."id" AS "overlappingId",
+    b."dateTime" AS "overlappingDateTime",
+    b."patientId" AS "overlappingPatientId",
+    b."status" AS "overlappingStatus"
+FROM "Appointment" a
+JOIN "Appointment" b
+  ON b."doctorId" = a."doctorId"
+ AND b."id" > a."id"
+ AND b."dateTime" > a."dateTime" - interval '30 minutes'
+ AND b."dateTime" < a."dateTime" + interval '30 minutes'
+WHERE a."status" <> 'Cancelled' AND b."status" <> 'Cancelled'
+ORDER BY b."doctorId", a."dateTime", a."id", b."id";
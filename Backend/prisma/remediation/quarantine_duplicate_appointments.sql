@@ -0,0 +1,49 @@
+-- Moves duplicate bookings out of "Appointment" so the add_query_indexes
+-- migration can build its unique (patientId, doctorId, dateTime) index.
+--
+--     psql "$DATABASE_URL" -f prisma/remediation/quarantine_duplicate_appointments.sql
+--
+-- The oldest row of each (patientId, doctorId, dateTime) stays. The others are
+-- copied to "AppointmentQuarantine", with the id of the row kept in "keptId",
+-- and then deleted. Nothing is lost: review the quarantined rows and copy back
+-- anything that was not really a duplicate, at a free time.
+--
+-- Run it when the migration stops with "duplicate an older booking". That is
+-- before add_dashboard_stats, so there is no DailyCount to adjust.
+
+BEGIN;
+
+-- Shared by the scripts in this directory
+CREATE TABLE IF NOT EXISTS "AppointmentQuarantine" (
+    "id" INTEGER NOT NULL,
+    "patientId" INTEGER NOT NULL,
+    "doctorId" INTEGER NOT NULL,
+    "dateTime" TIMESTAMP(3) NOT NULL,
+    "status" TEXT NOT NULL,
+    "purpose" TEXT,
+    "reason" TEXT NOT NULL,
+    "keptId" INTEGER NOT NULL,
+    "quarantinedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "AppointmentQuarantine_pkey" PRIMARY KEY ("id")
+);
+
+WITH ranked AS (
+    SELECT "id", MIN("id") OVER (PARTITION BY "patientId", "doctorId", "dateTime") AS "keptId"
+    FROM "Appointment"
+), moved AS (
+    DELETE FROM "Appointment" a
+    USING ranked r
+    WHERE a."id" = r."id" AND r."id" <> r."keptId"
+    RETURNING a."id", a."patientId", a."doctorId", a."dateTime", a."status", a."purpose", r."keptId"
+)
+INSERT INTO "AppointmentQuarantine" ("id", "patientId", "doctorId", "dateTime", "status", "purpose", "reason", "keptId")
+SELECT "id", "patientId", "doctorId", "dateTime", "status", "purpose", 'duplicate', "keptId" FROM moved;
+
+SELECT "keptId", array_agg("id" ORDER BY "id") AS "quarantined"
+FROM "AppointmentQuarantine"
+WHERE "reason" = 'duplicate'
+GROUP BY "keptId"
+ORDER BY "keptId";
+
+COMMIT;
@@ -1,170 +1,347 @@
-# import asyncio
-# import sys
-# from passlib.context import CryptContext
-# from prisma import Prisma
-# from datetime import datetime
-
-# # Initialize password hasher
-# pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# async def seed_database():
-#     # Connect to the database
-#     prisma = Prisma()
-#     await prisma.connect()
-
-#     try:
-#         # --- Seed Users ---
-#         test_users = [
-#             {
-#                 "email": "admin@example.com.com",
-#                 "password": pwd_context.hash("admin123"),
-#                 "role": "admin"
-#             },
-#             {
-#                 "email": "doctor@example.com",
-#                 "password": pwd_context.hash("doctor123"),
-#                 "role": "doctor"
-#             },
-#             {
-#                 "email": "nurse@example.com.com",
-#                 "password": pwd_context.hash("nurse123"),
-#                 "role": "nurse"
-#             }
-#         ]
-
-#         for user_data in test_users:
-#             existing_user = await prisma.user.find_unique(
-#                 where={"email": user_data["email"]}
-#             )
-#             if not existing_user:
-#                 await prisma.user.create(data=user_data)
-#                 print(f"Created user: {user_data['email']} with role: {user_data['role']}")
-#             else:
-#                 print(f"User {user_data['email']} already exists")
-
-#         # --- Seed Patients ---
-#         test_patients = [
-#             {
-#                 "name": "Rajjo",
-#                 "email": "john.doe@example.com",
-#                 "phone": "1234567890",
-#                 "dob": "1990-01-01"
-#             },
-#             {
-#                 "name": "Jane Smith",
-#                 "email": "jane.smith@example.com",
-#                 "phone": "0987654321",
-#                 "dob": "1985-05-15"
-#             }
-#         ]
-
-#         for patient_data in test_patients:
-#             existing_patient = await prisma.patient.find_unique(
-#                 where={"email": patient_data["email"]}
-#             )
-#             if not existing_patient:
-#                 patient = await prisma.patient.create(data=patient_data)
-#                 print(f"Created patient: {patient_data['name']}")
-#             else:
-#                 print(f"Patient {patient_data['email']} already exists")
-
-#         # --- Seed Doctors ---
-#         test_doctors = [
-#             {
-#                 "name": "Dr. Smith",
-#                 "specialty": "Cardiology"
-#             },
-#             {
-#                 "name": "Dr. Brown",
-#                 "specialty": "Neurology"
-#             }
-#         ]
-
-#         for doctor_data in test_doctors:
-#             existing_doctor = await prisma.doctor.find_first(
-#                 where={"name": doctor_data["name"], "specialty": doctor_data["specialty"]}
-#             )
-#             if not existing_doctor:
-#                 doctor = await prisma.doctor.create(data=doctor_data)
-#                 print(f"Created doctor: {doctor_data['name']}")
-#             else:
-#                 print(f"Doctor {doctor_data['name']} already exists")
-
-#         # --- Seed Appointments ---
-#         # Fetch patients and doctors to reference their IDs
-#         patient1 = await prisma.patient.find_first(where={"email": "john.doe@example.com"})
-#         patient2 = await prisma.patient.find_first(where={"email": "jane.smith@example.com"})
-#         doctor1 = await prisma.doctor.find_first(where={"name": "Dr. Smith"})
-#         doctor2 = await prisma.doctor.find_first(where={"name": "Dr. Brown"})
-
-#         test_appointments = [
-#             {
-#                 "patientId": patient1.id,
-#                 "doctorId": doctor1.id,
-#                 "dateTime": datetime.fromisoformat("2025-04-29T15:32:00+00:00"),
-#                 "status": "Scheduled",
-#                 "purpose": "Checkup"
-#             },
-#             {
-#                 "patientId": patient2.id,
-#                 "doctorId": doctor2.id,
-#                 "dateTime": datetime.fromisoformat("2025-04-30T10:00:00+00:00"),
-#                 "status": "Scheduled",
-#                 "purpose": "Consultation"
-#             }
-#         ]
-
-#         for appt_data in test_appointments:
-#             existing_appt = await prisma.appointment.find_first(
-#                 where={
-#                     "patientId": appt_data["patientId"],
-#                     "doctorId": appt_data["doctorId"],
-#                     "dateTime": appt_data["dateTime"]
-#                 }
-#             )
-#             if not existing_appt:
-#                 appt = await prisma.appointment.create(data=appt_data)
-#                 print(f"Created appointment for patient ID {appt_data['patientId']} with doctor ID {appt_data['doctorId']}")
-#             else:
-#                 print(f"Appointment for patient ID {appt_data['patientId']} already exists")
-
-#         # --- Seed Medical History ---
-#         test_medical_histories = [
-#             {
-#                 "patientId": patient1.id,
-#                 "diagnosis": "Flu",
-#                 "treatment": "Rest and hydration",
-#                 "date": datetime.fromisoformat("2025-01-01T00:00:00+00:00")
-#             },
-#             {
-#                 "patientId": patient2.id,
-#                 "diagnosis": "Migraine",
-#                 "treatment": "Pain relief medication",
-#                 "date": datetime.fromisoformat("2025-02-01T00:00:00+00:00")
-#             }
-#         ]
-
-#         for history_data in test_medical_histories:
-#             existing_history = await prisma.medicalhistory.find_first(
-#                 where={
-#                     "patientId": history_data["patientId"],
-#                     "diagnosis": history_data["diagnosis"],
-#                     "date": history_data["date"]
-#                 }
-#             )
-#             if not existing_history:
-#                 history = await prisma.medicalhistory.create(data=history_data)
-#                 print(f"Created medical history for patient ID {history_data['patientId']}")
-#             else:
-#                 print(f"Medical history for patient ID {history_data['patientId']} already exists")
-
-#         print("Database seeding completed successfully!")
-
-#     except Exception as e:
-#         print(f"Error seeding database: {e}")
-        
-#     finally:
-#         await prisma.disconnect()
-
-# if __name__ == "__main__":
-#     asyncio.run(seed_database())
\ No newline at end of file
+"""Deterministic synthetic data for development and performance tests.
+
+    python prisma/seed.py                                   # small development data set
+    python prisma/seed.py --patients 1000000 --jobs 8       # production-sized, about 8M rows
+    python prisma/seed.py --patients 1000000 --dry-run      # generate only; prints row counts and a digest
+
+Run it from the Backend directory after `prisma migrate deploy`. Rows are
+added to whatever the tables already hold. The same --seed, sizes and --now
+always produce the same rows, so two runs against two empty databases are
+identical; --dry-run prints a digest to compare.
+
+The shape of the data follows what the app sees in practice:
+  * doctors are unevenly busy: bookings per doctor follow a power law, so
+    a few doctors have nearly full calendars and most have gaps;
+  * patients recur: a patient's share of appointments and medical histories
+    also follows a power law, so a minority of patients has most visits;
+  * appointments fill weekday working-hour slots (WORKDAY_START, WORKDAY_END,
+    APPOINTMENT_MINUTES) from --past-days ago to --future-days ahead. A
+    doctor never has two bookings in one slot, which satisfies the booking
+    constraints. Past appointments are mostly Confirmed, future ones are
+    Scheduled or Confirmed, and about 8% of each are Cancelled.
+
+Rows are generated in chunks of --chunk-size by a pool of --jobs processes.
+Each chunk has its own random stream, derived from --seed and the chunk's
+position, so the output does not depend on which process finishes first.
+Each chunk is written with PostgreSQL COPY over one of --jobs asyncpg
+connections. Users, sequence resets and the dashboard counts go through
+Prisma. Every user password is hashed once, not per user.
+
+Bulk-loaded rows do not appear in the /changes feed: clients syncing
+against a freshly seeded database should start with a full download.
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # Run as a script from Backend; make `app` importable
+
+from app.scheduling import APPOINTMENT_MINUTES, FREE_STATUSES, WORKDAY_END, WORKDAY_START, WORKING_DAYS
+
+CHUNK_SIZE = 50_000
+DOCTOR_SKEW = 0.8    # Bookings for the doctor of rank r are proportional to 1 / r**DOCTOR_SKEW
+PATIENT_SKEW = 3.0   # u**PATIENT_SKEW for uniform u: the busiest 10% of patients get about 46% of visits
+FILL_LIMIT = 0.9     # Share of a doctor's slots that may be booked
+STRIDE = 1_000_003   # Prime; spreads the frequent patients over the whole id range (see Plan.stride)
+
+FIRST_NAMES = ["John", "Jane", "Ravi", "Priya", "Maria", "Ahmed", "Wei", "Olga", "Kwame", "Sofia",
+               "Lucas", "Aisha", "Kenji", "Elena", "Mateo", "Fatima", "Noah", "Ingrid", "Tariq", "Mei"]
+LAST_NAMES = ["Smith", "Sharma", "Garcia", "Chen", "Okafor", "Ivanova", "Khan", "Silva", "Brown", "Patel",
+              "Müller", "Nguyen", "Kowalski", "Haddad", "Tanaka", "Rossi", "Mensah", "Larsen", "Cohen", "Reyes"]
+SPECIALTIES = [("General Practice", 30), ("Pediatrics", 12), ("Cardiology", 8), ("Dermatology", 8),
+               ("Orthopedics", 8), ("Neurology", 6), ("Psychiatry", 6), ("Gynecology", 6), ("Oncology", 4),
+               ("Radiology", 4), ("Endocrinology", 4), ("Ophthalmology", 4)]
+PURPOSES = [("Checkup", 30), ("Follow-up", 25), ("Consultation", 20), ("Vaccination", 8),
+            ("Lab results", 8), ("Prescription renewal", 5), (None, 4)]
+DIAGNOSES = [("Hypertension", "ACE inhibitor and low-sodium diet", 14), ("Type 2 diabetes", "Metformin", 10),
+             ("Influenza", "Rest and hydration", 10), ("Migraine", "Pain relief medication", 8),
+             ("Asthma", "Inhaled corticosteroid", 8), ("Seasonal allergies", "Antihistamines", 8),
+             ("Lower back pain", "Physiotherapy", 8), ("Anxiety disorder", "Cognitive behavioural therapy", 6),
+             ("Bronchitis", "Cough suppressant and rest", 6), ("Hypothyroidism", "Levothyroxine", 5),
+             ("Eczema", "Topical corticosteroid", 5), ("Sprained ankle", None, 4), ("Anemia", "Iron supplements", 4),
+             ("Gastritis", "Proton pump inhibitor", 4)]
+STAFF = [("admin@example.com", "admin123", "admin"), ("doctor@example.com", "doctor123", "doctor"),
+         ("nurse@example.com", "nurse123", "nurse")]
+
+COLUMNS = {
+    "Doctor": ("id", "name", "specialty", "createdAt", "updatedAt"),
+    "Patient": ("id", "name", "email", "phone", "dob", "createdAt", "updatedAt"),
+    "Appointment": ("id", "patientId", "doctorId", "dateTime", "status", "purpose", "createdAt", "updatedAt"),
+    "MedicalHistory": ("id", "patientId", "diagnosis", "treatment", "date", "updatedAt"),
+}
+
+def chunk_random(seed: int, table: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{table}:{index}")
+
+def weighted(items: list[tuple]) -> tuple[list, list[int]]:
+    """(values, cumulative weights) for rng.choices; the weight is the last element of each item."""
+    values = [item[0] if len(item) == 2 else item[:-1] for item in items]
+    total, cumulative = 0, []
+    for item in items:
+        total += item[-1]
+        cumulative.append(total)
+    return values, cumulative
+
+class Plan:
+    """Sizes, id ranges and the shared calendar; everything a chunk needs to generate its rows."""
+
+    def __init__(self, args, bases: dict[str, int], now: datetime):
+        self.seed = args.seed
+        self.now = now
+        self.bases = bases
+        self.patients = args.patients
+        # index * stride % patients only visits every patient when the two are coprime
+        self.stride = STRIDE
+        while math.gcd(self.stride, self.patients) != 1:
+            self.stride += 1
+        self.doctors = args.doctors or max(1, args.patients // 200)
+        self.histories = round(args.patients * args.histories_per_patient)
+        first_day = (now - timedelta(days=args.past_days)).date()
+        days = (first_day + timedelta(days=i) for i in range(args.past_days + args.future_days + 1))
+        self.days = [day for day in days if day.weekday() in WORKING_DAYS]
+        workday = datetime.combine(first_day, WORKDAY_END) - datetime.combine(first_day, WORKDAY_START)
+        self.slots_per_day = int(workday.total_seconds() // (APPOINTMENT_MINUTES * 60))
+        self.past_days = args.past_days
+        self.quotas = self.doctor_quotas(round(args.patients * args.appointments_per_patient))
+        self.appointments = sum(self.quotas)
+
+    def doctor_quotas(self, total: int) -> list[int]:
+        """Bookings per doctor: power-law weights by a seeded random rank, capped at FILL_LIMIT of the calendar.
+
+        What a full doctor cannot take is handed on to the others in proportion to their weights.
+        """
+        capacity = int(len(self.days) * self.slots_per_day * FILL_LIMIT)
+        ranks = list(range(1, self.doctors + 1))
+        random.Random(f"{self.seed}:doctor-ranks").shuffle(ranks)
+        weights = [1 / rank ** DOCTOR_SKEW for rank in ranks]
+        quotas = [0] * self.doctors
+        remaining, open_doctors = min(total, capacity * self.doctors), set(range(self.doctors))
+        while remaining > 0 and open_doctors:
+            weight_sum = sum(weights[d] for d in open_doctors)
+            handed_out = 0
+            for d in sorted(open_doctors):
+                share = min(capacity - quotas[d], max(1, int(remaining * weights[d] / weight_sum)))
+                share = min(share, remaining - handed_out)
+                quotas[d] += share
+                handed_out += share
+                if quotas[d] >= capacity:
+                    open_doctors.discard(d)
+            remaining -= handed_out
+        return quotas
+
+    def patient_id(self, rng: random.Random) -> int:
+        index = int(self.patients * rng.random() ** PATIENT_SKEW)
+        return self.bases["Patient"] + 1 + (index * self.stride) % self.patients
+
+    def chunks(self, chunk_size: int) -> list[tuple[str, int, tuple]]:
+        """(table, chunk index, arguments) for every chunk, parents before children."""
+        chunks = [("Doctor", 0, (0, self.doctors))]
+        chunks += [
+            ("Patient", i, (start, min(start + chunk_size, self.patients)))
+            for i, start in enumerate(range(0, self.patients, chunk_size))
+        ]
+        groups, group, rows, next_id = [], [], 0, self.bases["Appointment"] + 1
+        for doctor, quota in enumerate(self.quotas):
+            group.append((doctor, quota, next_id))
+            rows += quota
+            next_id += quota
+            if rows >= chunk_size:
+                groups.append(tuple(group))
+                group, rows = [], 0
+        if group:
+            groups.append(tuple(group))
+        chunks += [("Appointment", i, (group,)) for i, group in enumerate(groups)]
+        chunks += [
+            ("MedicalHistory", i, (start, min(start + chunk_size, self.histories)))
+            for i, start in enumerate(range(0, self.histories, chunk_size))
+        ]
+        return chunks
+
+def created_at(rng: random.Random, plan: Plan) -> datetime:
+    return plan.now - timedelta(seconds=rng.randrange(plan.past_days * 86400 + 1))
+
+def doctor_rows(plan: Plan, index: int, start: int, end: int) -> list[tuple]:
+    rng = chunk_random(plan.seed, "Doctor", index)
+    specialties, cumulative = weighted(SPECIALTIES)
+    rows = []
+    for i in range(start, end):
+        created = created_at(rng, plan)
+        specialty = rng.choices(specialties, cum_weights=cumulative)[0]
+        rows.append((plan.bases["Doctor"] + 1 + i, f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                     specialty, created, created))
+    return rows
+
+def patient_rows(plan: Plan, index: int, start: int, end: int) -> list[tuple]:
+    rng = chunk_random(plan.seed, "Patient", index)
+    rows = []
+    for i in range(start, end):
+        patient_id = plan.bases["Patient"] + 1 + i
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created = created_at(rng, plan)
+        rows.append((
+            patient_id,
+            f"{first} {last}",
+            f"{first.lower()}.{last.lower()}.{patient_id}@example.com",
+            f"+1555{rng.randrange(10**7):07d}" if rng.random() < 0.9 else None,
+            f"{rng.randint(1935, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            created,
+            created,
+        ))
+    return rows
+
+def appointment_rows(plan: Plan, index: int, group: tuple) -> list[tuple]:
+    rng = chunk_random(plan.seed, "Appointment", index)
+    purposes, purpose_weights = weighted(PURPOSES)
+    cancelled = next(iter(FREE_STATUSES))
+    capacity = len(plan.days) * plan.slots_per_day
+    rows = []
+    for doctor, quota, first_id in group:
+        for offset, slot in enumerate(sorted(rng.sample(range(capacity), quota))):
+            day, position = divmod(slot, plan.slots_per_day)
+            when = datetime.combine(plan.days[day], WORKDAY_START) + timedelta(minutes=position * APPOINTMENT_MINUTES)
+            if rng.random() < 0.08:
+                status = cancelled
+            elif when < plan.now:
+                status = "Confirmed"
+            else:
+                status = "Confirmed" if rng.random() < 0.35 else "Scheduled"
+            booked = min(when - timedelta(hours=rng.randrange(1, 24 * 60)), plan.now)
+            rows.append((
+                first_id + offset, plan.patient_id(rng), plan.bases["Doctor"] + 1 + doctor, when, status,
+                rng.choices(purposes, cum_weights=purpose_weights)[0], booked, booked,
+            ))
+    return rows
+
+def history_rows(plan: Plan, index: int, start: int, end: int) -> list[tuple]:
+    rng = chunk_random(plan.seed, "MedicalHistory", index)
+    diagnoses, cumulative = weighted(DIAGNOSES)
+    rows = []
+    for i in range(start, end):
+        diagnosis, treatment = rng.choices(diagnoses, cum_weights=cumulative)[0]
+        recorded = created_at(rng, plan).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows.append((plan.bases["MedicalHistory"] + 1 + i, plan.patient_id(rng), diagnosis, treatment, recorded, recorded))
+    return rows
+
+GENERATORS = {"Doctor": doctor_rows, "Patient": patient_rows, "Appointment": appointment_rows, "MedicalHistory": history_rows}
+
+def generate(plan: Plan, table: str, index: int, arguments: tuple) -> list[tuple]:
+    return GENERATORS[table](plan, index, *arguments)
+
+async def next_ids(db) -> dict[str, int]:
+    """Current MAX(id) per table; new rows are numbered after it."""
+    bases = {}
+    for table in COLUMNS:
+        rows = await db.query_raw(f'SELECT COALESCE(MAX("id"), 0)::int AS "id" FROM "{table}"')
+        bases[table] = rows[0]["id"]
+    return bases
+
+async def seed_users(db, extra: int):
+    from app.passwords import pwd_context
+    staff = [(email, pwd_context.hash(password), role) for email, password, role in STAFF]
+    shared = pwd_context.hash("password123")  # One bcrypt hash for every generated account
+    users = [{"email": email, "password": hashed, "role": role} for email, hashed, role in staff]
+    users += [
+        {"email": f"staff{i}@example.com", "password": shared, "role": ("doctor", "nurse")[i % 2]}
+        for i in range(extra)
+    ]
+    return await db.user.create_many(data=users, skip_duplicates=True)
+
+async def finish(db):
+    """Move the id sequences past the explicit ids, refresh the dashboard counts and planner statistics."""
+    from app.stats import rebuild_daily_counts
+    for table in COLUMNS:
+        await db.execute_raw(
+            f'SELECT setval(pg_get_serial_sequence(\'"{table}"\', \'id\'), GREATEST(MAX("id"), 1)) FROM "{table}"'
+        )
+    await rebuild_daily_counts(db)
+    for table in COLUMNS:
+        await db.execute_raw(f'ANALYZE "{table}"')
+
+async def run(args):
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)  # COPY writes naive UTC, as Prisma does
+    if args.now:
+        now = datetime.fromisoformat(args.now).replace(tzinfo=None)
+    db = None
+    if args.dry_run:
+        bases = {table: 0 for table in COLUMNS}
+    else:
+        from prisma import Prisma
+        db = Prisma()
+        await db.connect()
+        bases = await next_ids(db)
+    plan = Plan(args, bases, now)
+    chunks = plan.chunks(args.chunk_size)
+    counts = {table: 0 for table in COLUMNS}
+    digests = {table: hashlib.sha256() for table in COLUMNS}
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    pool = connections = None
+    try:
+        if db is not None:
+            import asyncpg
+            from app.events import listen_dsn
+            users = await seed_users(db, args.users)
+            print(f"Users: {users} created")
+            connections = await asyncpg.create_pool(listen_dsn(os.getenv("DATABASE_URL")), min_size=1, max_size=args.jobs)
+        pool = ProcessPoolExecutor(max_workers=args.jobs)
+        slots = asyncio.Semaphore(args.jobs * 2)  # Bounds the generated chunks held in memory
+
+        async def load(table: str, index: int, arguments: tuple):
+            async with slots:
+                rows = await loop.run_in_executor(pool, generate, plan, table, index, arguments)
+                if connections is not None:
+                    async with connections.acquire() as connection:
+                        await connection.copy_records_to_table(table, records=rows, columns=COLUMNS[table])
+                return table, index, rows
+
+        results = {}
+        # Each table waits for the one before it, so foreign keys always point at rows already written
+        for table in COLUMNS:
+            tasks = [load(*chunk) for chunk in chunks if chunk[0] == table]
+            for done in asyncio.as_completed(tasks):
+                table, index, rows = await done
+                counts[table] += len(rows)
+                if args.dry_run:
+                    results[index] = hashlib.sha256(repr(rows).encode()).digest()
+            for index in sorted(results):
+                digests[table].update(results[index])
+            results.clear()
+            print(f"{table}: {counts[table]} rows ({time.perf_counter() - start:.1f}s)")
+        if db is not None:
+            await finish(db)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if connections is not None:
+            await connections.close()
+        if db is not None:
+            await db.disconnect()
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"Done: {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    if args.dry_run:
+        print("Digest: " + hashlib.sha256("".join(d.hexdigest() for d in digests.values()).encode()).hexdigest())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--doctors", type=int, help="Defaults to one per 200 patients")
+    parser.add_argument("--appointments-per-patient", type=float, default=5.0)
+    parser.add_argument("--histories-per-patient", type=float, default=2.0)
+    parser.add_argument("--users", type=int, default=0, help="Generated staff accounts besides admin, doctor and nurse")
+    parser.add_argument("--past-days", type=int, default=365)
+    parser.add_argument("--future-days", type=int, default=90)
+    parser.add_argument("--now", help="ISO timestamp the calendar is built around (default: the current time)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Generator processes and COPY connections")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Generate without connecting to the database")
+    asyncio.run(run(parser.parse_args()))
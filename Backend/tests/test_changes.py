@@ -0,0 +1,124 @@
+"""The /changes feed against a fake database in which a transaction's writes stay invisible until it commits.
+
+    python -m pytest tests
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import app.changes
+from app.changes import ENTITIES, latest_seq, log_changes, read_changes
+
+CREATED = datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+class FakeChangeLog:
+    def __init__(self, db):
+        self.db = db
+
+    async def find_many(self, where: dict, order: dict, take: int):
+        rows = [
+            row for row in self.db.committed
+            if row.seq is not None and row.seq > where["seq"]["gt"] and row.entity in where["entity"]["in"]
+        ]
+        return sorted(rows, key=lambda row: row.seq)[:take]
+
+class FakeDb:
+    """Entries get their id when inserted and become visible when their transaction commits."""
+
+    def __init__(self):
+        self.committed = []
+        self.next_id = 1
+        self.next_seq = 1
+        self.writer_sql: list[str] = []
+        self.sequencer_locks = 0
+        self.changelog = FakeChangeLog(self)
+
+    @asynccontextmanager
+    async def tx(self):
+        tx = FakeTx(self)
+        yield tx
+        self.committed.extend(tx.pending)
+
+    async def query_raw(self, sql: str, *params):
+        if 'FROM "ChangeLogState"' in sql:
+            return [{"horizon": 0}]
+        if 'MAX("seq")' in sql:
+            return [{"seq": max((row.seq for row in self.committed if row.seq is not None), default=0)}]
+        raise AssertionError(sql)
+
+class FakeTx:
+    def __init__(self, db: FakeDb):
+        self.db = db
+        self.pending = []
+
+    async def execute_raw(self, sql: str, *params):
+        if sql.startswith("SELECT pg_advisory_xact_lock"):
+            assert params == (app.changes.SEQUENCE_LOCK,)
+            self.db.sequencer_locks += 1
+            return 1
+        if sql.startswith('INSERT INTO "ChangeLog"'):
+            self.db.writer_sql.append(sql)
+            entity, action, entries = params
+            for entry in json.loads(entries):
+                self.pending.append(SimpleNamespace(
+                    id=self.db.next_id, seq=None, entity=entity, entityId=entry["id"], action=action, data=entry["data"]
+                ))
+                self.db.next_id += 1
+            return len(json.loads(entries))
+        if sql.startswith('UPDATE "ChangeLog"'):
+            unsequenced = sorted((row for row in self.db.committed if row.seq is None), key=lambda row: row.id)
+            for row in unsequenced[:params[0]]:
+                row.seq = self.db.next_seq
+                self.db.next_seq += 1
+            return len(unsequenced[:params[0]])
+        self.db.writer_sql.append(sql)
+        return 0
+
+def patient(id: int):
+    return SimpleNamespace(id=id, name="Ada", email="ada@example.com", phone=None, dob=None, createdAt=CREATED, updatedAt=CREATED)
+
+def doctor(id: int):
+    return SimpleNamespace(id=id, name="Dr. Lin", specialty="Cardiology", createdAt=CREATED, updatedAt=CREATED)
+
+def test_writer_committing_late_is_not_skipped():
+    async def run():
+        db = FakeDb()
+        async with db.tx() as first:
+            await log_changes(first, "patient", "created", [patient(1)])
+            # A second writer appends after the first, but commits before it
+            async with db.tx() as second:
+                await log_changes(second, "doctor", "created", [doctor(2)])
+            early = await read_changes(db, 0, 100, list(ENTITIES))
+        late = await read_changes(db, early["next"], 100, list(ENTITIES))
+        return db, early, late
+
+    db, early, late = asyncio.run(run())
+    assert [(change["entity"], change["id"]) for change in early["changes"]] == [("doctor", 2)]
+    assert [(change["entity"], change["id"]) for change in late["changes"]] == [("patient", 1)]
+    assert late["changes"][0]["seq"] > early["next"]
+    # Writers append without taking any lock
+    assert db.writer_sql and all("advisory" not in sql for sql in db.writer_sql)
+
+def test_latest_seq_numbers_committed_entries_first():
+    async def run():
+        db = FakeDb()
+        async with db.tx() as tx:
+            await log_changes(tx, "patient", "created", [patient(1), patient(2)])
+        return await latest_seq(db)
+
+    assert asyncio.run(run()) == 2
+
+def test_latest_seq_numbers_a_backlog_larger_than_one_batch(monkeypatch):
+    monkeypatch.setattr(app.changes, "CHANGES_SEQUENCE_BATCH", 2)
+
+    async def run():
+        db = FakeDb()
+        async with db.tx() as tx:
+            await log_changes(tx, "patient", "created", [patient(id) for id in range(1, 6)])
+        return db, await latest_seq(db)
+
+    db, seq = asyncio.run(run())
+    assert seq == 5
+    assert all(row.seq is not None for row in db.committed)
+    assert db.sequencer_locks == 3  # Two full batches, then a short one
@@ -0,0 +1,34 @@
+"""ETag generation and If-None-Match handling for the read routes.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from starlette.requests import Request
+from app.conditional import etag_for, not_modified
+
+UPDATED = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+def request(if_none_match: str | None = None, query: bytes = b"") -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "path": "/doctors", "query_string": query, "headers": headers})
+
+def doctors(updated: datetime = UPDATED) -> list:
+    return [SimpleNamespace(id=1, updatedAt=updated), SimpleNamespace(id=2, updatedAt=UPDATED)]
+
+def test_etag_is_weak_because_compressed_bodies_share_it():
+    assert etag_for(request(), doctors()).startswith('W/"')
+
+def test_etag_changes_with_rows_and_query():
+    etag = etag_for(request(), doctors())
+    assert etag == etag_for(request(), doctors())
+    assert etag != etag_for(request(), doctors(datetime(2025, 3, 4, tzinfo=timezone.utc)))
+    assert etag != etag_for(request(query=b"specialty=Cardiology"), doctors())
+
+def test_if_none_match_compares_weakly():
+    etag = etag_for(request(), doctors())
+    for header in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        response = not_modified(request(header), etag)
+        assert response.status_code == 304 and response.headers["etag"] == etag
+    assert not_modified(request('W/"other"'), etag) is None
+    assert not_modified(request(), etag) is None
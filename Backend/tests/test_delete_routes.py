@@ -0,0 +1,103 @@
+"""DELETE /patients/{id} and DELETE /doctors/{id} against a fake Prisma client that records the SQL sent.
+
+    python -m pytest tests
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app import stats
+from app.routes.doctors import delete_doctor
+from app.routes.patients import delete_patient
+
+CREATED = datetime(2025, 1, 2, tzinfo=timezone.utc)
+BOOKED_AT = datetime(2025, 3, 4, 9, 30, tzinfo=timezone.utc)
+
+class FakeModel:
+    def __init__(self, name: str, calls: list, rows: list):
+        self.name = name
+        self.calls = calls
+        self.rows = rows
+
+    async def find_unique(self, where: dict):
+        return next((row for row in self.rows if row.id == where["id"]), None)
+
+    async def find_many(self, where: dict):
+        return [row for row in self.rows if all(getattr(row, key) == value for key, value in where.items())]
+
+    async def delete(self, where: dict):
+        self.calls.append(("delete", self.name))
+        return await self.find_unique(where)
+
+class FakeDb:
+    def __init__(self):
+        self.calls: list[tuple] = []
+        self.patient = FakeModel("patient", self.calls, [
+            SimpleNamespace(id=1, name="Ada", email="ada@example.com", phone=None, createdAt=CREATED),
+        ])
+        self.doctor = FakeModel("doctor", self.calls, [
+            SimpleNamespace(id=2, name="Dr. Lin", specialty="Cardiology", createdAt=CREATED),
+        ])
+        self.appointment = FakeModel("appointment", self.calls, [
+            SimpleNamespace(id=3, patientId=1, doctorId=2, dateTime=BOOKED_AT, status="Scheduled", purpose=None),
+        ])
+
+    async def query_raw(self, sql: str, *params):
+        self.calls.append(("query", sql, params))
+        if sql.startswith('SELECT "dateTime"::date'):
+            return [{"day": BOOKED_AT.date().isoformat(), "n": 1}]
+        return []
+
+    async def execute_raw(self, sql: str, *params):
+        self.calls.append(("execute", sql, params))
+        return 1
+
+    @asynccontextmanager
+    async def tx(self):
+        self.calls.append(("begin",))
+        yield self
+        self.calls.append(("commit",))
+
+def watch_summary(db: FakeDb, monkeypatch):
+    monkeypatch.setattr(stats.summary_cache, "clear", lambda: db.calls.append(("invalidate",)))
+
+def sql_sent(db: FakeDb) -> list[str]:
+    return [call[1] for call in db.calls if call[0] in ("query", "execute")]
+
+def assert_cascade_logged(db: FakeDb, model: str):
+    # Every interpolated identifier was filled in, and the appointment tombstones follow the delete
+    assert not [sql for sql in sql_sent(db) if "{" in sql]
+    deleted_at = db.calls.index(("delete", model))
+    tombstones = [
+        i for i, call in enumerate(db.calls)
+        if call[0] == "execute" and call[1].startswith('INSERT INTO "ChangeLog"') and call[2][0] == "appointment"
+    ]
+    assert tombstones and min(tombstones) > deleted_at
+    # The DailyCount adjustments commit with the delete, so the dashboard cannot drift from the tables
+    begin, commit = db.calls.index(("begin",)), db.calls.index(("commit",))
+    counts = [
+        i for i, call in enumerate(db.calls)
+        if call[0] == "execute" and call[1].startswith('INSERT INTO "DailyCount"')
+    ]
+    assert {db.calls[i][2][0] for i in counts} == {model + "s", "appointments"}
+    assert begin < min(counts) and max(counts) < commit
+    # A dashboard read before the commit would cache the old totals again
+    assert db.calls.index(("invalidate",)) > commit
+
+def test_delete_patient_counts_its_appointments(monkeypatch):
+    db = FakeDb()
+    watch_summary(db, monkeypatch)
+    deleted = asyncio.run(delete_patient(1, db=db, current_user=None))
+    assert deleted.id == 1
+    days = [call for call in db.calls if call[0] == "query" and call[1].startswith('SELECT "dateTime"::date')]
+    assert days and 'WHERE "patientId" = $1' in days[0][1] and days[0][2] == (1,)
+    assert_cascade_logged(db, "patient")
+
+def test_delete_doctor_counts_its_appointments(monkeypatch):
+    db = FakeDb()
+    watch_summary(db, monkeypatch)
+    deleted = asyncio.run(delete_doctor(2, db=db, current_user=None))
+    assert deleted.id == 2
+    days = [call for call in db.calls if call[0] == "query" and call[1].startswith('SELECT "dateTime"::date')]
+    assert days and 'WHERE "doctorId" = $1' in days[0][1] and days[0][2] == (2,)
+    assert_cascade_logged(db, "doctor")
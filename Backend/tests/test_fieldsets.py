@@ -0,0 +1,64 @@
+"""Parsing and applying the `fields=` and `include=` query parameters.
+
+    python -m pytest tests
+"""
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.fieldsets import NESTED_LIMIT, NESTED_LIMIT_MAX, SCALARS, parse_fieldset
+
+def rejected(*args, **kwargs) -> str:
+    with pytest.raises(HTTPException) as raised:
+        parse_fieldset(*args, **kwargs)
+    assert raised.value.status_code == 400
+    return raised.value.detail
+
+def test_defaults_load_nothing_and_return_every_column():
+    fieldset = parse_fieldset("patient", None, None)
+    assert fieldset.include == {} and fieldset.fields == {}
+    assert fieldset.prisma_include() is None
+
+def test_default_include_applies_only_when_include_is_absent():
+    assert parse_fieldset("appointment", None, None, default_include="patient,doctor").include == {"patient": None, "doctor": None}
+    assert parse_fieldset("appointment", None, "", default_include="patient,doctor").include == {}
+
+def test_include_limits_are_defaulted_and_capped():
+    fieldset = parse_fieldset("patient", None, f"appointments:5, medicalHistory,appointments:{NESTED_LIMIT_MAX + 1}")
+    assert fieldset.include == {"appointments": NESTED_LIMIT_MAX, "medicalHistory": NESTED_LIMIT}
+    assert fieldset.prisma_include() == {
+        "appointments": {"take": NESTED_LIMIT_MAX, "order_by": {"dateTime": "desc"}},
+        "medicalHistory": {"take": NESTED_LIMIT, "order_by": {"date": "desc"}},
+    }
+
+def test_to_one_relations_ignore_the_limit():
+    assert parse_fieldset("appointment", None, "doctor:3").prisma_include() == {"doctor": True}
+
+@pytest.mark.parametrize("include", ["appointments:0", "appointments:-1", "appointments:many"])
+def test_bad_limits_are_a_400(include):
+    assert "Invalid limit" in rejected("patient", None, include)
+
+def test_unknown_relation_is_a_400():
+    assert "Unknown relation 'doctor'" in rejected("patient", None, "doctor")
+    assert "Unknown relation 'billing'" in rejected("patient", "billing.total", None)
+
+@pytest.mark.parametrize("fields", ["password", "id,ssn", "appointments.password", "Name"])
+def test_unknown_fields_are_a_400(fields):
+    assert "Unknown field" in rejected("patient", fields, None)
+
+def test_relation_fields_imply_loading_the_relation():
+    fieldset = parse_fieldset("patient", "name,appointments.dateTime", None)
+    assert fieldset.include == {"appointments": NESTED_LIMIT}
+    assert fieldset.fields == {None: ["name"], "appointments": ["dateTime"]}
+
+def test_project_trims_columns_and_relations():
+    doctor = SimpleNamespace(id=2, name="Dr. Lin", specialty="Cardiology", createdAt=None, updatedAt=None)
+    appointment = SimpleNamespace(id=3, patientId=1, doctorId=2, dateTime="2025-03-03T09:00:00Z", status="Scheduled",
+                                  purpose=None, createdAt=None, updatedAt=None, doctor=doctor, patient=None)
+    fieldset = parse_fieldset("appointment", "id,doctor.name", "doctor,patient")
+    assert fieldset.project(appointment) == {"id": 3, "doctor": {"name": "Dr. Lin"}, "patient": None}
+
+def test_project_lists_for_to_many_relations():
+    visits = [SimpleNamespace(**{column: index for column in SCALARS["appointment"]}) for index in range(2)]
+    patient = SimpleNamespace(**{column: None for column in SCALARS["patient"]}, appointments=visits)
+    record = parse_fieldset("patient", "id,appointments.id", None).project(patient)
+    assert record == {"id": None, "appointments": [{"id": 0}, {"id": 1}]}
@@ -0,0 +1,242 @@
+"""OutboxWorker delivery against MemoryOutboxStore and fake providers.
+
+    python -m pytest tests
+"""
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from app.notifications import (
+    OUTBOX_BACKOFF_BASE, BatchRejected, FakeProvider, MemoryOutboxStore, OutboxWorker, PermanentFailure, SendGridEmailProvider,
+    TokenBucket, utcnow
+)
+
+def worker(store, providers, **kwargs) -> OutboxWorker:
+    # No rate limits unless a test asks for them
+    return OutboxWorker(store, providers, rate_limits=kwargs.pop("rate_limits", {}), **kwargs)
+
+def sms(store: MemoryOutboxStore, n: int, **fields):
+    return [store.add(channel="sms", recipient=f"+1555000{i:04d}", body=f"Message {i}", **fields) for i in range(n)]
+
+class FailingProvider(FakeProvider):
+    """Fails the first `failures` requests, then delivers."""
+
+    def __init__(self, channel: str, failures: int, max_batch: int = 1):
+        super().__init__(channel, max_batch=max_batch)
+        self.failures = failures
+
+    def send_batch(self, messages):
+        self.requests += 1
+        if self.requests <= self.failures:
+            raise RuntimeError("provider unavailable")
+        self.sent.extend(messages)
+
+def test_claim_leases_due_messages_only():
+    store = MemoryOutboxStore()
+    due = sms(store, 3)
+    later = store.add(channel="sms", recipient="+15559999999", body="Later", availableAt=utcnow() + timedelta(hours=1))
+
+    async def run():
+        first = await store.claim(2, lease=60)
+        second = await store.claim(10, lease=60)
+        third = await store.claim(10, lease=60)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == due[:2] and second == due[2:] and third == []
+    assert all(message.status == "sending" and message.attempts == 1 for message in due)
+    assert later.status == "pending" and later.attempts == 0
+
+def test_expired_lease_is_claimed_again():
+    store = MemoryOutboxStore()
+    [message] = sms(store, 1)
+
+    async def run():
+        await store.claim(10, lease=60)
+        hidden = await store.claim(10, lease=60)
+        message.availableAt = utcnow() - timedelta(seconds=1)  # The worker holding it died
+        return hidden, await store.claim(10, lease=60)
+
+    hidden, reclaimed = asyncio.run(run())
+    assert hidden == [] and reclaimed == [message]
+    assert message.attempts == 2
+
+def test_delivery_batches_per_provider_and_marks_sent():
+    store = MemoryOutboxStore()
+    sms(store, 3)
+    for i in range(5):
+        store.add(channel="email", recipient=f"p{i}@example.com", subject="Hi", body=f"Email {i}")
+    providers = {"sms": FakeProvider("sms"), "email": FakeProvider("email", max_batch=2)}
+
+    claimed = asyncio.run(worker(store, providers).run_once())
+    assert claimed == 8
+    assert providers["sms"].requests == 3 and len(providers["sms"].sent) == 3
+    assert providers["email"].requests == 3 and len(providers["email"].sent) == 5
+    assert all(message.status == "sent" and message.sentAt for message in store.messages)
+
+def test_failed_send_is_retried_with_backoff_then_dead_lettered():
+    store = MemoryOutboxStore()
+    [message] = sms(store, 1)
+    outbox = worker(store, {"sms": FailingProvider("sms", failures=10)}, max_attempts=3)
+
+    async def attempt():
+        message.availableAt = utcnow()  # Skip the backoff wait
+        before = utcnow()
+        await outbox.run_once()
+        return before
+
+    before = asyncio.run(attempt())
+    assert message.status == "pending" and message.attempts == 1
+    assert message.lastError == "provider unavailable"
+    assert before <= message.availableAt <= utcnow() + timedelta(seconds=OUTBOX_BACKOFF_BASE)
+    asyncio.run(attempt())
+    assert message.status == "pending" and message.attempts == 2
+    asyncio.run(attempt())
+    assert message.status == "dead" and message.attempts == 3
+
+def test_retry_succeeds_after_a_transient_failure():
+    store = MemoryOutboxStore()
+    [message] = sms(store, 1)
+    provider = FailingProvider("sms", failures=1)
+    outbox = worker(store, {"sms": provider})
+
+    async def run():
+        await outbox.run_once()
+        message.availableAt = utcnow()
+        await outbox.run_once()
+
+    asyncio.run(run())
+    assert message.status == "sent" and message.attempts == 2 and provider.sent == [message]
+
+def test_one_failing_batch_does_not_fail_the_others():
+    store = MemoryOutboxStore()
+    sms(store, 2)
+    emails = [store.add(channel="email", recipient="p@example.com", subject="Hi", body="Email")]
+    asyncio.run(worker(store, {"sms": FailingProvider("sms", failures=10), "email": FakeProvider("email")}).run_once())
+    assert [message.status for message in store.messages if message.channel == "sms"] == ["pending", "pending"]
+    assert emails[0].status == "sent"
+
+def test_unknown_channel_fails_without_a_provider_call():
+    store = MemoryOutboxStore()
+    [message] = [store.add(channel="fax", recipient="+15550000000", body="Hi")]
+    asyncio.run(worker(store, {"sms": FakeProvider("sms")}, max_attempts=1).run_once())
+    assert message.status == "dead" and "fax" in message.lastError
+
+def test_newer_update_coalesces_pending_messages_for_the_same_appointment():
+    store = MemoryOutboxStore()
+    confirmation = {"channel": "sms", "recipient": "+15550000001", "body": "Booked", "appointmentId": 7}
+    other_recipient = {**confirmation, "recipient": "+15550000002"}
+    other_appointment = {**confirmation, "appointmentId": 8}
+    summary = {**confirmation, "appointmentId": None}
+
+    async def run():
+        await store.enqueue([confirmation, other_recipient, other_appointment, summary], delay=0)
+        await store.enqueue([{**confirmation, "body": "Moved"}, summary], delay=0)
+        return await worker(store, {"sms": FakeProvider("sms")}).run_once()
+
+    claimed = asyncio.run(run())
+    statuses = [(message.appointmentId, message.recipient, message.body, message.status) for message in store.messages]
+    assert statuses == [
+        (7, "+15550000001", "Booked", "coalesced"),
+        (7, "+15550000002", "Booked", "sent"),
+        (8, "+15550000001", "Booked", "sent"),
+        (None, "+15550000001", "Booked", "sent"),
+        (7, "+15550000001", "Moved", "sent"),
+        (None, "+15550000001", "Booked", "sent"),
+    ]
+    assert claimed == 5
+
+def test_coalesce_window_delays_new_messages():
+    store = MemoryOutboxStore()
+    asyncio.run(store.enqueue([{"channel": "sms", "recipient": "+15550000001", "body": "Booked", "appointmentId": 7}], delay=60))
+    assert asyncio.run(store.claim(10, lease=60)) == []
+
+def test_token_bucket_allows_a_burst_then_holds_the_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        burst = time.monotonic() - start
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.05
+    assert total >= 5 / 50 * 0.9  # Five more requests at 50 per second
+
+def test_zero_rate_disables_the_limit():
+    bucket = TokenBucket(rate=0, burst=1)
+
+    async def run():
+        for _ in range(100):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - start < 0.5
+
+class PickyProvider(FakeProvider):
+    """Rejects any multi-message request containing `bad`, the way SendGrid rejects a batch over one invalid recipient."""
+
+    def __init__(self, channel: str, bad: str, max_batch: int):
+        super().__init__(channel, max_batch=max_batch)
+        self.bad = bad
+
+    def send_batch(self, messages):
+        self.requests += 1
+        if any(message.recipient == self.bad for message in messages):
+            if len(messages) > 1:
+                raise BatchRejected("invalid recipient")
+            raise PermanentFailure("invalid recipient")
+        self.sent.extend(messages)
+
+def test_rejected_batch_falls_back_to_single_sends():
+    store = MemoryOutboxStore()
+    good = [store.add(channel="email", recipient=f"p{i}@example.com", subject="Hi", body="Email") for i in range(3)]
+    bad = store.add(channel="email", recipient="not-an-address", subject="Hi", body="Email")
+    provider = PickyProvider("email", bad="not-an-address", max_batch=10)
+    asyncio.run(worker(store, {"email": provider}).run_once())
+    assert provider.requests == 1 + 4
+    assert provider.sent == good and all(message.status == "sent" for message in good)
+    # Refused on its own too, so retrying would only spend rate-limit tokens
+    assert bad.status == "dead" and bad.attempts == 1 and bad.lastError == "invalid recipient"
+
+def test_sendgrid_escapes_the_html_body():
+    message = SimpleNamespace(recipient="ada@example.com", subject="Hi", body='Doctor: <script>alert("x")</script> & Co\nSecond line')
+    mail = SendGridEmailProvider.__new__(SendGridEmailProvider).build_mail([message]).get()
+    substitutions = mail["personalizations"][0]["substitutions"]
+    assert substitutions["-text-"] == message.body
+    assert substitutions["-html-"] == "Doctor: &lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; &amp; Co<br>Second line"
+    assert {part["type"]: part["value"] for part in mail["content"]} == {"text/plain": "-text-", "text/html": "<p>-html-</p>"}
+
+class FakeSendGridClient:
+    def __init__(self, status: int):
+        self.status = status
+        self.requests = 0
+
+    def send(self, mail):
+        from python_http_client.exceptions import handle_error
+        self.requests += 1
+        raise handle_error(SimpleNamespace(code=self.status, reason="Rejected", read=lambda: b"{}", hdrs={}))
+
+def sendgrid(status: int) -> SendGridEmailProvider:
+    provider = SendGridEmailProvider.__new__(SendGridEmailProvider)
+    provider.client = FakeSendGridClient(status)
+    return provider
+
+def test_sendgrid_400_for_one_recipient_is_dead_lettered_at_once():
+    store = MemoryOutboxStore()
+    message = store.add(channel="email", recipient="not-an-address", subject="Hi", body="Email")
+    provider = sendgrid(400)
+    asyncio.run(worker(store, {"email": provider}).run_once())
+    assert message.status == "dead" and message.attempts == 1 and provider.client.requests == 1
+
+def test_sendgrid_rate_limits_and_server_errors_are_retried():
+    for status in (429, 500, 503):
+        store = MemoryOutboxStore()
+        message = store.add(channel="email", recipient="p@example.com", subject="Hi", body="Email")
+        asyncio.run(worker(store, {"email": sendgrid(status)}).run_once())
+        assert message.status == "pending" and message.attempts == 1
@@ -0,0 +1,104 @@
+"""Keyset cursors: encoding, tampering, and paging through rows whose sort keys tie.
+
+    python -m pytest tests
+"""
+import base64
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.pagination import (
+    APPOINTMENT_ORDER, MEDICAL_HISTORY_ORDER, apply_cursor, decode_cursor, encode_cursor, next_cursor
+)
+
+START = datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc)
+
+def matches(row, where: dict) -> bool:
+    """Evaluate the subset of Prisma filters apply_cursor produces against an object."""
+    for key, condition in where.items():
+        if key == "AND":
+            if not all(matches(row, clause) for clause in condition):
+                return False
+        elif key == "OR":
+            if not any(matches(row, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = getattr(row, key)
+            if "gt" in condition and not value > condition["gt"]:
+                return False
+            if "lt" in condition and not value < condition["lt"]:
+                return False
+        elif getattr(row, key) != condition:
+            return False
+    return True
+
+def paginate(rows: list, order: list, limit: int, where: dict | None = None) -> list[list[int]]:
+    """Walk every page the way a client would, returning the ids on each."""
+    ordered = list(rows)
+    for field, direction in reversed(order):  # Stable sorts, least significant key first
+        ordered.sort(key=attrgetter(field), reverse=direction == "desc")
+    pages, cursor = [], None
+    while True:
+        selected = [row for row in ordered if matches(row, apply_cursor(where or {}, order, cursor))][:limit]
+        pages.append([row.id for row in selected])
+        cursor = next_cursor(selected, order, limit)
+        if cursor is None:
+            return pages
+
+def test_round_trip_keeps_datetimes_and_ints():
+    cursor = encode_cursor({"dateTime": START, "id": 42})
+    assert "=" not in cursor
+    assert decode_cursor(cursor, APPOINTMENT_ORDER) == {"dateTime": START, "id": 42}
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'["a", "list"]').decode(),
+    base64.urlsafe_b64encode(b'{"id": 1}').decode(),                       # Missing dateTime
+    base64.urlsafe_b64encode(b'{"dateTime": {"dt": "yesterday"}, "id": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"dateTime": {"when": 1}, "id": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"dateTime": 1741000000, "id": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"dateTime": {"dt": "2025-03-03T09:00:00+00:00"}, "id": "1 OR 1=1"}').decode(),
+    base64.urlsafe_b64encode(b'{"dateTime": {"dt": "2025-03-03T09:00:00+00:00"}, "id": true}').decode(),
+])
+def test_tampered_cursors_are_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor, APPOINTMENT_ORDER)
+    assert raised.value.status_code == 400
+
+def test_empty_cursor_leaves_the_filter_alone():
+    assert apply_cursor({"doctorId": 1}, APPOINTMENT_ORDER, None) == {"doctorId": 1}
+    assert apply_cursor({}, APPOINTMENT_ORDER, "") == {}
+
+def test_cursor_is_combined_with_the_filter():
+    cursor = encode_cursor({"dateTime": START, "id": 5})
+    where = apply_cursor({"doctorId": 1}, APPOINTMENT_ORDER, cursor)
+    assert where == {"AND": [
+        {"doctorId": 1},
+        {"OR": [{"dateTime": {"gt": START}}, {"dateTime": START, "id": {"gt": 5}}]},
+    ]}
+
+def test_equal_sort_keys_are_split_by_id_without_skips_or_repeats():
+    # Three appointments share each time, so every page boundary falls inside a tie
+    rows = [
+        SimpleNamespace(id=id, doctorId=1 if id % 4 else 2, dateTime=START + timedelta(minutes=30 * (id // 3)))
+        for id in range(1, 20)
+    ]
+    pages = paginate(rows, APPOINTMENT_ORDER, limit=2, where={"doctorId": 1})
+    seen = [id for page in pages for id in page]
+    expected = [row.id for row in sorted(rows, key=lambda row: (row.dateTime, row.id)) if row.doctorId == 1]
+    assert seen == expected
+    assert all(len(page) == 2 for page in pages[:-1])
+
+def test_descending_order_with_ties():
+    rows = [SimpleNamespace(id=id, date=START - timedelta(days=id // 2)) for id in range(1, 12)]
+    pages = paginate(rows, MEDICAL_HISTORY_ORDER, limit=3)
+    seen = [id for page in pages for id in page]
+    assert seen == [row.id for row in sorted(rows, key=lambda row: (row.date, row.id), reverse=True)]
+
+def test_short_page_has_no_next_cursor():
+    rows = [SimpleNamespace(id=1, dateTime=START)]
+    assert next_cursor(rows, APPOINTMENT_ORDER, limit=2) is None
+    assert next_cursor([], APPOINTMENT_ORDER, limit=2) is None
+    assert decode_cursor(next_cursor(rows, APPOINTMENT_ORDER, limit=1), APPOINTMENT_ORDER) == {"dateTime": START, "id": 1}
@@ -0,0 +1,83 @@
+"""Reminder scans against the in-memory stores, and stopping the scheduler mid-scan.
+
+    python -m pytest tests
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.notifications import MemoryOutboxStore, build_messages
+from app.reminders import MemoryReminderStore, ReminderScanner, reminder_messages
+
+NOW = datetime(2025, 3, 3, 8, 0, tzinfo=timezone.utc)
+
+PATIENT = SimpleNamespace(id=1, name="Ada", email="ada@example.com", phone="+15550000001")
+DOCTOR = SimpleNamespace(id=2, name="Dr. Lin")
+
+def appointment(id: int, start: datetime, status: str = "Scheduled"):
+    return SimpleNamespace(
+        id=id, patientId=PATIENT.id, doctorId=DOCTOR.id, dateTime=start, status=status, purpose=None,
+        patient=PATIENT, doctor=DOCTOR
+    )
+
+def test_scan_queues_each_due_appointment_once():
+    store = MemoryReminderStore([
+        appointment(1, NOW + timedelta(minutes=30)),
+        appointment(2, NOW + timedelta(minutes=50), status="Cancelled"),
+        appointment(3, NOW + timedelta(hours=3)),
+    ])
+    scanner = ReminderScanner(store, offsets=[3600], batch_size=1)
+
+    async def run():
+        await scanner.run_once(NOW - timedelta(hours=1))  # A new offset starts at now + offset
+        first = await scanner.run_once(NOW)
+        again = await scanner.run_once(NOW)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert (first, again) == (2, 0)  # One SMS and one email for appointment 1
+    assert {message["appointmentId"] for message in store.messages} == {1}
+
+def test_confirmation_does_not_coalesce_a_pending_reminder():
+    booked = appointment(1, NOW + timedelta(hours=1))
+    outbox = MemoryOutboxStore()
+
+    async def run():
+        await outbox.enqueue(reminder_messages(booked, 3600), delay=0)
+        await outbox.enqueue(build_messages(PATIENT, DOCTOR, booked, "updated"), delay=0)
+        await outbox.enqueue(build_messages(PATIENT, DOCTOR, booked, "updated"), delay=0)
+
+    asyncio.run(run())
+    statuses = [(message.kind, message.status) for message in outbox.messages]
+    assert statuses.count(("reminder", "pending")) == 2
+    assert statuses.count(("notice", "coalesced")) == 2
+    assert statuses.count(("notice", "pending")) == 2
+
+class BlockingStore:
+    """Holds the first scan open until released, like a slow database transaction."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.finished = False
+
+    async def advance(self, offset: int, now: datetime, limit: int):
+        self.started.set()
+        await self.release.wait()
+        self.finished = True
+        return 0, True
+
+def test_stop_waits_for_the_running_scan():
+    async def run():
+        store = BlockingStore()
+        scanner = ReminderScanner(store, offsets=[3600], interval=3600)
+        scanner.start()
+        await asyncio.wait_for(store.started.wait(), 5)
+        stopping = asyncio.create_task(scanner.stop())
+        await asyncio.sleep(0.05)
+        blocked = not stopping.done()
+        store.release.set()
+        await asyncio.wait_for(stopping, 5)
+        return blocked, store.finished
+
+    blocked, finished = asyncio.run(run())
+    assert blocked and finished
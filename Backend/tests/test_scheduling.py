@@ -0,0 +1,109 @@
+"""DoctorSchedule interval lookups and the window AvailabilityIndex loads from the database.
+
+    python -m pytest tests
+"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.scheduling import DURATION, WORKDAY_END, WORKDAY_START, AvailabilityIndex, DoctorSchedule
+
+MONDAY = date(2025, 3, 3)
+SATURDAY = date(2025, 3, 8)
+
+def at(hour: int, minute: int = 0, day: date = MONDAY) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=timezone.utc)
+
+def test_conflicts_cover_one_duration_either_side():
+    schedule = DoctorSchedule([(at(10), 1), (at(11), 2)])
+    assert schedule.conflicts(at(10)) == [1]
+    assert schedule.conflicts(at(9, 45)) == [1]
+    assert schedule.conflicts(at(10, 15)) == [1]
+    # Back-to-back bookings touch but do not overlap
+    assert schedule.conflicts(at(9, 30)) == []
+    assert schedule.conflicts(at(10, 30)) == []
+    assert schedule.conflicts(at(10, 45)) == [2]
+
+def test_conflicts_ignore_the_booking_being_moved():
+    schedule = DoctorSchedule([(at(10), 1)])
+    assert schedule.conflicts(at(10, 15), ignore=1) == []
+
+def test_naive_datetimes_are_utc():
+    schedule = DoctorSchedule([(at(10).replace(tzinfo=None), 1)])
+    assert schedule.conflicts(at(10)) == [1]
+    assert schedule.conflicts(at(10).replace(tzinfo=None)) == [1]
+
+def test_add_and_remove_keep_the_schedule_sorted():
+    schedule = DoctorSchedule([(at(11), 2)])
+    schedule.add(1, at(10))
+    assert [appointment_id for _, appointment_id in schedule.bookings] == [1, 2]
+    assert schedule.remove(2, at(11))
+    assert not schedule.remove(2, at(11))
+    assert schedule.conflicts(at(11)) == []
+
+def test_between_is_half_open():
+    schedule = DoctorSchedule([(at(9), 1), (at(10), 2), (at(11), 3)])
+    assert schedule.between(at(9), at(11)) == [(at(9), 1), (at(10), 2)]
+    assert schedule.between(at(9, 1), at(11, 1)) == [(at(10), 2), (at(11), 3)]
+    assert schedule.between(at(12), at(13)) == []
+
+def test_free_slots_skip_bookings_and_their_overlaps():
+    opens = datetime.combine(MONDAY, WORKDAY_START, tzinfo=timezone.utc)
+    closes = datetime.combine(MONDAY, WORKDAY_END, tzinfo=timezone.utc)
+    every_slot = []
+    slot = opens
+    while slot + DURATION <= closes:
+        every_slot.append(slot)
+        slot += DURATION
+    assert DoctorSchedule().free_slots(MONDAY) == every_slot
+
+    # One booking on a slot boundary, one straddling two slots
+    booked = DoctorSchedule([(opens, 1), (opens + DURATION * 3 + timedelta(minutes=10), 2)])
+    taken = {opens, opens + DURATION * 3, opens + DURATION * 4}
+    assert booked.free_slots(MONDAY) == [slot for slot in every_slot if slot not in taken]
+
+def test_free_slots_see_a_booking_from_before_opening():
+    opens = datetime.combine(MONDAY, WORKDAY_START, tzinfo=timezone.utc)
+    schedule = DoctorSchedule([(opens - DURATION + timedelta(minutes=10), 1)])
+    assert opens not in schedule.free_slots(MONDAY)
+    assert opens + DURATION in schedule.free_slots(MONDAY)
+
+def test_no_free_slots_on_days_off():
+    assert DoctorSchedule().free_slots(SATURDAY) == []
+
+class FakeAppointments:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def find_many(self, where: dict):
+        self.queries.append(where)
+        window = where["dateTime"]
+        return [
+            row for row in self.rows
+            if row.doctorId == where["doctorId"] and row.status not in where["status"]["not_in"]
+            and row.dateTime >= window["gte"] and ("lt" not in window or row.dateTime < window["lt"])
+        ]
+
+def test_index_loads_upcoming_bookings_and_queries_older_ranges():
+    now = datetime.now(timezone.utc)
+    past = (now - timedelta(days=30)).replace(microsecond=0)
+    appointments = FakeAppointments([
+        SimpleNamespace(id=1, doctorId=7, dateTime=past, status="Scheduled"),
+        SimpleNamespace(id=2, doctorId=7, dateTime=now + timedelta(days=1), status="Scheduled"),
+        SimpleNamespace(id=3, doctorId=7, dateTime=now + timedelta(days=2), status="Cancelled"),
+    ])
+    db = SimpleNamespace(appointment=appointments)
+    index = AvailabilityIndex()
+
+    async def run():
+        upcoming = await index.conflicts(db, 7, now + timedelta(days=1))
+        history = await index.conflicts(db, 7, past + timedelta(minutes=10))
+        return upcoming, history
+
+    upcoming, history = asyncio.run(run())
+    assert upcoming == [2]
+    assert history == [1]
+    # The cached schedule never reaches back into the history; the older range is bounded on both sides
+    cached, older = appointments.queries
+    assert cached["dateTime"]["gte"] > now - DURATION - timedelta(seconds=5) and "lt" not in cached["dateTime"]
+    assert older["dateTime"] == {"gte": past + timedelta(minutes=10) - DURATION, "lt": past + timedelta(minutes=10) + DURATION}
@@ -0,0 +1,33 @@
+"""Wire format of the TypeAdapter-rendered appointment responses.
+
+    python -m pytest tests
+"""
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import orjson
+from fastapi.encoders import jsonable_encoder
+from app.schemas import APPOINTMENT, APPOINTMENT_LIST, render
+
+def appointment(moment: datetime):
+    patient = SimpleNamespace(id=1, name="Ada", email="ada@example.com", phone=None, dob=None, medicalHistory=None)
+    doctor = SimpleNamespace(id=2, name="Dr. Lin", specialty="Cardiology")
+    return SimpleNamespace(
+        id=3, patientId=1, doctorId=2, patient=patient, doctor=doctor, dateTime=moment, status="Scheduled", purpose=None
+    )
+
+def test_datetimes_keep_the_offset_format():
+    for moment in (
+        datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc),
+        datetime(2025, 3, 3, 9, 0, 0, 123000, tzinfo=timezone.utc),
+        datetime(2025, 3, 3, 9, 0),
+    ):
+        body = json.loads(render(APPOINTMENT, appointment(moment)).body)
+        # Same string the routes sent through jsonable_encoder, and that ORJSONResponse sends
+        assert body["dateTime"] == jsonable_encoder(moment) == json.loads(orjson.dumps(moment))
+
+def test_list_rendering_matches_the_single_rendering():
+    booked = appointment(datetime(2025, 3, 3, 9, 0, tzinfo=timezone.utc))
+    [listed] = json.loads(render(APPOINTMENT_LIST, [booked]).body)
+    assert listed == json.loads(render(APPOINTMENT, booked).body)
+    assert listed["dateTime"] == "2025-03-03T09:00:00+00:00"
@@ -0,0 +1,26 @@
+import api from './axios';
+import { useAuthStore } from '../stores/authStore';
+
+export interface ChangeEvent {
+  entity: 'appointment' | 'patient' | 'doctor';
+  action: 'created' | 'updated' | 'deleted';
+  id: number;
+  [field: string]: any;
+}
+
+interface ChangeHandlers {
+  onChange: (event: ChangeEvent) => void;
+  // The server could not deliver every change (slow connection, restart); refetch everything
+  onResync: () => void;
+}
+
+// Opens the /events stream; returns a function that closes it. EventSource reconnects on its own
+// and sends Last-Event-ID, so short drops are replayed without a refetch.
+export function subscribeToChanges(params: Record<string, string>, { onChange, onResync }: ChangeHandlers): () => void {
+  const token = useAuthStore.getState().token;
+  const query = new URLSearchParams({ ...params, ...(token ? { token } : {}) });
+  const source = new EventSource(`${api.defaults.baseURL}/events?${query}`, { withCredentials: true });
+  source.addEventListener('change', (event) => onChange(JSON.parse((event as MessageEvent).data)));
+  source.addEventListener('resync', () => onResync());
+  return () => source.close();
+}
@@ -1,6 +1,7 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { Calendar, Clock, User, FileText } from 'lucide-react';
 import api from '../lib/axios';
+import { ChangeEvent, subscribeToChanges } from '../lib/events';
 import toast, { Toaster, toast as toastFunc } from 'react-hot-toast';
 import { format } from 'date-fns';
 import { useAuthStore } from '../stores/authStore';
@@ -46,31 +47,86 @@ export default function Appointments() {
   const [editing, setEditing] = useState(false);
   const navigate = useNavigate();
   const { isAuthenticated } = useAuthStore();
+  // Live events carry ids only; the latest lists resolve them to names
+  const patientsRef = useRef<Patient[]>([]);
+  const doctorsRef = useRef<Doctor[]>([]);
+  patientsRef.current = patients;
+  doctorsRef.current = doctors;
+
+  const fetchData = useCallback(async () => {
+    try {
+      const [appointmentsRes, patientsRes, doctorsRes] = await Promise.all([
+        api.get('/appointments'),
+        api.get('/patients'),
+        api.get('/doctors'),
+      ]);
+      setAppointments(appointmentsRes.data);
+      setPatients(patientsRes.data);
+      setDoctors(doctorsRes.data);
+    } catch (error: any) {
+      console.error('Error fetching data:', error);
+      toast.error(error.response?.data?.detail || 'Failed to fetch data');
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  // Apply one change pushed by the server instead of refetching the lists
+  const applyChange = useCallback((event: ChangeEvent) => {
+    const upsert = <T extends { id: number }>(items: T[], item: T) =>
+      items.some((existing) => existing.id === item.id)
+        ? items.map((existing) => (existing.id === item.id ? item : existing))
+        : [...items, item];
+    if (event.entity === 'appointment') {
+      if (event.action === 'deleted') {
+        setAppointments((current) => current.filter((app) => app.id !== event.id));
+      } else {
+        const patient = patientsRef.current.find((patient) => patient.id === event.patientId);
+        const doctor = doctorsRef.current.find((doctor) => doctor.id === event.doctorId);
+        if (!patient || !doctor) {
+          // The event names a patient or doctor this page has not loaded yet; reload rather than show blanks
+          fetchData();
+          return;
+        }
+        const appointment: Appointment = {
+          id: event.id,
+          patient,
+          doctor,
+          dateTime: event.dateTime,
+          status: event.status,
+          purpose: event.purpose,
+        };
+        setAppointments((current) => upsert(current, appointment));
+      }
+    } else if (event.entity === 'patient') {
+      if (event.action === 'deleted') {
+        setPatients((current) => current.filter((patient) => patient.id !== event.id));
+        setAppointments((current) => current.filter((app) => app.patient?.id !== event.id));
+      } else {
+        const patient: Patient = { id: event.id, name: event.name, email: event.email, phone: event.phone };
+        setPatients((current) => upsert(current, patient));
+        setAppointments((current) => current.map((app) => (app.patient?.id === event.id ? { ...app, patient } : app)));
+      }
+    } else if (event.entity === 'doctor') {
+      if (event.action === 'deleted') {
+        setDoctors((current) => current.filter((doctor) => doctor.id !== event.id));
+        setAppointments((current) => current.filter((app) => app.doctor?.id !== event.id));
+      } else {
+        const doctor: Doctor = { id: event.id, name: event.name, specialty: event.specialty };
+        setDoctors((current) => upsert(current, doctor));
+        setAppointments((current) => current.map((app) => (app.doctor?.id === event.id ? { ...app, doctor } : app)));
+      }
+    }
+  }, [fetchData]);
 
   useEffect(() => {
     if (!isAuthenticated()) {
       navigate('/login');
-    } else {
-      const fetchData = async () => {
-        try {
-          const [appointmentsRes, patientsRes, doctorsRes] = await Promise.all([
-            api.get('/appointments'),
-            api.get('/patients'),
-            api.get('/doctors'),
-          ]);
-          setAppointments(appointmentsRes.data);
-          setPatients(patientsRes.data);
-          setDoctors(doctorsRes.data);
-        } catch (error: any) {
-          console.error('Error fetching data:', error);
-          toast.error(error.response?.data?.detail || 'Failed to fetch data');
-        } finally {
-          setLoading(false);
-        }
-      };
-      fetchData();
+      return;
     }
-  }, [navigate, isAuthenticated]);
+    fetchData();
+    return subscribeToChanges({}, { onChange: applyChange, onResync: fetchData });
+  }, [navigate, isAuthenticated, fetchData, applyChange]);
 
   const handleAddOrEditAppointment = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -88,7 +144,7 @@ export default function Appointments() {
       if (editing) {
         response = await api.put(`/appointments/${formData.id}`, data);
         console.log('PUT response:', response.data);
-        setAppointments(appointments.map((app) =>
+        setAppointments((current) => current.map((app) =>
           app.id === formData.id ? response.data : app
         ));
         toast.success('Appointment updated successfully. SMS and email sent to patient.');
@@ -102,14 +158,19 @@ export default function Appointments() {
             app.dateTime === isoDateTime
         );
         if (existingAppointment) {
-          setAppointments(
-            appointments.map((app) =>
+          setAppointments((current) =>
+            current.map((app) =>
               app.id === existingAppointment.id ? response.data : app
             )
           );
           toast.success('Appointment status updated to Confirmed. SMS and email sent to patient.');
         } else {
-          setAppointments([...appointments, response.data]);
+          // The live event for this booking may already have added it
+          setAppointments((current) =>
+            current.some((app) => app.id === response.data.id)
+              ? current.map((app) => (app.id === response.data.id ? response.data : app))
+              : [...current, response.data]
+          );
           toast.success('Appointment added successfully. SMS and email sent to patient.');
         }
       }
@@ -157,7 +218,7 @@ export default function Appointments() {
                 console.log('Attempting to delete appointment ID:', appointmentId);
                 const response = await api.delete(`/appointments/${appointmentId}`);
                 console.log('Delete response:', response.data);
-                setAppointments(appointments.filter((app) => app.id !== appointmentId));
+                setAppointments((current) => current.filter((app) => app.id !== appointmentId));
                 toast.success('Appointment deleted successfully');
               } catch (error: any) {
                 console.error('Delete error:', error.response?.data || error.message);
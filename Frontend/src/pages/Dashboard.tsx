@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { Users, Calendar, Activity } from 'lucide-react';
 import api from '../lib/axios';
 import toast, { Toaster } from 'react-hot-toast';
-import { format, subDays } from 'date-fns';
+import { format } from 'date-fns';
 import { useAuthStore } from '../stores/authStore';
 import { useNavigate } from 'react-router-dom';
 
@@ -24,13 +24,16 @@ interface Doctor {
   createdAt: string;
 }
 
-interface Patient {
-  id: number;
-  name: string;
-  email: string;
-  phone: string | null;
-  dob: string;
-  createdAt: string;
+interface PeriodCounts {
+  total: number;
+  current: number;
+  previous: number;
+}
+
+interface DashboardStats {
+  patients: PeriodCounts;
+  doctors: PeriodCounts;
+  appointments: PeriodCounts;
 }
 
 interface Stat {
@@ -58,52 +61,17 @@ export default function Dashboard() {
     } else {
       const fetchData = async () => {
         try {
-          const today = new Date();
-          const currentPeriodStart = subDays(today, 30);
-          const previousPeriodStart = subDays(today, 60);
-          const previousPeriodEnd = subDays(today, 31);
-
-          const currentPeriodStartStr = format(currentPeriodStart, "yyyy-MM-dd'T'HH:mm:ss'Z'");
-          const previousPeriodStartStr = format(previousPeriodStart, "yyyy-MM-dd'T'HH:mm:ss'Z'");
-          const previousPeriodEndStr = format(previousPeriodEnd, "yyyy-MM-dd'T'HH:mm:ss'Z'");
-
-          const [patientsRes, appointmentsRes, doctorsRes] = await Promise.all([
-            api.get('/patients'),
-            api.get('/appointments'),
+          // Counts and 30-day deltas come precomputed from the server; the lists only feed the tables below
+          const [statsRes, appointmentsRes, doctorsRes] = await Promise.all([
+            api.get<DashboardStats>('/stats/dashboard'),
+            api.get('/appointments', { params: { limit: 5 } }),
             api.get('/doctors'),
           ]);
 
-          const allPatients: Patient[] = patientsRes.data;
+          const summary = statsRes.data;
           const allAppointments: Appointment[] = appointmentsRes.data;
           const allDoctors: Doctor[] = doctorsRes.data;
 
-          const currentPatients = allPatients.filter((patient) => {
-            const createdAt = new Date(patient.createdAt);
-            return createdAt >= currentPeriodStart && createdAt <= today;
-          });
-          const previousPatients = allPatients.filter((patient) => {
-            const createdAt = new Date(patient.createdAt);
-            return createdAt >= previousPeriodStart && createdAt <= previousPeriodEnd;
-          });
-
-          const currentAppointments = allAppointments.filter((appt) => {
-            const dateTime = new Date(appt.dateTime);
-            return dateTime >= currentPeriodStart && dateTime <= today;
-          });
-          const previousAppointments = allAppointments.filter((appt) => {
-            const dateTime = new Date(appt.dateTime);
-            return dateTime >= previousPeriodStart && dateTime <= previousPeriodEnd;
-          });
-
-          const currentDoctors = allDoctors.filter((doctor) => {
-            const createdAt = new Date(doctor.createdAt);
-            return createdAt >= currentPeriodStart && createdAt <= today;
-          });
-          const previousDoctors = allDoctors.filter((doctor) => {
-            const createdAt = new Date(doctor.createdAt);
-            return createdAt >= previousPeriodStart && createdAt <= previousPeriodEnd;
-          });
-
           const calculatePercentageChange = (current: number, previous: number): string => {
             if (previous === 0) {
               if (current === 0) return '0%';
@@ -114,26 +82,26 @@ export default function Dashboard() {
             return `${roundedChange > 0 ? '+' : ''}${roundedChange}%`;
           };
 
-          const patientsChange = calculatePercentageChange(currentPatients.length, previousPatients.length);
-          const appointmentsChange = calculatePercentageChange(currentAppointments.length, previousAppointments.length);
-          const doctorsChange = calculatePercentageChange(currentDoctors.length, previousDoctors.length);
+          const patientsChange = calculatePercentageChange(summary.patients.current, summary.patients.previous);
+          const appointmentsChange = calculatePercentageChange(summary.appointments.current, summary.appointments.previous);
+          const doctorsChange = calculatePercentageChange(summary.doctors.current, summary.doctors.previous);
 
           setStats([
             { 
               name: 'Total Patients', 
-              value: allPatients.length.toString(), 
+              value: summary.patients.total.toString(), 
               change: patientsChange, 
               icon: Users 
             },
             { 
               name: 'Total Appointments', 
-              value: allAppointments.length.toString(), 
+              value: summary.appointments.total.toString(), 
               change: appointmentsChange, 
               icon: Calendar 
             },
             { 
               name: 'Active Doctors', 
-              value: allDoctors.length.toString(), 
+              value: summary.doctors.total.toString(), 
               change: doctorsChange, 
               icon: Activity 
             },